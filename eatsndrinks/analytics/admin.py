@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DailyCategoryRevenue, DailyRollup
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ("date", "revenue", "order_count", "new_users", "new_products")
+    date_hierarchy = "date"
+
+
+@admin.register(DailyCategoryRevenue)
+class DailyCategoryRevenueAdmin(admin.ModelAdmin):
+    list_display = ("date", "category", "revenue", "quantity")
+    list_filter = ("category",)
+    date_hierarchy = "date"
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+
+    def ready(self):
+        import analytics.signals  # Cập nhật số liệu tổng hợp khi đơn hàng, người dùng, sản phẩm thay đổi
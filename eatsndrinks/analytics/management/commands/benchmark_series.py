@@ -0,0 +1,90 @@
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from analytics.services import day_start, iter_buckets, month_start, rebuild_rollups, time_series
+from api.benchmark import explicit_timestamps, median_ms, throwaway_database
+from order.models import Order
+from users.models import User
+
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the old one-query-per-bucket revenue loop with a single GROUP BY over orders '
+        'and the GROUP BY over daily rollups used by /analytics/series/, on a throwaway database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=10, help='Runs per mode; the median is reported')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            self.stdout.write(f"Seeding {options['orders']} orders...")
+            self.seed(options)
+            today = timezone.localdate()
+            cases = [
+                ('12 months', 'month', month_start(today, -11), today),
+                ('90 days', 'day', today - timedelta(days=89), today),
+            ]
+            for label, granularity, start, end in cases:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'Revenue, last {label}'))
+                modes = [
+                    ('per-bucket loop', lambda: self.loop(granularity, start, end)),
+                    ('GROUP BY orders', lambda: self.group_orders(granularity, start, end)),
+                    ('GROUP BY rollups', lambda: time_series('revenue', granularity, start, end)),
+                ]
+                baseline = None
+                for mode, run in modes:
+                    elapsed = median_ms(run, options['repeat'])
+                    baseline = baseline or elapsed
+                    self.stdout.write(f'  {mode:<20} {elapsed:9.2f} ms  ({baseline / elapsed:.1f}x)')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark finished, test database dropped'))
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        user = User.objects.create(username='bench', password='!')
+        orders = (
+            Order(
+                user=user,
+                total_price=rng.randrange(20, 500) * 1000,
+                payment_status='paid' if rng.random() < 0.7 else 'pending',
+                created_at=now - timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+            )
+            for _ in range(options['orders'])
+        )
+        with explicit_timestamps(Order._meta.get_field('created_at')):
+            Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+        rebuild_rollups()
+
+    def loop(self, granularity, start, end):
+        """Cách cũ: một truy vấn SUM cho mỗi kỳ"""
+        buckets = list(iter_buckets(start, end, granularity))
+        bounds = buckets[1:] + [end + timedelta(days=1)]
+        return [
+            Order.objects.filter(
+                payment_status='paid', created_at__gte=day_start(bucket), created_at__lt=day_start(upper)
+            ).aggregate(total=Sum('total_price'))['total'] or 0
+            for bucket, upper in zip(buckets, bounds)
+        ]
+
+    def group_orders(self, granularity, start, end):
+        """Một truy vấn GROUP BY trực tiếp trên Order, đổi múi giờ từng dòng"""
+        rows = (
+            Order.objects.filter(
+                payment_status='paid', created_at__gte=day_start(start), created_at__lt=day_start(end + timedelta(days=1))
+            )
+            .annotate(period=Trunc('created_at', granularity, output_field=DateField()))
+            .values_list('period')
+            .annotate(total=Sum('total_price'))
+            .order_by()
+        )
+        return dict(rows)
@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analytics.services import rebuild_rollups
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill or rebuild the daily dashboard rollups from orders, users and products. '
+        'Rebuilds the whole history unless a date range is given. Saves and deletes of orders and '
+        'order details are applied incrementally; use --from/--to or --days to repair the days '
+        'touched by QuerySet.update(), bulk operations or raw SQL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=parse_date, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', type=parse_date, help='Last day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, help='Rebuild only the last N days, including today')
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError('--days must be at least 1')
+            end = timezone.localdate()
+            start = end - timedelta(days=options['days'] - 1)
+        if start and end and start > end:
+            raise CommandError('--from must not be after --to')
+
+        days = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt rollups for {days} days with data'))
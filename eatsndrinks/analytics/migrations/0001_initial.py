@@ -0,0 +1,47 @@
+# Generated by Django 5.1 on 2026-10-18 15:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalogue', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('order_count', models.IntegerField(default=0)),
+                ('new_users', models.IntegerField(default=0)),
+                ('new_products', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Thống Kê Theo Ngày',
+                'verbose_name_plural': 'Thống Kê Theo Ngày',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategoryRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalogue.category')),
+            ],
+            options={
+                'verbose_name': 'Doanh Thu Danh Mục Theo Ngày',
+                'verbose_name_plural': 'Doanh Thu Danh Mục Theo Ngày',
+                'constraints': [models.UniqueConstraint(fields=('date', 'category'), name='category_revenue_date_category_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def populate_category_key(apps, schema_editor):
+    DailyCategoryRevenue = apps.get_model('analytics', 'DailyCategoryRevenue')
+    DailyCategoryRevenue.objects.filter(category__isnull=False).update(category_key=models.F('category_id'))
+    # Gộp các dòng (ngày, không có danh mục) bị trùng do ràng buộc cũ không chặn được NULL
+    duplicates = (
+        DailyCategoryRevenue.objects.values('date', 'category_key')
+        .annotate(rows=Count('id'), keep=Min('id'), revenue_sum=Sum('revenue'), quantity_sum=Sum('quantity'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        DailyCategoryRevenue.objects.filter(date=group['date'], category_key=group['category_key']).exclude(
+            pk=group['keep']
+        ).delete()
+        DailyCategoryRevenue.objects.filter(pk=group['keep']).update(
+            revenue=group['revenue_sum'], quantity=group['quantity_sum']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailycategoryrevenue',
+            name='category_key',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RemoveConstraint(
+            model_name='dailycategoryrevenue',
+            name='category_revenue_date_category_uniq',
+        ),
+        migrations.RunPython(populate_category_key, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailycategoryrevenue',
+            constraint=models.UniqueConstraint(fields=('date', 'category_key'), name='category_revenue_date_key_uniq'),
+        ),
+    ]
@@ -1,3 +1,51 @@
 from django.db import models
 
-# Create your models here.
+from catalogue.models import Category
+
+UNCATEGORIZED = 0  # category_key của doanh thu không thuộc danh mục nào
+
+
+class DailyRollup(models.Model):
+    """
+    Số liệu tổng hợp theo ngày (giờ Việt Nam) cho dashboard admin.
+    Được cập nhật dần qua signal và có thể dựng lại bằng lệnh rebuild_rollups.
+    """
+
+    date = models.DateField(unique=True)
+    revenue = models.BigIntegerField(default=0)  # Tổng total_price của đơn đã thanh toán
+    order_count = models.IntegerField(default=0)  # Số đơn đã thanh toán
+    new_users = models.IntegerField(default=0)
+    new_products = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Thống Kê Theo Ngày"
+        verbose_name_plural = "Thống Kê Theo Ngày"
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"{self.date} - Doanh Thu: {self.revenue} - Đơn Hàng: {self.order_count}"
+
+
+class DailyCategoryRevenue(models.Model):
+    """Doanh thu theo danh mục mỗi ngày, tính trên tiền hàng của từng món (chưa trừ giảm giá combo)"""
+
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    # category_id hoặc UNCATEGORIZED: NULL không bằng nhau nên không dùng được category trong ràng buộc unique
+    category_key = models.PositiveBigIntegerField(default=UNCATEGORIZED, editable=False)
+    revenue = models.BigIntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Doanh Thu Danh Mục Theo Ngày"
+        verbose_name_plural = "Doanh Thu Danh Mục Theo Ngày"
+        constraints = [
+            models.UniqueConstraint(fields=["date", "category_key"], name="category_revenue_date_key_uniq"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.category_key = self.category_id or UNCATEGORIZED
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.date} - {self.category or 'Không có danh mục'} - Doanh Thu: {self.revenue}"
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .services import GRANULARITIES, ROLLUP_FIELDS, bucket_start, month_start
+
+MAX_BUCKETS = 1000
+# Số kỳ mặc định khi không truyền from
+DEFAULT_BUCKETS = {"day": 30, "week": 12, "month": 12}
+
+
+class SeriesQuerySerializer(serializers.Serializer):
+    """Tham số của /analytics/series/; from và to là ngày (giờ địa phương), tính cả hai đầu"""
+
+    metric = serializers.ChoiceField(choices=ROLLUP_FIELDS)
+    granularity = serializers.ChoiceField(choices=GRANULARITIES, default="day")
+
+    def get_fields(self):
+        # "from" là từ khóa của Python nên không khai báo được như thuộc tính lớp
+        fields = super().get_fields()
+        fields["from"] = serializers.DateField(required=False)
+        fields["to"] = serializers.DateField(required=False)
+        return fields
+
+    def validate(self, attrs):
+        granularity = attrs["granularity"]
+        end = attrs.get("to") or timezone.localdate()
+        start = attrs.get("from")
+        if start is None:
+            count = DEFAULT_BUCKETS[granularity] - 1
+            if granularity == "month":
+                start = month_start(end, -count)
+            else:
+                start = bucket_start(end, granularity) - timedelta(days=count * (7 if granularity == "week" else 1))
+        if start > end:
+            raise serializers.ValidationError({"from": ["from phải trước hoặc bằng to."]})
+
+        days = (end - start).days
+        buckets = {
+            "day": days + 1,
+            "week": days // 7 + 2,
+            "month": (end.year - start.year) * 12 + end.month - start.month + 1,
+        }[granularity]
+        if buckets > MAX_BUCKETS:
+            raise serializers.ValidationError(f"Khoảng thời gian quá dài, tối đa {MAX_BUCKETS} kỳ.")
+        return {**attrs, "from": start, "to": end}
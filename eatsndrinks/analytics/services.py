@@ -0,0 +1,340 @@
+import threading
+import weakref
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Trunc, TruncDate, TruncMonth
+from django.utils import timezone
+
+from catalogue.models import Product
+from order.models import Order, OrderDetail
+from users.models import User
+from .models import UNCATEGORIZED, DailyCategoryRevenue, DailyRollup
+
+PAID = "paid"
+ROLLUP_FIELDS = ("revenue", "order_count", "new_users", "new_products")
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def month_start(day, offset=0):
+    """Ngày đầu tháng chứa `day`, dịch đi `offset` tháng (có thể âm)"""
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def day_start(day):
+    """Thời điểm 00:00 của một ngày theo múi giờ hiện tại"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _increment(model, lookup, defaults=None, **deltas):
+    """
+    Cộng dồn vào một dòng tổng hợp bằng UPDATE ... SET x = x + n, tạo dòng (kèm `defaults`) nếu chưa có.
+    `lookup` phải là các cột của một ràng buộc unique để luôn khớp tối đa một dòng.
+    """
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Một request khác vừa tạo dòng này
+        model.objects.filter(**lookup).update(**updates)
+
+
+# Cập nhật dần
+
+
+def order_contribution(order_id):
+    """
+    Phần đóng góp của một đơn đã thanh toán vào số liệu tổng hợp:
+    (ngày, doanh thu, [(category_id, doanh thu, số lượng)]). Trả về None nếu đơn không còn tồn tại
+    hoặc chưa thanh toán.
+    """
+    order = Order.objects.filter(pk=order_id).values("total_price", "created_at", "payment_status").first()
+    if order is None or order["payment_status"] != PAID:
+        return None
+    categories = (
+        OrderDetail.objects.filter(order_id=order_id)
+        .values_list("product__category_id")
+        .annotate(revenue=Sum("total_price"), quantity=Sum("quantity"))
+        .order_by("product__category_id")
+    )
+    return timezone.localdate(order["created_at"]), order["total_price"], list(categories)
+
+
+def apply_order_contribution(contribution, sign=1):
+    """Cộng (sign=1) hoặc trừ (sign=-1) phần đóng góp của một đơn đã thanh toán"""
+    if contribution is None:
+        return
+    day, revenue, categories = contribution
+    with transaction.atomic():
+        _increment(DailyRollup, {"date": day}, revenue=sign * revenue, order_count=sign)
+        for category_id, category_revenue, quantity in categories:
+            _increment(
+                DailyCategoryRevenue,
+                {"date": day, "category_key": category_id or UNCATEGORIZED},
+                {"category_id": category_id},
+                revenue=sign * (category_revenue or 0),
+                quantity=sign * (quantity or 0),
+            )
+
+
+class OrderChange:
+    """
+    Chênh lệch số liệu của một đơn trong transaction hiện tại: phần đóng góp trước lần sửa đầu tiên
+    được chụp lại, khi commit thì trừ phần cũ và cộng phần đóng góp mới đọc lại từ DB.
+    """
+
+    def __init__(self, order_id, before):
+        self.order_id = order_id
+        self.before = before
+        self.applied = False
+
+    def __call__(self):
+        self.applied = True
+        after = order_contribution(self.order_id)
+        if after != self.before:
+            with transaction.atomic():
+                apply_order_contribution(self.before, -1)
+                apply_order_contribution(after, 1)
+
+
+class _PendingChanges(threading.local):
+    def __init__(self):
+        self.snapshots = {}  # order_id -> OrderChange chụp ở pre_save/pre_delete, chờ post_save/post_delete
+        # Các OrderChange đã đăng ký on_commit; tham chiếu yếu nên tự biến mất khi commit xong
+        # hoặc khi transaction rollback và Django bỏ callback
+        self.scheduled = weakref.WeakValueDictionary()
+
+
+_pending = _PendingChanges()
+
+
+def _is_scheduled(order_id):
+    change = _pending.scheduled.get(order_id)
+    return change is not None and not change.applied
+
+
+def before_order_change(order_id):
+    """
+    Gọi trước khi ghi một đơn hoặc chi tiết đơn (pre_save/pre_delete). Chỉ lần sửa đầu tiên của
+    đơn trong một transaction cần chụp phần đóng góp cũ.
+    """
+    if order_id is not None and not _is_scheduled(order_id):
+        _pending.snapshots[order_id] = OrderChange(order_id, order_contribution(order_id))
+
+
+def after_order_change(order_id, created=False):
+    """
+    Gọi sau khi ghi (post_save/post_delete): hẹn áp dụng chênh lệch một lần khi transaction commit.
+    Phần đóng góp mới được đọc lúc commit vì place_order tạo chi tiết đơn bằng bulk_create sau khi
+    lưu Order, và để mọi lần sửa trạng thái, tổng tiền, chi tiết đơn trong cùng transaction chỉ
+    được tính một lần.
+    """
+    change = _pending.snapshots.pop(order_id, None)
+    if _is_scheduled(order_id):
+        return
+    if change is None:
+        if not created:
+            return
+        change = OrderChange(order_id, None)
+    _pending.scheduled[order_id] = change
+    transaction.on_commit(change)
+
+
+def merge_into_uncategorized(category_id):
+    """Gộp doanh thu theo ngày của một danh mục sắp bị xóa vào dòng không có danh mục cùng ngày"""
+    rows = DailyCategoryRevenue.objects.filter(category_key=category_id)
+    with transaction.atomic():
+        for day, revenue, quantity in rows.values_list("date", "revenue", "quantity"):
+            _increment(
+                DailyCategoryRevenue,
+                {"date": day, "category_key": UNCATEGORIZED},
+                revenue=revenue,
+                quantity=quantity,
+            )
+        rows.delete()
+
+
+def _record_by_day(field, timestamps, sign):
+    for day, count in Counter(timezone.localdate(value) for value in timestamps).items():
+        _increment(DailyRollup, {"date": day}, **{field: sign * count})
+
+
+def record_new_users(users, sign=1):
+    _record_by_day("new_users", (user.date_joined for user in users), sign)
+
+
+def record_new_products(products, sign=1):
+    _record_by_day("new_products", (product.created_at for product in products), sign)
+
+
+# Dựng lại từ dữ liệu gốc
+
+
+def _in_range(queryset, field, start, end):
+    if start is not None:
+        queryset = queryset.filter(**{f"{field}__gte": day_start(start)})
+    if end is not None:
+        queryset = queryset.filter(**{f"{field}__lt": day_start(end + timedelta(days=1))})
+    return queryset
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    Tính lại số liệu các ngày trong [start, end] từ bảng gốc bằng bốn truy vấn GROUP BY theo ngày
+    (giờ địa phương) rồi thay thế các dòng tổng hợp cũ. Bỏ trống start/end để dựng lại toàn bộ lịch sử.
+    Trả về số ngày có dữ liệu.
+    """
+    rollups = {}
+
+    def rollup(day):
+        if day not in rollups:
+            rollups[day] = DailyRollup(date=day)
+        return rollups[day]
+
+    orders = (
+        _in_range(Order.objects.filter(payment_status=PAID), "created_at", start, end)
+        .annotate(day=TruncDate("created_at"))
+        .values_list("day")
+        .annotate(revenue=Sum("total_price"), order_count=Count("id"))
+        .order_by()
+    )
+    for day, revenue, order_count in orders:
+        rollup(day).revenue = revenue
+        rollup(day).order_count = order_count
+
+    for model, field, counter in ((User, "date_joined", "new_users"), (Product, "created_at", "new_products")):
+        rows = (
+            _in_range(model.objects.all(), field, start, end)
+            .annotate(day=TruncDate(field))
+            .values_list("day")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for day, count in rows:
+            setattr(rollup(day), counter, count)
+
+    categories = (
+        _in_range(OrderDetail.objects.filter(order__payment_status=PAID), "order__created_at", start, end)
+        .annotate(day=TruncDate("order__created_at"))
+        .values_list("day", "product__category_id")
+        .annotate(revenue=Sum("total_price"), quantity=Sum("quantity"))
+        .order_by()
+    )
+    category_rows = [
+        DailyCategoryRevenue(
+            date=day,
+            category_id=category_id,
+            category_key=category_id or UNCATEGORIZED,
+            revenue=revenue,
+            quantity=quantity,
+        )
+        for day, category_id, revenue, quantity in categories
+    ]
+
+    with transaction.atomic():
+        for model in (DailyRollup, DailyCategoryRevenue):
+            queryset = model.objects.all()
+            if start is not None:
+                queryset = queryset.filter(date__gte=start)
+            if end is not None:
+                queryset = queryset.filter(date__lte=end)
+            queryset.delete()
+        DailyRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+        DailyCategoryRevenue.objects.bulk_create(category_rows, batch_size=1000)
+    return len(rollups)
+
+
+# Đọc cho dashboard
+
+
+def monthly_totals(first_month, months):
+    """
+    Số liệu `months` tháng liên tiếp bắt đầu từ first_month, đọc từ DailyRollup bằng một truy vấn
+    theo khoảng ngày. Tháng không có dữ liệu được điền 0.
+    """
+    rows = (
+        DailyRollup.objects.filter(date__gte=first_month, date__lt=month_start(first_month, months))
+        .annotate(month=TruncMonth("date"))
+        .values("month")
+        .annotate(**{field: Sum(field) for field in ROLLUP_FIELDS})
+        .order_by()
+    )
+    by_month = {row["month"]: row for row in rows}
+    totals = []
+    for offset in range(months):
+        month = month_start(first_month, offset)
+        row = by_month.get(month, {})
+        totals.append({"month": month, **{field: row.get(field) or 0 for field in ROLLUP_FIELDS}})
+    return totals
+
+
+def month_over_month(field):
+    """(tháng này, tháng trước, % tăng) của một chỉ số; tháng trước bằng 0 thì % là 100 nếu tháng này có số liệu"""
+    previous, current = monthly_totals(month_start(timezone.localdate(), -1), 2)
+    current, previous = current[field], previous[field]
+    if previous == 0:
+        increase_percentage = 100 if current > 0 else 0
+    else:
+        increase_percentage = ((current - previous) / previous) * 100
+    return current, previous, round(increase_percentage, 2)
+
+
+def category_revenue(start, end):
+    """Doanh thu theo danh mục trong [start, end), sắp xếp giảm dần"""
+    return list(
+        DailyCategoryRevenue.objects.filter(date__gte=start, date__lt=end)
+        .values("category_id", "category__name")
+        .annotate(revenue=Sum("revenue"), quantity=Sum("quantity"))
+        .order_by("-revenue", "category_id")
+    )
+
+
+# Chuỗi thời gian
+
+
+def bucket_start(day, granularity):
+    """Ngày bắt đầu của kỳ chứa `day`; tuần bắt đầu từ thứ Hai như TruncWeek"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return month_start(day)
+    return day
+
+
+def iter_buckets(start, end, granularity):
+    """Ngày bắt đầu của mọi kỳ giao với [start, end]"""
+    bucket = bucket_start(start, granularity)
+    while bucket <= end:
+        yield bucket
+        if granularity == "month":
+            bucket = month_start(bucket, 1)
+        else:
+            bucket += timedelta(days=7 if granularity == "week" else 1)
+
+
+def time_series(metric, granularity, start, end):
+    """
+    Giá trị của một chỉ số (một cột của DailyRollup) theo từng ngày/tuần/tháng trong [start, end],
+    tính bằng một truy vấn Trunc + GROUP BY trên bảng thống kê theo ngày. Ngày trong DailyRollup
+    đã là ngày giờ địa phương nên kỳ được chia đúng múi giờ. Kỳ không có dữ liệu được điền 0;
+    kỳ đầu/cuối chỉ tính phần nằm trong khoảng.
+    """
+    rows = (
+        DailyRollup.objects.filter(date__gte=start, date__lte=end)
+        .annotate(period=Trunc("date", granularity, output_field=DateField()))
+        .values_list("period")
+        .annotate(value=Sum(metric))
+        .order_by()
+    )
+    values = dict(rows)
+    return [
+        {"period": bucket, "value": values.get(bucket) or 0}
+        for bucket in iter_buckets(start, end, granularity)
+    ]
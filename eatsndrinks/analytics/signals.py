@@ -0,0 +1,70 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from catalogue.models import Category, Product
+from order.models import Order, OrderDetail
+from users.models import User
+from .services import (
+    after_order_change,
+    before_order_change,
+    merge_into_uncategorized,
+    record_new_products,
+    record_new_users,
+)
+
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_delete, sender=Order)
+def remember_order_contribution(sender, instance, raw=False, **kwargs):
+    # Sửa trạng thái thanh toán, tổng tiền hay xóa đơn đều được tính bằng chênh lệch trước/sau
+    if not raw and instance.pk is not None:
+        before_order_change(instance.pk)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def update_order_rollups(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        after_order_change(instance.pk, created=created)
+
+
+@receiver(pre_save, sender=OrderDetail)
+@receiver(pre_delete, sender=OrderDetail)
+def remember_order_detail_contribution(sender, instance, raw=False, **kwargs):
+    if not raw:
+        before_order_change(instance.order_id)
+
+
+@receiver(post_save, sender=OrderDetail)
+@receiver(post_delete, sender=OrderDetail)
+def update_order_detail_rollups(sender, instance, raw=False, **kwargs):
+    if not raw:
+        after_order_change(instance.order_id)
+
+
+@receiver(post_save, sender=User)
+def count_new_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_new_users([instance])
+
+
+@receiver(post_delete, sender=User)
+def uncount_deleted_user(sender, instance, **kwargs):
+    record_new_users([instance], sign=-1)
+
+
+@receiver(post_save, sender=Product)
+def count_new_product(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_new_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def uncount_deleted_product(sender, instance, **kwargs):
+    record_new_products([instance], sign=-1)
+
+
+@receiver(pre_delete, sender=Category)
+def merge_deleted_category_revenue(sender, instance, **kwargs):
+    # Sau khi xóa, category của các dòng bị SET_NULL; gộp trước để mỗi ngày chỉ còn một dòng không có danh mục
+    merge_into_uncategorized(instance.pk)
@@ -1,3 +1,234 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from catalogue.models import Category, Product
+from order.models import Order, OrderDetail
+from users.models import User
+from .models import DailyCategoryRevenue, DailyRollup
+from .services import month_start, rebuild_rollups
 
-# Create your tests here.
+
+class DailyRollupTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='pass12345')
+        self.client.force_authenticate(self.admin)
+        self.today = timezone.localdate()
+        self.drinks = Category.objects.create(name='Đồ uống')
+        self.tea = Product.objects.create(name='Trà', price=20000, category=self.drinks)
+        self.rice = Product.objects.create(name='Cơm', price=30000)
+
+    def create_order(self, total_price=50000, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.admin, total_price=total_price, **fields)
+            OrderDetail.objects.create(order=order, product=self.tea, quantity=1)
+            OrderDetail.objects.create(order=order, product=self.rice, quantity=1)
+        return order
+
+    def set_payment_status(self, order, payment_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/order/admin/order/{order.id}/', {'payment_status': payment_status})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def rollup(self, day=None):
+        return DailyRollup.objects.get(date=day or self.today)
+
+    def test_payment_status_changes_update_rollups(self):
+        order = self.create_order()
+        self.assertEqual(self.rollup().order_count, 0)
+
+        self.set_payment_status(order, 'paid')
+        rollup = self.rollup()
+        self.assertEqual((rollup.revenue, rollup.order_count), (50000, 1))
+        self.assertEqual(
+            set(DailyCategoryRevenue.objects.values_list('category_id', 'revenue', 'quantity')),
+            {(self.drinks.id, 20000, 1), (None, 30000, 1)},
+        )
+
+        # Lưu lại mà không đổi trạng thái thì không cộng thêm
+        self.set_payment_status(order, 'paid')
+        self.assertEqual(self.rollup().order_count, 1)
+
+        self.set_payment_status(order, 'pending')
+        rollup = self.rollup()
+        self.assertEqual((rollup.revenue, rollup.order_count), (0, 0))
+        self.assertFalse(DailyCategoryRevenue.objects.exclude(revenue=0).exists())
+
+    def test_edits_to_paid_orders_update_rollups(self):
+        order = self.create_order(payment_status='paid')
+        with self.captureOnCommitCallbacks(execute=True):
+            order.total_price = 80000
+            order.save()
+            OrderDetail.objects.create(order=order, product=self.tea, quantity=2)
+            OrderDetail.objects.filter(order=order, product=self.rice).get().delete()
+        rollup = self.rollup()
+        self.assertEqual((rollup.revenue, rollup.order_count), (80000, 1))
+        self.assertEqual(
+            set(DailyCategoryRevenue.objects.exclude(revenue=0).values_list('category_id', 'revenue', 'quantity')),
+            {(self.drinks.id, 60000, 3)},
+        )
+
+        # Đổi trạng thái và sửa chi tiết trong cùng transaction không bị tính trùng
+        with self.captureOnCommitCallbacks(execute=True):
+            order.payment_status = 'pending'
+            order.save()
+            OrderDetail.objects.create(order=order, product=self.rice, quantity=1)
+            order.payment_status = 'paid'
+            order.save()
+        self.assertEqual((self.rollup().revenue, self.rollup().order_count), (80000, 1))
+        self.assertEqual(DailyCategoryRevenue.objects.get(category_id=None).revenue, 30000)
+
+        self.assertEqual(
+            set(DailyCategoryRevenue.objects.exclude(revenue=0).values_list('category_id', 'revenue', 'quantity')),
+            {(self.drinks.id, 60000, 3), (None, 30000, 1)},
+        )
+
+        # Sửa chi tiết rồi mới hủy thanh toán, sau đó xóa đơn
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderDetail.objects.create(order=order, product=self.tea, quantity=1)
+            order.payment_status = 'pending'
+            order.save()
+        self.assertEqual((self.rollup().revenue, self.rollup().order_count), (0, 0))
+        self.assertFalse(DailyCategoryRevenue.objects.exclude(revenue=0).exists())
+        self.set_payment_status(order, 'paid')
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual((self.rollup().revenue, self.rollup().order_count), (0, 0))
+        self.assertFalse(DailyCategoryRevenue.objects.exclude(revenue=0).exists())
+
+    def test_new_users_and_products_are_counted(self):
+        # setUp đã tạo 1 admin và 2 sản phẩm
+        self.assertEqual((self.rollup().new_users, self.rollup().new_products), (1, 2))
+        User.objects.create_user(username='khach', password='pass12345')
+        self.tea.delete()
+        self.assertEqual((self.rollup().new_users, self.rollup().new_products), (2, 1))
+
+        response = self.client.get('/users/admin/stats/')
+        self.assertEqual(response.data['current_month_users'], 2)
+        response = self.client.get('/catalogue/products/stats/')
+        self.assertEqual(response.data['current_month_products'], 1)
+
+    def test_deleted_categories_merge_into_one_uncategorized_row(self):
+        food = Category.objects.create(name='Đồ ăn')
+        Product.objects.filter(pk=self.rice.pk).update(category=food)
+        self.create_order(payment_status='paid')
+        self.drinks.delete()
+        food.delete()
+        self.rice.refresh_from_db()
+        self.rice.category = None
+        self.rice.save()
+        self.create_order(payment_status='paid')
+
+        self.assertEqual(
+            list(DailyCategoryRevenue.objects.values_list('category_id', 'revenue', 'quantity')),
+            [(None, 100000, 4)],
+        )
+        response = self.client.get('/analytics/category-revenue/')
+        self.assertEqual([(row['category_name'], row['revenue']) for row in response.data], [(None, 100000)])
+
+    def test_rebuild_matches_incremental_rollups(self):
+        paid = self.create_order(payment_status='paid')
+        self.create_order(total_price=10000)
+        old = self.create_order(total_price=70000, payment_status='paid')
+        # Đổi created_at bằng update() nên signal không chạy; chỉ lệnh rebuild mới thấy
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        incremental = self.rollup()
+
+        DailyRollup.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        rebuilt = self.rollup()
+        self.assertEqual(
+            (rebuilt.revenue, rebuilt.order_count, rebuilt.new_users, rebuilt.new_products),
+            (paid.total_price, 1, incremental.new_users, incremental.new_products),
+        )
+        self.assertEqual(self.rollup(self.today - timedelta(days=40)).revenue, 70000)
+        self.assertEqual(DailyCategoryRevenue.objects.filter(date=self.today).count(), 2)
+
+    def test_yearly_revenue_reads_rollups_in_one_query(self):
+        DailyRollup.objects.all().delete()
+        DailyRollup.objects.bulk_create([
+            DailyRollup(date=self.today, revenue=100, order_count=1),
+            DailyRollup(date=month_start(self.today, -1), revenue=40, order_count=2),
+            DailyRollup(date=month_start(self.today, -11), revenue=7),
+            DailyRollup(date=month_start(self.today, -12), revenue=1000),  # Ngoài 12 tháng
+        ])
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/order/admin/yearly-revenue/')
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(response.data[0], {'month': self.today.strftime('%Y-%m'), 'revenue': 100})
+        self.assertEqual([month['revenue'] for month in response.data], [100, 40] + [0] * 9 + [7])
+
+        response = self.client.get('/order/admin/monthly-revenue/')
+        self.assertEqual(response.data['revenue_this_month'], 100)
+        self.assertEqual(response.data['percentage_change'], 150)
+        response = self.client.get('/order/admin/monthly-sales/')
+        self.assertEqual(response.data['total_quantity'], 1)
+
+    def test_category_revenue_endpoint(self):
+        self.create_order(payment_status='paid')
+        response = self.client.get('/analytics/category-revenue/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['category_name'], row['revenue']) for row in response.data],
+            [(None, 30000), ('Đồ uống', 20000)],
+        )
+        self.assertEqual(self.client.get('/analytics/category-revenue/?months=0').status_code, 400)
+
+
+class SeriesTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='pass12345')
+        self.client.force_authenticate(self.admin)
+        DailyRollup.objects.all().delete()
+
+    def series(self, **params):
+        response = self.client.get('/analytics/series/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [(row['period'], row['value']) for row in response.data['series']]
+
+    def test_buckets_are_zero_filled_in_one_query(self):
+        DailyRollup.objects.bulk_create([
+            DailyRollup(date=date(2025, 1, 6), revenue=10),  # Thứ Hai
+            DailyRollup(date=date(2025, 1, 12), revenue=5),  # Chủ Nhật cùng tuần
+            DailyRollup(date=date(2025, 3, 1), revenue=7),
+        ])
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                '/analytics/series/', {'metric': 'revenue', 'granularity': 'month', 'from': '2025-01-01', 'to': '2025-03-31'}
+            )
+        self.assertEqual(
+            [(row['period'], row['value']) for row in response.data['series']],
+            [(date(2025, 1, 1), 15), (date(2025, 2, 1), 0), (date(2025, 3, 1), 7)],
+        )
+        self.assertEqual(
+            self.series(metric='revenue', granularity='week', **{'from': '2025-01-08', 'to': '2025-01-20'}),
+            [(date(2025, 1, 6), 5), (date(2025, 1, 13), 0), (date(2025, 1, 20), 0)],
+        )
+
+    def test_days_are_bucketed_in_local_time(self):
+        # 18:30 UTC ngày 31/1 là 01:30 ngày 1/2 giờ Việt Nam
+        user = User.objects.create_user(username='khach', password='pass12345')
+        User.objects.filter(pk=user.pk).update(date_joined=datetime(2025, 1, 31, 18, 30, tzinfo=dt_timezone.utc))
+        rebuild_rollups(date(2025, 1, 1), date(2025, 2, 28))
+        self.assertEqual(
+            self.series(metric='new_users', granularity='month', **{'from': '2025-01-01', 'to': '2025-02-28'}),
+            [(date(2025, 1, 1), 0), (date(2025, 2, 1), 1)],
+        )
+
+    def test_invalid_parameters(self):
+        for params in (
+            {'metric': 'profit'},
+            {'metric': 'revenue', 'granularity': 'hour'},
+            {'metric': 'revenue', 'from': '2025-02-01', 'to': '2025-01-01'},
+            {'metric': 'revenue', 'from': '2000-01-01', 'to': '2025-01-01'},
+        ):
+            self.assertEqual(self.client.get('/analytics/series/', params).status_code, 400, params)
+        response = self.client.get('/analytics/series/', {'metric': 'order_count', 'granularity': 'week'})
+        self.assertEqual(len(response.data['series']), 12)
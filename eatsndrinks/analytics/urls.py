@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import CategoryRevenueView, SeriesView
+
+urlpatterns = [
+    path('category-revenue/', CategoryRevenueView.as_view(), name='category-revenue'),  # GET doanh thu theo danh mục
+    path('series/', SeriesView.as_view(), name='analytics-series'),  # GET chuỗi thời gian theo ngày/tuần/tháng
+]
@@ -1,3 +1,108 @@
-from django.shortcuts import render
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.utils.timezone import localdate
 
-# Create your views here.
+from .serializers import MAX_BUCKETS, SeriesQuerySerializer
+from .services import GRANULARITIES, ROLLUP_FIELDS, category_revenue, month_start, time_series
+
+MAX_MONTHS = 24
+
+
+class CategoryRevenueView(APIView):
+    """
+    API trả về doanh thu theo danh mục từ đầu tháng (months - 1) tháng trước đến nay,
+    đọc từ bảng thống kê theo ngày
+    """
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name="months", type=int, description=f"Số tháng gần nhất (1-{MAX_MONTHS}), mặc định 1"),
+        ],
+        responses={
+            200: {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'category_id': {'type': 'integer', 'nullable': True},
+                        'category_name': {'type': 'string', 'nullable': True},
+                        'revenue': {'type': 'integer'},
+                        'quantity': {'type': 'integer'},
+                    }
+                }
+            }
+        }
+    )
+    def get(self, request):
+        try:
+            months = int(request.query_params.get("months", 1))
+        except ValueError:
+            return Response({"error": "months phải là số nguyên."}, status=400)
+        if not 1 <= months <= MAX_MONTHS:
+            return Response({"error": f"months phải trong khoảng 1-{MAX_MONTHS}."}, status=400)
+
+        this_month = month_start(localdate())
+        rows = category_revenue(month_start(this_month, 1 - months), month_start(this_month, 1))
+        return Response([
+            {
+                "category_id": row["category_id"],
+                "category_name": row["category__name"],
+                "revenue": row["revenue"],
+                "quantity": row["quantity"],
+            }
+            for row in rows
+        ], status=200)
+
+
+class SeriesView(APIView):
+    """
+    API trả về chuỗi thời gian của một chỉ số (doanh thu, số đơn đã thanh toán, người dùng mới,
+    sản phẩm mới) theo ngày/tuần/tháng, tính bằng một truy vấn GROUP BY
+    """
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name="metric", type=str, required=True, enum=list(ROLLUP_FIELDS)),
+            OpenApiParameter(name="granularity", type=str, enum=list(GRANULARITIES), description="Mặc định day"),
+            OpenApiParameter(name="from", type=str, description="Ngày bắt đầu YYYY-MM-DD"),
+            OpenApiParameter(name="to", type=str, description="Ngày kết thúc YYYY-MM-DD, mặc định hôm nay"),
+        ],
+        responses={
+            200: {
+                'type': 'object',
+                'properties': {
+                    'metric': {'type': 'string'},
+                    'granularity': {'type': 'string'},
+                    'from': {'type': 'string', 'format': 'date'},
+                    'to': {'type': 'string', 'format': 'date'},
+                    'series': {
+                        'type': 'array',
+                        'description': f"Tối đa {MAX_BUCKETS} kỳ",
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'period': {'type': 'string', 'format': 'date'},
+                                'value': {'type': 'integer'},
+                            }
+                        }
+                    },
+                }
+            }
+        }
+    )
+    def get(self, request):
+        params = SeriesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        series = time_series(query["metric"], query["granularity"], query["from"], query["to"])
+        return Response({
+            "metric": query["metric"],
+            "granularity": query["granularity"],
+            "from": query["from"],
+            "to": query["to"],
+            "series": series,
+        }, status=200)
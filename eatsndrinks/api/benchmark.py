@@ -0,0 +1,41 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Chạy benchmark trên một database test riêng (giống test runner) đã migrate sẵn,
+    rồi xóa đi khi xong nên không đụng tới dữ liệu thật.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Cho phép bulk_create ghi created_at/timestamp tùy ý thay vì thời điểm hiện tại"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def median_ms(func, repeat):
+    """Thời gian chạy trung vị (ms) của func qua `repeat` lần"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
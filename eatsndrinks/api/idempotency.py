@@ -0,0 +1,93 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+KEY_PREFIX = "idempotency"
+LOCK_TIMEOUT = 30  # Giây; khóa tự hết hạn nếu tiến trình xử lý bị dừng giữa chừng
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """Hash của method, đường dẫn và dữ liệu request để phát hiện key bị dùng lại cho request khác"""
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{payload}".encode()).hexdigest()
+
+
+class IdempotencyMixin:
+    """
+    Hỗ trợ header Idempotency-Key cho các view POST: request đầu tiên được xử lý bình thường và
+    phản hồi được lưu vào cache trong IDEMPOTENCY_KEY_TIMEOUT giây; gửi lại cùng key và cùng
+    dữ liệu sẽ nhận lại phản hồi cũ (kèm header Idempotent-Replayed) mà không chạy lại view.
+    - Request trùng key đang được xử lý: 409.
+    - Cùng key nhưng dữ liệu khác: 422.
+    Key được tách theo user và đường dẫn. Lỗi 4xx do view raise (ValidationError, Http404...) được
+    chuyển thành phản hồi bằng handle_exception của DRF rồi lưu như mọi phản hồi khác; phản hồi
+    lỗi 5xx không được lưu để client có thể thử lại.
+    """
+
+    idempotency_timeout = None  # Mặc định dùng settings.IDEMPOTENCY_KEY_TIMEOUT
+
+    def get_idempotency_cache_key(self, request, key):
+        user = request.user.pk if request.user and request.user.is_authenticated else "anon"
+        digest = hashlib.sha256(f"{user}:{request.path}:{key}".encode()).hexdigest()
+        return f"{KEY_PREFIX}:{digest}"
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().post(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} không được dài quá {MAX_KEY_LENGTH} ký tự."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = self.get_idempotency_cache_key(request, key)
+        fingerprint = request_fingerprint(request)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return self.replay(stored, fingerprint)
+
+        lock_key = f"{cache_key}:lock"
+        if not cache.add(lock_key, True, LOCK_TIMEOUT):
+            return Response(
+                {"detail": "Một request với cùng Idempotency-Key đang được xử lý, vui lòng thử lại sau."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        try:
+            # Request trước có thể vừa xong giữa lúc đọc cache và lấy khóa
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return self.replay(stored, fingerprint)
+
+            try:
+                response = super().post(request, *args, **kwargs)
+            except Exception as exc:
+                # Lỗi không thuộc DRF/Django (500) được raise lại và không lưu
+                response = self.handle_exception(exc)
+            if response.status_code < 500:
+                timeout = self.idempotency_timeout or settings.IDEMPOTENCY_KEY_TIMEOUT
+                cache.set(
+                    cache_key,
+                    {"fingerprint": fingerprint, "status": response.status_code, "data": response.data},
+                    timeout,
+                )
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    def replay(self, stored, fingerprint):
+        if stored["fingerprint"] != fingerprint:
+            return Response(
+                {"detail": "Idempotency-Key đã được dùng cho một request khác."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(stored["data"], status=stored["status"], headers={"Idempotent-Replayed": "true"})
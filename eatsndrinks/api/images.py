@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from drf_spectacular.utils import extend_schema_field
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Định dạng ảnh phái sinh: tên trong srcset -> (định dạng Pillow, phần mở rộng, tham số lưu)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+MANIFEST_SUFFIX = ".derivatives.json"
+MANIFEST_CACHE_PREFIX = "images:manifest"
+MISSING = "missing"  # Ghi vào cache khi chưa có manifest để không kiểm tra storage ở mỗi request
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _split_name(name):
+    stem, _ = posixpath.splitext(name)
+    return stem
+
+
+def manifest_name(name):
+    return _split_name(name) + MANIFEST_SUFFIX
+
+
+def derivative_name(name, width, extension):
+    """Ảnh phái sinh nằm cạnh ảnh gốc: product_images/a.png -> product_images/a_w320.webp"""
+    return f"{_split_name(name)}_w{width}.{extension}"
+
+
+def _manifest_cache_key(name):
+    return f"{MANIFEST_CACHE_PREFIX}:{hashlib.md5(name.encode()).hexdigest()}"
+
+
+def _save(storage, name, content):
+    # storage.save đổi tên nếu file đã tồn tại, nên xóa trước để giữ tên cố định
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def read_manifest(name, storage=default_storage):
+    """Manifest của ảnh gốc (hash nội dung và danh sách ảnh phái sinh), hoặc None nếu chưa tạo"""
+    key = _manifest_cache_key(name)
+    manifest = cache.get(key)
+    if manifest is None:
+        try:
+            with storage.open(manifest_name(name), "rb") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = MISSING
+        cache.set(key, manifest, settings.IMAGE_MANIFEST_CACHE_TIMEOUT)
+    return None if manifest == MISSING else manifest
+
+
+def _encode(image, width, image_format, options):
+    height = max(1, round(image.height * width / image.width))
+    resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+    if image_format == "JPEG" and resized.mode != "RGB":
+        resized = resized.convert("RGB")
+    elif resized.mode not in ("RGB", "RGBA"):
+        resized = resized.convert("RGBA")
+    buffer = BytesIO()
+    resized.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, storage=default_storage, force=False):
+    """
+    Tạo ảnh WebP/JPEG ở các chiều rộng IMAGE_DERIVATIVE_WIDTHS (không phóng to ảnh nhỏ).
+    Bỏ qua khi hash nội dung ảnh gốc trùng với manifest. Trả về (manifest, đã tạo mới hay không).
+    """
+    with storage.open(name, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    widths = sorted(settings.IMAGE_DERIVATIVE_WIDTHS)
+
+    manifest = read_manifest(name, storage)
+    if not force and manifest and manifest["hash"] == digest and manifest["widths_config"] == widths:
+        return manifest, False
+
+    with Image.open(BytesIO(content)) as original:
+        image = ImageOps.exif_transpose(original)
+        targets = [width for width in widths if width < image.width] or [image.width]
+        files = {}
+        for key, (image_format, extension, options) in DERIVATIVE_FORMATS.items():
+            files[key] = {}
+            for width in targets:
+                path = derivative_name(name, width, extension)
+                _save(storage, path, _encode(image, width, image_format, options))
+                files[key][str(width)] = path
+
+    if manifest:
+        # Xóa các ảnh phái sinh cũ không còn dùng (vd. ảnh gốc mới nhỏ hơn)
+        current = {path for paths in files.values() for path in paths.values()}
+        for paths in manifest["files"].values():
+            for path in paths.values():
+                if path not in current and storage.exists(path):
+                    storage.delete(path)
+
+    manifest = {"hash": digest, "widths_config": widths, "files": files}
+    _save(storage, manifest_name(name), json.dumps(manifest).encode())
+    cache.set(_manifest_cache_key(name), manifest, settings.IMAGE_MANIFEST_CACHE_TIMEOUT)
+    return manifest, True
+
+
+def delete_derivatives(name, storage=default_storage):
+    """Xóa ảnh phái sinh và manifest khi ảnh gốc bị xóa"""
+    manifest = read_manifest(name, storage)
+    if manifest:
+        for paths in manifest["files"].values():
+            for path in paths.values():
+                if storage.exists(path):
+                    storage.delete(path)
+    if storage.exists(manifest_name(name)):
+        storage.delete(manifest_name(name))
+    cache.delete(_manifest_cache_key(name))
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS, thread_name_prefix="image-derivatives"
+            )
+    return _executor
+
+
+def _generate_in_background(name, on_done):
+    try:
+        _, generated = generate_derivatives(name)
+    except FileNotFoundError:
+        logger.warning("Image %s not found, skipping derivatives", name)
+        return
+    except Exception:
+        logger.exception("Failed to generate derivatives for %s", name)
+        return
+    if generated and on_done is not None:
+        on_done()
+
+
+def schedule_derivatives(field_file, on_done=None):
+    """Tạo ảnh phái sinh trong thread pool sau khi transaction hiện tại commit"""
+    if not field_file:
+        return
+    name = field_file.name
+    transaction.on_commit(lambda: get_executor().submit(_generate_in_background, name, on_done))
+
+
+@extend_schema_field(
+    {
+        "type": "object",
+        "nullable": True,
+        "description": "Ảnh phái sinh theo định dạng và chiều rộng, vd. {\"webp\": {\"320\": url}}",
+        "additionalProperties": {"type": "object", "additionalProperties": {"type": "string"}},
+    }
+)
+class ImageSrcsetField(serializers.Field):
+    """Bản đồ srcset {định dạng: {chiều rộng: url}} của một ImageField; None khi chưa có ảnh phái sinh"""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        manifest = read_manifest(value.name, value.storage)
+        if manifest is None:
+            return None
+        request = self.context.get("request")
+        srcset = {}
+        for key, paths in manifest["files"].items():
+            srcset[key] = {}
+            for width, path in paths.items():
+                url = value.storage.url(path)
+                srcset[key][width] = request.build_absolute_uri(url) if request is not None else url
+        return srcset
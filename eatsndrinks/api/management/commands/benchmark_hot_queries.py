@@ -0,0 +1,204 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from api.benchmark import explicit_timestamps, median_ms, throwaway_database
+from catalogue.models import Category, Product
+from chatbot.models import ChatMessage, ChatSession
+from order.models import Order
+from users.models import AddressBook, User
+
+# Các chỉ mục được đo; bị xóa ở lượt "before" rồi đo lại
+HOT_INDEXES = {
+    Product: ["product_active_category_idx", "product_flash_sale_idx", "product_created_at_idx"],
+    Order: ["order_payment_created_idx", "order_user_created_idx", "order_paid_created_idx"],
+    ChatMessage: ["chatmessage_session_time_idx"],
+    AddressBook: ["addressbook_user_default_idx"],
+}
+
+BATCH_SIZE = 2000
+
+
+def bulk_create_with_ids(model, objs, key):
+    """
+    bulk_create rồi trả về các object đã có id, cùng thứ tự với objs. MySQL không trả id sau
+    bulk_create nên đọc lại theo trường `key` (giá trị không trùng nhau trong objs).
+    """
+    objs = model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    if connection.features.can_return_rows_from_bulk_insert:
+        return objs
+    keys = [getattr(obj, key) for obj in objs]
+    by_key = {getattr(obj, key): obj for obj in model.objects.filter(**{f'{key}__in': keys})}
+    return [by_key[value] for value in keys]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database with synthetic data and compare EXPLAIN plans and '
+        'latencies of the hot catalogue/order/chat queries with and without their indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--messages', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query; the median is reported')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-explain', action='store_true', help='Only print latencies')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            self.rng = random.Random(options['seed'])
+            self.now = timezone.now()
+            self.stdout.write(f'Seeding synthetic data into {connection.vendor} test database...')
+            self.seed(options)
+            queries = self.hot_queries()
+
+            after = self.measure(queries, options)
+            with connection.schema_editor() as editor:
+                for model, names in HOT_INDEXES.items():
+                    for index in model._meta.indexes:
+                        if index.name in names:
+                            editor.remove_index(model, index)
+            before = self.measure(queries, options)
+
+            self.report(queries, before, after, options)
+
+    # Dữ liệu mẫu
+
+    def seed(self, options):
+        rng, now = self.rng, self.now
+        categories = bulk_create_with_ids(Category, [Category(name=f'Danh mục {i}') for i in range(20)], 'name')
+
+        products = []
+        for i in range(options['products']):
+            product = Product(
+                name=f'Sản phẩm {i}',
+                price=Decimal(rng.randrange(10, 200) * 1000),
+                category=rng.choice(categories),
+                is_active=rng.random() < 0.9,
+                created_at=now - timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+            )
+            if rng.random() < 0.05:
+                product.flash_sale_start = now + timedelta(hours=rng.randrange(-72, 24))
+                product.flash_sale_end = product.flash_sale_start + timedelta(hours=rng.randrange(1, 48))
+                product.flash_sale_price = product.price * Decimal('0.8')
+            product.refresh_effective_price(now)
+            products.append(product)
+        with explicit_timestamps(Product._meta.get_field('created_at')):
+            Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+
+        users = bulk_create_with_ids(
+            User,
+            [
+                User(username=f'bench{i}', first_name='Bench', last_name=str(i), password='!')
+                for i in range(options['users'])
+            ],
+            'username',
+        )
+        AddressBook.objects.bulk_create(
+            (
+                AddressBook(user=user, address=f'{n} Nguyễn Huệ', is_default=n == 0)
+                for user in users for n in range(2)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        statuses = [choice for choice, _ in Order.STATUS_CHOICES]
+        orders = (
+            Order(
+                user=rng.choice(users),
+                total_price=rng.randrange(20, 500) * 1000,
+                status=rng.choice(statuses),
+                payment_status='paid' if rng.random() < 0.7 else 'pending',
+                created_at=now - timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+            )
+            for _ in range(options['orders'])
+        )
+        with explicit_timestamps(Order._meta.get_field('created_at')):
+            Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+
+        sessions = bulk_create_with_ids(
+            ChatSession,
+            [ChatSession(session_id=f'bench-{i}', user=users[i]) for i in range(max(len(users) // 2, 1))],
+            'session_id',
+        )
+        messages = (
+            ChatMessage(
+                session=rng.choice(sessions),
+                message_type=rng.choice(['user', 'bot']),
+                content='Xin chào',
+                timestamp=now - timedelta(seconds=rng.randrange(90 * 24 * 3600)),
+            )
+            for _ in range(options['messages'])
+        )
+        with explicit_timestamps(ChatMessage._meta.get_field('timestamp')):
+            ChatMessage.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+
+        self.category = categories[0]
+        self.user = users[len(users) // 2]
+        self.session = sessions[0]
+
+    def hot_queries(self):
+        month_start = self.now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return [
+            ('Active products in category',
+             Product.objects.filter(is_active=True, category=self.category).order_by('id')[:20]),
+            ('Flash sale products now',
+             Product.objects.filter(is_active=True).flash_sale_active(self.now)),
+            ('Newest products',
+             Product.objects.order_by('-created_at')[:20]),
+            ('Paid revenue this month',
+             Order.objects.filter(payment_status='paid', created_at__gte=month_start)
+             .values('payment_status').annotate(revenue=Sum('total_price'))),
+            ('Pending orders this month',
+             Order.objects.filter(payment_status='pending', created_at__gte=month_start)
+             .order_by('-created_at')[:20]),
+            ('User order history',
+             Order.objects.filter(user=self.user).order_by('-created_at')[:10]),
+            ('Chat session history',
+             ChatMessage.objects.filter(session=self.session).order_by('-timestamp')[:20]),
+            ('Default address',
+             AddressBook.objects.filter(user=self.user, is_default=True)[:1]),
+        ]
+
+    # Đo đạc
+
+    def analyze(self):
+        """Cập nhật thống kê để planner chọn kế hoạch như trên dữ liệu thật"""
+        tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in HOT_INDEXES)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(f'ANALYZE TABLE {tables}')
+                cursor.fetchall()
+            else:
+                cursor.execute('ANALYZE')
+
+    def measure(self, queries, options):
+        self.analyze()
+        results = []
+        for _, queryset in queries:
+            # .all() để không dùng lại cache kết quả của queryset
+            elapsed = median_ms(lambda: list(queryset.all()), options['repeat'])
+            plan = '' if options['no_explain'] else queryset.explain()
+            results.append((elapsed, plan))
+        return results
+
+    def report(self, queries, before, after, options):
+        self.stdout.write('')
+        for (label, _), (before_ms, before_plan), (after_ms, after_plan) in zip(queries, before, after):
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f'  before: {before_ms:8.3f} ms   after: {after_ms:8.3f} ms   ({speedup:.1f}x)')
+            if not options['no_explain']:
+                self.stdout.write('  plan before:')
+                self.stdout.write('    ' + before_plan.replace('\n', '\n    '))
+                self.stdout.write('  plan after:')
+                self.stdout.write('    ' + after_plan.replace('\n', '\n    '))
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark finished, test database dropped'))
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.images import generate_derivatives
+from catalogue.cache import bump_catalogue_version
+from catalogue.models import Product, ProductImage
+from restaurants.models import Restaurant
+
+IMAGE_FIELDS = [
+    (Product, 'mainimage'),
+    (ProductImage, 'image'),
+    (Restaurant, 'mainimage'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Backfill WebP/JPEG derivatives for existing product and restaurant images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_DERIVATIVE_WORKERS * 2)
+        parser.add_argument('--force', action='store_true', help='Re-encode even if the image content is unchanged')
+
+    def handle(self, *args, **options):
+        names = set()
+        for model, field in IMAGE_FIELDS:
+            names.update(
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list(field, flat=True).distinct()
+            )
+        self.stdout.write(f'Processing {len(names)} images with {options["workers"]} workers...')
+
+        def process(name):
+            try:
+                _, generated = generate_derivatives(name, force=options['force'])
+                return name, 'generated' if generated else 'skipped', None
+            except FileNotFoundError:
+                return name, 'missing', None
+            except Exception as e:
+                return name, 'failed', e
+
+        counts = {'generated': 0, 'skipped': 0, 'missing': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for name, result, error in executor.map(process, sorted(names)):
+                counts[result] += 1
+                if result == 'missing':
+                    self.stderr.write(f'Missing file: {name}')
+                elif result == 'failed':
+                    self.stderr.write(f'Failed {name}: {error}')
+
+        if counts['generated']:
+            bump_catalogue_version()  # Phản hồi đã cache chưa có srcset của ảnh mới tạo
+        self.stdout.write(self.style.SUCCESS(
+            '✅ {generated} generated, {skipped} unchanged, {missing} missing, {failed} failed'.format(**counts)
+        ))
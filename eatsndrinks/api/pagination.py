@@ -0,0 +1,126 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+APPROXIMATE_COUNT_TIMEOUT = 60  # Giây giữ kết quả đếm trong cache
+
+
+def approximate_count(queryset):
+    """
+    Đếm gần đúng số bản ghi của queryset.
+    Với queryset không có điều kiện lọc thì đọc số dòng ước lượng từ thống kê của
+    MySQL/PostgreSQL; các trường hợp còn lại đếm thật và giữ kết quả trong cache một lúc.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                cursor.execute(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [table],
+                )
+                row = cursor.fetchone()
+                if row and row[0] is not None:
+                    return int(row[0])
+            elif connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+                row = cursor.fetchone()
+                if row and row[0] >= 0:
+                    return int(row[0])
+
+    sql, params = queryset.query.sql_with_params()
+    key = "approx-count:" + hashlib.md5(f"{sql}{params}".encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, APPROXIMATE_COUNT_TIMEOUT)
+    return count
+
+
+class OptInCursorPagination(PageNumberPagination):
+    """
+    Phân trang theo số trang như trước; khi request có tham số `cursor` (để rỗng ở trang đầu)
+    thì chuyển sang phân trang keyset theo `cursor_ordering`, không chạy COUNT(*) và OFFSET.
+    Với follow_queryset_ordering, thứ tự mà view đã đặt trên queryset (vd. theo giá hoặc độ liên
+    quan, kèm id để phân định) được dùng làm khóa cursor thay cho cursor_ordering.
+    Thêm `count=approx` để nhận kèm số bản ghi gần đúng.
+    """
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    cursor_ordering = ("-created_at", "-id")
+    cursor_page_size = None  # Mặc định dùng page_size
+    count_query_param = "count"
+    follow_queryset_ordering = False
+
+    cursor_paginator = None
+
+    def get_cursor_ordering(self, queryset):
+        if self.follow_queryset_ordering and queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return self.cursor_ordering
+
+    def get_cursor_paginator(self, queryset):
+        paginator = CursorPagination()
+        paginator.cursor_query_param = self.cursor_query_param
+        paginator.ordering = self.get_cursor_ordering(queryset)
+        paginator.page_size = self.cursor_page_size or self.page_size
+        paginator.page_size_query_param = self.page_size_query_param or "page_size"
+        paginator.max_page_size = self.max_page_size
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if self.cursor_query_param not in request.query_params:
+            self.cursor_paginator = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_paginator = self.get_cursor_paginator(queryset)
+        self.cursor_queryset = queryset
+        return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            payload = {
+                "next": self.cursor_paginator.get_next_link(),
+                "previous": self.cursor_paginator.get_previous_link(),
+                "results": data,
+            }
+            if self.request.query_params.get(self.count_query_param) == "approx":
+                payload = {"count": approximate_count(self.cursor_queryset), **payload}
+            return Response(payload)
+
+        return Response(
+            {
+                "count": self.page.paginator.count,
+                "total_pages": self.page.paginator.num_pages,  # Add total pages here
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.extend([
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Bật phân trang keyset; để rỗng cho trang đầu, sau đó dùng link next/previous.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Chỉ dùng với cursor: 'approx' để trả kèm số bản ghi gần đúng.",
+                "schema": {"type": "string", "enum": ["approx"]},
+            },
+        ])
+        return parameters
@@ -0,0 +1,83 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_QUERY_PARAM = "fields"
+
+
+def requested_fields(request):
+    """Tập trường client yêu cầu qua ?fields=id,name,... hoặc None nếu không giới hạn"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    value = request.query_params.get(FIELDS_QUERY_PARAM)
+    if not value:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def _check_fields(selected, available):
+    unknown = selected - set(available)
+    if unknown:
+        raise serializers.ValidationError(
+            {FIELDS_QUERY_PARAM: [f"Trường không hợp lệ: {', '.join(sorted(unknown))}."]}
+        )
+
+
+class SparseFieldsetMixin:
+    """
+    Cho phép client chọn trường trả về bằng ?fields=id,name,current_price.
+    Các trường không được chọn bị loại trước khi serialize nên SerializerMethodField
+    và serializer lồng nhau của chúng không chạy. Chỉ áp dụng cho serializer gốc của
+    request đọc; có thể truyền trực tiếp `fields=` khi khởi tạo.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._sparse_fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self._sparse_fields
+        if selected is None and self._is_root():
+            selected = requested_fields(self.context.get("request"))
+        if selected is None:
+            return fields
+
+        _check_fields(selected, fields)
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+class CompactListSerializer:
+    """
+    Serializer chỉ đọc cho danh sách lớn: dựng dict trực tiếp từ queryset.values()
+    thay vì qua các Field của DRF. Lớp con khai báo value_fields, fields và build().
+    Cũng hỗ trợ ?fields= như SparseFieldsetMixin.
+    """
+
+    value_fields = ()  # Các cột lấy bằng values()
+    fields = ()  # Các khóa của dict trả về
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+        self.selected = requested_fields(self.context.get("request"))
+        if self.selected is not None:
+            _check_fields(self.selected, self.fields)
+
+    @classmethod
+    def get_queryset(cls, queryset):
+        # values() không dùng được với prefetch_related nên bỏ các prefetch của queryset gốc
+        return queryset.prefetch_related(None).values(*cls.value_fields)
+
+    def build(self, rows):
+        raise NotImplementedError
+
+    @property
+    def data(self):
+        data = self.build(self.rows)
+        if self.selected is None:
+            return data
+        return [{key: value for key, value in row.items() if key in self.selected} for row in data]
@@ -1,3 +1,218 @@
-from django.test import TestCase
+import random
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework import status
+from cart.views import AddToCartView
+from chatbot.models import ChatMessage
+from catalogue.models import Product, ProductImage
+from .management.commands.benchmark_hot_queries import Command as BenchmarkHotQueriesCommand
+from .images import derivative_name, generate_derivatives, manifest_name
+from order.models import Order
+from users.models import User
 
-# Create your tests here.
+
+class OptInCursorPaginationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', password='adminpass123', first_name='Ad', last_name='Min', is_staff=True
+        )
+        self.products = [Product.objects.create(name=f'Món {i}', price=10000 + i) for i in range(5)]
+
+    def walk(self, url, params):
+        """Đi hết các trang theo link next, trả về danh sách id theo thứ tự"""
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            response = self.client.get(response.data['next'])
+
+    def test_page_number_mode_is_unchanged(self):
+        response = self.client.get('/catalogue/products/', {'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['total_pages'], 3)
+
+    def test_cursor_mode_walks_products_in_id_order(self):
+        ids, response = self.walk('/catalogue/products/', {'cursor': '', 'page_size': 2})
+        self.assertEqual(ids, [p.id for p in self.products])
+        self.assertNotIn('count', response.data)
+        self.assertNotIn('total_pages', response.data)
+
+    def test_cursor_mode_keeps_price_and_search_order(self):
+        # Giá không cùng thứ tự với id, có hai sản phẩm cùng giá để kiểm tra phần phân định theo id
+        prices = [30000, 10000, 20000, 10000, 25000]
+        for product, price in zip(self.products, prices):
+            product.price = price
+            product.save()
+        by_price = [p.id for p in sorted(self.products, key=lambda p: (p.price, p.id))]
+        ids, _ = self.walk('/catalogue/products/', {'cursor': '', 'page_size': 2, 'ordering': 'price'})
+        self.assertEqual(ids, by_price)
+        ids, _ = self.walk('/catalogue/products/', {'cursor': '', 'page_size': 2, 'ordering': '-price'})
+        self.assertEqual(ids, [p.id for p in sorted(self.products, key=lambda p: (-p.price, p.id))])
+
+        milk = Product.objects.create(name='Món sữa', description='Món sữa tươi, món ngon', price=1)
+        expected = self.client.get('/catalogue/products/', {'search': 'mon', 'page_size': 100}).data['results']
+        self.assertEqual(expected[0]['id'], milk.id)
+        ids, _ = self.walk('/catalogue/products/', {'cursor': '', 'page_size': 2, 'search': 'mon'})
+        self.assertEqual(ids, [item['id'] for item in expected])
+
+    def test_cursor_mode_with_approximate_count(self):
+        response = self.client.get('/catalogue/products/', {'cursor': '', 'page_size': 2, 'count': 'approx'})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_cursor_mode_on_admin_orders_is_newest_first(self):
+        orders = [Order.objects.create(user=self.admin, total_price=i) for i in range(4)]
+        self.client.force_authenticate(self.admin)
+        ids, _ = self.walk('/order/admin/orders/', {'cursor': '', 'page_size': 3})
+        self.assertEqual(ids, [o.id for o in reversed(orders)])
+
+    def test_user_list_is_unpaginated_without_cursor(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/users/admin/users/')
+        self.assertIsInstance(response.data, list)
+
+        ids, _ = self.walk('/users/admin/users/', {'cursor': '', 'page_size': 1})
+        self.assertEqual(ids, [self.admin.id])
+
+
+def make_image(width, height, color='red', image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=[320, 640, 1024])
+class ImageDerivativeTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.name = default_storage.save('product_images/pho.png', SimpleUploadedFile('pho.png', make_image(800, 400)))
+
+    def test_generates_webp_and_jpeg_without_upscaling(self):
+        manifest, generated = generate_derivatives(self.name)
+        self.assertTrue(generated)
+        self.assertEqual(sorted(manifest['files']), ['jpeg', 'webp'])
+        self.assertEqual(sorted(manifest['files']['webp']), ['320', '640'])
+        with default_storage.open(derivative_name(self.name, 320, 'webp')) as f:
+            self.assertEqual(Image.open(f).size, (320, 160))
+        self.assertTrue(default_storage.exists(manifest_name(self.name)))
+
+    def test_unchanged_content_is_not_reencoded(self):
+        generate_derivatives(self.name)
+        self.assertFalse(generate_derivatives(self.name)[1])
+
+        default_storage.delete(self.name)
+        default_storage.save(self.name, SimpleUploadedFile('pho.png', make_image(300, 300, 'blue')))
+        manifest, generated = generate_derivatives(self.name)
+        self.assertTrue(generated)
+        self.assertEqual(list(manifest['files']['jpeg']), ['300'])
+        self.assertFalse(default_storage.exists(derivative_name(self.name, 640, 'jpg')))
+
+    def test_serializers_expose_srcset(self):
+        product = Product.objects.create(name='Phở', price=50000)
+        ProductImage.objects.create(product=product, image=self.name)
+        response = self.client.get(f'/catalogue/products/{product.id}/')
+        self.assertIsNone(response.data['mainimage_srcset'])
+        self.assertIsNone(response.data['images'][0]['srcset'])
+
+        call_command('generate_image_derivatives', stdout=StringIO())
+        response = self.client.get(f'/catalogue/products/{product.id}/')
+        srcset = response.data['images'][0]['srcset']
+        self.assertTrue(srcset['webp']['640'].endswith('/media/product_images/pho_w640.webp'))
+        self.assertTrue(srcset['jpeg']['320'].startswith('http://testserver/'))
+
+
+class IdempotencyKeyTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='khach', password='pass12345', first_name='A', last_name='B')
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name='Trà', price=20000)
+
+    def add_to_cart(self, key, quantity=1):
+        return self.client.post(
+            '/cart/add/', {'product': self.product.id, 'quantity': quantity}, HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retried_order_is_created_once(self):
+        self.add_to_cart('cart-1')
+        first = self.client.post('/order/create', {'address': 'Q1'}, HTTP_IDEMPOTENCY_KEY='order-1')
+        with self.assertNumQueries(0):
+            retry = self.client.post('/order/create', {'address': 'Q1'}, HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_retried_add_to_cart_does_not_add_twice(self):
+        self.add_to_cart('cart-1', 2)
+        response = self.add_to_cart('cart-1', 2)
+        self.assertEqual(response.data['quantity'], 2)
+        response = self.add_to_cart('cart-2', 2)
+        self.assertEqual(response.data['quantity'], 4)
+
+    def test_raised_client_errors_are_replayed(self):
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        first = self.add_to_cart('cart-1')
+        self.assertEqual(first.status_code, status.HTTP_404_NOT_FOUND)
+        # Sản phẩm bán lại sau đó, nhưng request gửi lại với cùng key vẫn nhận kết quả cũ
+        Product.objects.filter(pk=self.product.pk).update(is_active=True)
+        retry = self.add_to_cart('cart-1')
+        self.assertEqual(retry.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_key_reused_with_different_body_is_rejected(self):
+        self.add_to_cart('cart-1', 1)
+        self.assertEqual(self.add_to_cart('cart-1', 5).status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_concurrent_duplicate_gets_conflict(self):
+        # Giữ khóa như thể request đầu tiên với cùng key vẫn đang chạy
+        request = SimpleNamespace(user=self.user, path='/cart/add/')
+        cache.add(AddToCartView().get_idempotency_cache_key(request, 'cart-1') + ':lock', True)
+        self.assertEqual(self.add_to_cart('cart-1').status_code, status.HTTP_409_CONFLICT)
+
+    def test_keys_are_scoped_per_user(self):
+        self.add_to_cart('shared', 1)
+        other = User.objects.create_user(username='khac', password='pass12345', first_name='C', last_name='D')
+        self.client.force_authenticate(other)
+        response = self.add_to_cart('shared', 1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+
+class BenchmarkSeedTest(TestCase):
+    def test_seed_links_rows_when_bulk_create_returns_no_ids(self):
+        command = BenchmarkHotQueriesCommand()
+        command.rng, command.now = random.Random(1), timezone.now()
+        options = {'products': 30, 'users': 6, 'orders': 20, 'messages': 20}
+        # Như MySQL: bulk_create không gán id cho các object
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            command.seed(options)
+        self.assertEqual(command.category.name, 'Danh mục 0')
+        self.assertEqual(Product.objects.filter(category__isnull=True).count(), 0)
+        self.assertEqual(command.user.username, 'bench3')
+        self.assertEqual(Order.objects.filter(user__isnull=True).count(), 0)
+        self.assertEqual(command.session.user.username, 'bench0')
+        self.assertEqual(ChatMessage.objects.count(), 20)
@@ -0,0 +1,50 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmark import throwaway_database
+from cart.storage import CacheCartStore, DatabaseCartStore
+from catalogue.models import Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compare add-to-cart throughput of the database and cache-backed cart stores on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--adds', type=int, default=50, help='Add-to-cart calls per user')
+        parser.add_argument('--products', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            products = Product.objects.bulk_create(
+                Product(name=f'Sản phẩm {i}', price=Decimal(10000 + i), effective_price=Decimal(10000 + i))
+                for i in range(options['products'])
+            )
+            users = [
+                User.objects.create_user(username=f'bench{i}', password='bench12345')
+                for i in range(options['users'])
+            ]
+
+            self.stdout.write(f'{"store":>10} {"adds/s":>10} {"queries":>8} {"flush ms":>10}')
+            for name, store in (('database', DatabaseCartStore()), ('cache', CacheCartStore())):
+                for user in users:
+                    store.clear(user)
+                    store.flush(user)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for n in range(options['adds']):
+                        for user in users:
+                            store.add(user, products[n % len(products)].id, 1)
+                    elapsed = time.perf_counter() - started
+                # Ghi xuống DB phần còn giữ trong cache (store database không có gì để ghi)
+                started = time.perf_counter()
+                for user in users:
+                    store.flush(user)
+                flush_ms = (time.perf_counter() - started) * 1000
+                adds = options['adds'] * len(users)
+                self.stdout.write(f'{name:>10} {adds / elapsed:>10.0f} {len(queries):>8} {flush_ms:>10.2f}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from cart.storage import CacheCartStore, get_cart_store
+
+
+class Command(BaseCommand):
+    help = 'Write carts held in the cache-backed cart store down to the database'
+
+    def handle(self, *args, **options):
+        store = get_cart_store()
+        if not isinstance(store, CacheCartStore):
+            self.stdout.write('CART_STORE writes straight to the database; nothing to flush.')
+            return
+        self.stdout.write('Flushing carts...')
+        count = store.flush_dirty()
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Flushed {count} carts')
+        )
@@ -1,4 +1,8 @@
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .storage import CartStoreBusy
 
 class CustomPermissionMixin:
     def get_permissions(self):
@@ -12,4 +16,21 @@ class CustomPermissionMixin:
             permission_classes = []  # Phân quyền cho các phương thức khác nếu cần
 
         return [permission() for permission in permission_classes]
-    
\ No newline at end of file
+
+
+class CartStoreBusyMixin:
+    """
+    Giỏ hàng của user đang bị khóa quá lâu (vd. đang đặt hàng ở tab khác): trả 503 kèm Retry-After
+    thay vì lỗi 500. Như mọi lỗi 5xx, phản hồi này không được lưu theo Idempotency-Key.
+    """
+
+    retry_after = 1  # Giây
+
+    def handle_exception(self, exc):
+        if isinstance(exc, CartStoreBusy):
+            return Response(
+                {"detail": "Giỏ hàng đang được cập nhật ở nơi khác, vui lòng thử lại sau."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        return super().handle_exception(exc)
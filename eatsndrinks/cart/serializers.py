@@ -6,6 +6,7 @@ from decimal import Decimal
 
 from rest_framework import serializers
 from .models import Cart, CartItem
+from .storage import OPERATIONS, REMOVE
 from catalogue.models import Product
 
 
@@ -39,4 +40,39 @@ class CartSerializer(serializers.ModelSerializer):
 class CartItemQuantitySerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
-        fields = ["quantity"]  # Chỉ lấy trường quantity
\ No newline at end of file
+        fields = ["quantity"]  # Chỉ lấy trường quantity
+
+
+class QuantitySerializer(serializers.Serializer):
+    """Số lượng gửi lên khi thêm sản phẩm, thêm combo hoặc đổi số lượng một dòng trong giỏ"""
+
+    quantity = serializers.IntegerField(
+        min_value=1,
+        default=1,
+        error_messages={"invalid": "Số lượng phải là số nguyên.", "min_value": "Số lượng phải ít nhất là 1."},
+    )
+
+
+MAX_BATCH_OPERATIONS = 100
+
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)  # Bỏ qua với op "remove"
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """Danh sách thao tác add/set/remove được áp dụng theo thứ tự trong một transaction"""
+
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_OPERATIONS)
+
+    def validate_operations(self, operations):
+        # Kiểm tra mọi sản phẩm bằng một truy vấn thay vì một truy vấn cho mỗi thao tác.
+        # Sản phẩm đã ngừng bán không được thêm vào giỏ (vẫn xóa được khỏi giỏ)
+        product_ids = {operation["product"] for operation in operations if operation["op"] != REMOVE}
+        found = set(Product.objects.filter(pk__in=product_ids, is_active=True).values_list("id", flat=True))
+        missing = sorted(product_ids - found)
+        if missing:
+            raise serializers.ValidationError(f"Sản phẩm không tồn tại hoặc đã ngừng bán: {missing}")
+        return [(operation["op"], operation["product"], operation["quantity"]) for operation in operations]
@@ -0,0 +1,370 @@
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from users.models import User
+from .models import Cart, CartItem
+
+
+ADD, SET, REMOVE = "add", "set", "remove"
+OPERATIONS = (ADD, SET, REMOVE)
+
+
+class CartStoreBusy(Exception):
+    """Không lấy được khóa giỏ hàng của user trong thời gian cho phép"""
+
+
+class CartLine:
+    """Một dòng giỏ hàng: sản phẩm, số lượng và id CartItem (None khi chưa được ghi xuống DB)"""
+
+    __slots__ = ("id", "product_id", "quantity", "product")
+
+    def __init__(self, product_id, quantity, item_id=None):
+        self.id = item_id
+        self.product_id = product_id
+        self.quantity = quantity
+        self.product = None  # Gắn Product khi cần serialize
+
+
+def apply_operations(items, operations):
+    """Áp dụng lần lượt các thao tác (op, product_id, số lượng) lên {product_id: số lượng}"""
+    for op, product_id, quantity in operations:
+        if op == ADD:
+            items[product_id] = items.get(product_id, 0) + quantity
+        elif op == SET:
+            items[product_id] = quantity
+        else:
+            items.pop(product_id, None)
+    return items
+
+
+def write_items(cart_id, items, existing):
+    """
+    Đưa CartItem của giỏ về đúng {product_id: số lượng} bằng tối đa một DELETE, một bulk_update
+    và một bulk_create. `existing` là {product_id: CartItem} đã đọc trong cùng transaction.
+    Trả về {product_id: id CartItem}.
+    """
+    removed = [item.pk for product_id, item in existing.items() if product_id not in items]
+    if removed:
+        CartItem.objects.filter(pk__in=removed).delete()
+    changed = []
+    for product_id, item in existing.items():
+        if product_id in items and item.quantity != items[product_id]:
+            item.quantity = items[product_id]
+            changed.append(item)
+    CartItem.objects.bulk_update(changed, ["quantity"])
+    created = CartItem.objects.bulk_create(
+        CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity)
+        for product_id, quantity in items.items()
+        if product_id not in existing
+    )
+    if created and not connection.features.can_return_rows_from_bulk_insert:
+        created = CartItem.objects.filter(cart_id=cart_id, product_id__in=items).exclude(product_id__in=existing)
+    return {
+        product_id: item.pk
+        for product_id, item in [*existing.items(), *((item.product_id, item) for item in created)]
+        if product_id in items
+    }
+
+
+class BaseCartStore:
+    """
+    Giao diện lưu giỏ hàng theo user, mỗi sản phẩm một dòng. Cart/CartItem trong DB luôn là nơi
+    lưu chính thức; store có thể giữ thay đổi ở nơi khác rồi ghi xuống sau (flush).
+    """
+
+    def lines(self, user, persisted=False):
+        """(cart_id, [CartLine]) theo thứ tự thêm vào; persisted=True đảm bảo mọi dòng đã có id"""
+        raise NotImplementedError
+
+    def quantities(self, user):
+        """{product_id: số lượng}"""
+        _, lines = self.lines(user)
+        return {line.product_id: line.quantity for line in lines}
+
+    def add(self, user, product_id, quantity):
+        """Cộng dồn số lượng một cách nguyên tử, trả về CartLine sau khi cộng"""
+        raise NotImplementedError
+
+    def set_quantity(self, user, product_id, quantity):
+        raise NotImplementedError
+
+    def remove(self, user, product_id):
+        """Xóa một sản phẩm khỏi giỏ, trả về False nếu sản phẩm không có trong giỏ"""
+        raise NotImplementedError
+
+    def clear(self, user):
+        raise NotImplementedError
+
+    def apply(self, user, operations, persisted=False):
+        """
+        Áp dụng một loạt thao tác (op, product_id, số lượng) với op thuộc OPERATIONS như một thao
+        tác duy nhất, trả về (cart_id, [CartLine]) sau khi áp dụng
+        """
+        raise NotImplementedError
+
+    def find_product(self, user, item_id):
+        """product_id của dòng có id CartItem là item_id, hoặc None"""
+        _, lines = self.lines(user, persisted=True)
+        for line in lines:
+            if line.id == item_id:
+                return line.product_id
+        return None
+
+    def flush(self, user):
+        """Ghi các thay đổi đang giữ của user xuống Cart/CartItem"""
+
+    def invalidate(self, user):
+        """Bỏ bản sao đang giữ để lần đọc sau lấy lại từ DB (vd. sau khi đặt hàng)"""
+
+    @contextmanager
+    def checkout(self, user):
+        """
+        Bao quanh việc đặt hàng: ghi giỏ hàng xuống DB trước, và nếu đặt hàng thành công thì bỏ
+        bản sao đang giữ. Store giữ thay đổi ngoài DB phải chặn mọi thay đổi khác trong suốt quá
+        trình, nếu không món vừa thêm sẽ bị mất khi bỏ bản sao.
+        """
+        self.flush(user)
+        yield
+        self.invalidate(user)
+
+
+class DatabaseCartStore(BaseCartStore):
+    """Đọc/ghi trực tiếp Cart/CartItem qua ORM"""
+
+    def _cart(self, user):
+        cart, _ = Cart.objects.get_or_create(user=user)
+        return cart
+
+    def lines(self, user, persisted=False):
+        cart = self._cart(user)
+        items = CartItem.objects.filter(cart=cart).order_by("id").values_list("id", "product_id", "quantity")
+        return cart.id, [CartLine(product_id, quantity, item_id) for item_id, product_id, quantity in items]
+
+    def add(self, user, product_id, quantity):
+        with transaction.atomic():
+            cart = self._cart(user)
+            item, created = CartItem.objects.get_or_create(
+                cart=cart, product_id=product_id, defaults={"quantity": quantity}
+            )
+            if not created:
+                # Cộng trong câu UPDATE để hai request đồng thời không ghi đè nhau
+                CartItem.objects.filter(pk=item.pk).update(quantity=F("quantity") + quantity)
+                item.refresh_from_db(fields=["quantity"])
+        return CartLine(product_id, item.quantity, item.id)
+
+    def set_quantity(self, user, product_id, quantity):
+        with transaction.atomic():
+            cart = self._cart(user)
+            item, created = CartItem.objects.get_or_create(
+                cart=cart, product_id=product_id, defaults={"quantity": quantity}
+            )
+            if not created:
+                CartItem.objects.filter(pk=item.pk).update(quantity=quantity)
+        return CartLine(product_id, quantity, item.id)
+
+    def remove(self, user, product_id):
+        deleted, _ = CartItem.objects.filter(cart__user=user, product_id=product_id).delete()
+        return deleted > 0
+
+    def clear(self, user):
+        CartItem.objects.filter(cart__user=user).delete()
+
+    def apply(self, user, operations, persisted=False):
+        with transaction.atomic():
+            # Khóa giỏ để hai batch đồng thời không ghi đè nhau, rồi đọc CartItem đúng một lần
+            cart, _ = Cart.objects.select_for_update().get_or_create(user=user)
+            existing = {item.product_id: item for item in CartItem.objects.filter(cart=cart).order_by("id")}
+            items = apply_operations({product_id: item.quantity for product_id, item in existing.items()}, operations)
+            ids = write_items(cart.id, items, existing)
+        return cart.id, [CartLine(product_id, quantity, ids[product_id]) for product_id, quantity in items.items()]
+
+    def find_product(self, user, item_id):
+        return CartItem.objects.filter(pk=item_id, cart__user=user).values_list("product_id", flat=True).first()
+
+
+class CacheCartStore(BaseCartStore):
+    """
+    Giữ giỏ hàng của mỗi user trong cache như một hash {product_id: số lượng} và ghi xuống
+    Cart/CartItem sau (write-behind): khi thanh toán, khi cần id của dòng, hoặc định kỳ bằng
+    lệnh flush_carts. Mọi thay đổi của một user được tuần tự hóa bằng khóa cache.add nên cộng
+    dồn là nguyên tử giữa các tiến trình dùng chung cache. Khóa ghi một token riêng của người
+    giữ và chỉ được người đó xóa, nên khóa đã hết hạn và bị request khác lấy lại không bị xóa nhầm.
+
+    CART_STORE_CACHE chọn cache: LocMemCache mặc định chỉ dùng được khi chạy một tiến trình
+    (vd. phát triển, benchmark); môi trường nhiều worker cần cache dùng chung như Redis và
+    không được tự xóa key khi đầy, nếu không thay đổi chưa ghi xuống sẽ mất.
+    """
+
+    key_prefix = "cart:store"
+    lock_wait = 0.005  # Giây giữa hai lần thử lấy khóa
+
+    def __init__(self):
+        self.cache = caches[settings.CART_STORE_CACHE]
+        self.lock_timeout = settings.CART_STORE_LOCK_TIMEOUT
+        self.checkout_lock_timeout = settings.CART_STORE_CHECKOUT_LOCK_TIMEOUT
+
+    # Khóa và trạng thái
+
+    def _key(self, user):
+        return f"{self.key_prefix}:{user.pk}"
+
+    @contextmanager
+    def _locked(self, key, timeout=None):
+        """
+        Chờ tối đa lock_timeout giây để lấy khóa; khóa tự hết hạn sau `timeout` giây (mặc định
+        lock_timeout) nếu tiến trình giữ khóa bị dừng giữa chừng
+        """
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        while not self.cache.add(lock_key, token, timeout or self.lock_timeout):
+            if time.monotonic() >= deadline:
+                raise CartStoreBusy(key)
+            time.sleep(self.lock_wait)
+        try:
+            yield
+        finally:
+            # Khóa đã hết hạn có thể đang thuộc về request khác
+            if self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+    def _load(self, user):
+        """
+        Trạng thái giỏ hàng: {"cart_id", "items": {product_id: số lượng}, "ids": {product_id: item_id},
+        "dirty"}. Lần đầu đọc từ DB.
+        """
+        key = self._key(user)
+        state = self.cache.get(key)
+        if state is None:
+            cart, _ = Cart.objects.get_or_create(user=user)
+            rows = CartItem.objects.filter(cart=cart).order_by("id").values_list("id", "product_id", "quantity")
+            state = {"cart_id": cart.id, "items": {}, "ids": {}, "dirty": False}
+            for item_id, product_id, quantity in rows:
+                state["items"][product_id] = quantity
+                state["ids"][product_id] = item_id
+            # add() không ghi đè nếu một thay đổi khác vừa lưu trạng thái mới hơn
+            if not self.cache.add(key, state, None):
+                state = self.cache.get(key, state)
+        return state
+
+    def _save(self, user, state):
+        self.cache.set(self._key(user), state, None)
+
+    def _mark_dirty(self, user, state):
+        if not state["dirty"]:
+            state["dirty"] = True
+            self._update_dirty_users(lambda users: users | {user.pk})
+
+    def _update_dirty_users(self, change):
+        key = f"{self.key_prefix}:dirty"
+        with self._locked(key):
+            self.cache.set(key, change(self.cache.get(key, frozenset())), None)
+
+    @contextmanager
+    def _mutate(self, user):
+        with self._locked(self._key(user)):
+            state = self._load(user)
+            yield state
+            self._mark_dirty(user, state)
+            self._save(user, state)
+
+    def _line(self, state, product_id):
+        return CartLine(product_id, state["items"][product_id], state["ids"].get(product_id))
+
+    # Đọc/ghi
+
+    def lines(self, user, persisted=False):
+        if persisted:
+            self.flush(user)
+        state = self._load(user)
+        return state["cart_id"], [self._line(state, product_id) for product_id in state["items"]]
+
+    def add(self, user, product_id, quantity):
+        with self._mutate(user) as state:
+            state["items"][product_id] = state["items"].get(product_id, 0) + quantity
+        return self._line(state, product_id)
+
+    def set_quantity(self, user, product_id, quantity):
+        with self._mutate(user) as state:
+            state["items"][product_id] = quantity
+        return self._line(state, product_id)
+
+    def remove(self, user, product_id):
+        with self._mutate(user) as state:
+            found = state["items"].pop(product_id, None) is not None
+        return found
+
+    def clear(self, user):
+        with self._mutate(user) as state:
+            state["items"].clear()
+
+    def apply(self, user, operations, persisted=False):
+        with self._mutate(user) as state:
+            apply_operations(state["items"], operations)
+        if persisted:
+            return self.lines(user, persisted=True)
+        return state["cart_id"], [self._line(state, product_id) for product_id in state["items"]]
+
+    def find_product(self, user, item_id):
+        # id đã biết thì không cần ghi xuống DB; chỉ flush khi dòng chưa có id
+        for product_id, known_id in self._load(user)["ids"].items():
+            if known_id == item_id:
+                return product_id
+        return super().find_product(user, item_id)
+
+    def flush(self, user):
+        with self._locked(self._key(user)):
+            self._flush_locked(user)
+
+    def _flush_locked(self, user):
+        state = self._load(user)
+        if not state["dirty"]:
+            return
+        self._write(state)
+        state["dirty"] = False
+        self._save(user, state)
+        self._update_dirty_users(lambda users: users - {user.pk})
+
+    def _write(self, state):
+        """Ghi phần khác biệt giữa hash và CartItem trong DB, cập nhật lại id của các dòng"""
+        with transaction.atomic():
+            existing = {item.product_id: item for item in CartItem.objects.filter(cart_id=state["cart_id"])}
+            state["ids"] = write_items(state["cart_id"], state["items"], existing)
+
+    def flush_dirty(self):
+        """Ghi xuống DB giỏ hàng của mọi user còn thay đổi chưa lưu, trả về số giỏ đã ghi"""
+        user_ids = self.cache.get(f"{self.key_prefix}:dirty", frozenset())
+        users = User.objects.filter(pk__in=user_ids)
+        for user in users:
+            self.flush(user)
+        return len(users)
+
+    def invalidate(self, user):
+        with self._locked(self._key(user)):
+            self._invalidate_locked(user)
+
+    def _invalidate_locked(self, user):
+        self.cache.delete(self._key(user))
+        self._update_dirty_users(lambda users: users - {user.pk})
+
+    @contextmanager
+    def checkout(self, user):
+        # Giữ khóa của user từ lúc ghi xuống tới lúc bỏ bản sao: add() từ tab khác phải chờ,
+        # rồi áp dụng lên giỏ đọc lại từ DB sau khi đặt hàng thay vì bị xóa cùng bản sao cũ.
+        # Khóa sống lâu hơn nhiều so với transaction đặt hàng để không hết hạn giữa chừng
+        with self._locked(self._key(user), timeout=self.checkout_lock_timeout):
+            self._flush_locked(user)
+            yield
+            self._invalidate_locked(user)
+
+
+def get_cart_store():
+    """Store giỏ hàng theo settings.CART_STORE"""
+    return import_string(settings.CART_STORE)()
@@ -1,3 +1,274 @@
-from django.test import TestCase
+import time
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from catalogue.models import Product, ProductCombo, ProductComboItem
+from order.models import Order, OrderDetail
+from order.services import price_cart
+from users.models import User
+from .models import Cart, CartItem
+from .storage import CacheCartStore, CartStoreBusy, get_cart_store
 
-# Create your tests here.
+
+class ApplicableCombosTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='khach', password='pass12345', first_name='A', last_name='B')
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.get(user=self.user)  # Tạo tự động qua signal
+        self.products = [Product.objects.create(name=f'Món {i}', price=10000) for i in range(4)]
+
+    def create_combos(self, count):
+        for i in range(count):
+            combo = ProductCombo.objects.create(name=f'Combo {i}', discount_amount=1000 + i)
+            for product in self.products[i % 2:i % 2 + 2]:
+                ProductComboItem.objects.create(combo=combo, product=product, quantity=1)
+
+    def test_returns_best_combo_set_with_constant_queries(self):
+        for product in self.products:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+        self.create_combos(2)
+        self.client.get('/cart/applicable-combos/')
+        self.create_combos(6)
+        self.client.get('/cart/applicable-combos/')  # Nạp lại chỉ mục combo sau khi thay đổi
+        with self.assertNumQueries(4):
+            response = self.client.get('/cart/applicable-combos/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Mọi combo đều cần món 1 (chỉ có 1 phần) nên chỉ áp dụng được combo giảm nhiều nhất
+        self.assertEqual([combo['name'] for combo in response.data], ['Combo 5'])
+
+
+class CartStoreTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='khach', password='pass12345', first_name='A', last_name='B')
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.get(user=self.user)
+        self.tea = Product.objects.create(name='Trà', price=20000)
+        self.rice = Product.objects.create(name='Cơm', price=30000)
+
+    def add(self, product, quantity=1):
+        response = self.client.post('/cart/add/', {'product': product.id, 'quantity': quantity})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response
+
+    def db_quantities(self):
+        return dict(self.cart.cartitem_set.values_list('product_id', 'quantity'))
+
+    def test_database_store_adds_up_quantities(self):
+        self.add(self.tea, 2)
+        response = self.add(self.tea, 3)
+        self.assertEqual(response.data['quantity'], 5)
+        self.assertEqual(self.db_quantities(), {self.tea.id: 5})
+        self.assertEqual(self.client.post('/cart/add/', {'product': self.tea.id, 'quantity': 0}).status_code, 400)
+        self.assertEqual(self.client.post('/cart/add/', {'product': 9999}).status_code, 404)
+
+    def test_invalid_quantities_are_rejected(self):
+        item_id = self.add(self.tea).data['id']
+        combo = ProductCombo.objects.create(name='Combo', discount_amount=0)
+        ProductComboItem.objects.create(combo=combo, product=self.rice, quantity=1)
+        for quantity in ('abc', None, '1.5', 0):
+            data = {'product': self.tea.id, 'quantity': quantity}
+            response = self.client.post('/cart/add/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, quantity)
+            response = self.client.post(f'/cart/combo/{combo.id}/add/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, quantity)
+            response = self.client.patch(f'/cart/update/{item_id}/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, quantity)
+        self.assertEqual(self.db_quantities(), {self.tea.id: 1})
+
+    @override_settings(CART_STORE='cart.storage.CacheCartStore')
+    def test_cache_store_writes_behind(self):
+        self.add(self.tea, 2)
+        self.add(self.tea)
+        with self.assertNumQueries(1):  # Chỉ kiểm tra sản phẩm, giỏ hàng nằm trong cache
+            self.add(self.rice)
+        self.assertEqual(self.db_quantities(), {})
+
+        # Đọc giỏ hàng cần id của từng dòng nên ghi xuống DB trước
+        response = self.client.get('/cart/user/cart/')
+        self.assertEqual(self.db_quantities(), {self.tea.id: 3, self.rice.id: 1})
+        items = {item['product']: item for item in response.data['items']}
+        self.assertEqual(items[self.tea.id]['quantity'], 3)
+
+        response = self.client.patch(f"/cart/update/{items[self.tea.id]['id']}/", {'quantity': 7})
+        self.assertEqual(response.data, {'quantity': 7})
+        self.client.delete(f"/cart/remove/{items[self.rice.id]['id']}/")
+        self.assertEqual(self.db_quantities(), {self.tea.id: 3, self.rice.id: 1})  # Chưa ghi xuống
+
+        call_command('flush_carts', stdout=StringIO())
+        self.assertEqual(self.db_quantities(), {self.tea.id: 7})
+
+    @override_settings(CART_STORE='cart.storage.CacheCartStore')
+    def test_checkout_flushes_and_resets_cached_cart(self):
+        self.add(self.tea, 2)
+        response = self.client.post('/order/create', {'address': 'Hà Nội', 'phone_number': '0901234567'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        order = Order.objects.get()
+        self.assertEqual(list(order.orderdetail_set.values_list('product_id', 'quantity')), [(self.tea.id, 2)])
+        self.assertEqual(get_cart_store().quantities(self.user), {})
+        self.assertEqual(self.client.get('/cart/user/cart/').data['items'], [])
+
+    @override_settings(CART_STORE='cart.storage.CacheCartStore')
+    def test_checkout_blocks_cart_changes_until_cart_is_reset(self):
+        self.add(self.tea, 2)
+        other_tab = CacheCartStore()
+        other_tab.lock_timeout = 0.01
+        blocked = []
+
+        def price_during_concurrent_add(items):
+            try:
+                other_tab.add(self.user, self.rice.id, 1)
+            except CartStoreBusy:
+                blocked.append(True)
+            return price_cart(items)
+
+        with mock.patch('order.services.price_cart', side_effect=price_during_concurrent_add):
+            response = self.client.post('/order/create', {'address': 'Hà Nội', 'phone_number': '0901234567'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(blocked, [True])
+        # Sau khi đặt hàng, thay đổi mới áp dụng lên giỏ trống đọc lại từ DB và không bị mất
+        other_tab.add(self.user, self.rice.id, 1)
+        self.assertEqual(get_cart_store().quantities(self.user), {self.rice.id: 1})
+        call_command('flush_carts', stdout=StringIO())
+        self.assertEqual(self.db_quantities(), {self.rice.id: 1})
+
+    def test_cache_store_lock_serializes_adds(self):
+        store = CacheCartStore()
+        key = store._key(self.user)
+        with store._locked(key):
+            store.lock_timeout = 0.01
+            with self.assertRaises(CartStoreBusy):
+                store.add(self.user, self.tea.id, 1)
+        store.add(self.user, self.tea.id, 1)
+        self.assertEqual(store.add(self.user, self.tea.id, 2).quantity, 3)
+
+
+    def test_lock_is_only_released_by_its_owner(self):
+        store = CacheCartStore()
+        key = store._key(self.user)
+        with store._locked(key, timeout=0.05):
+            time.sleep(0.1)  # Khóa hết hạn giữa chừng và một request khác lấy được khóa
+            self.assertTrue(store.cache.add(f'{key}:lock', 'other', 5))
+        self.assertEqual(store.cache.get(f'{key}:lock'), 'other')
+
+    @override_settings(CART_STORE='cart.storage.CacheCartStore', CART_STORE_LOCK_TIMEOUT=0.01)
+    def test_checkout_lock_outlives_normal_lock_timeout(self):
+        self.add(self.tea, 1)
+        store = get_cart_store()
+        with store.checkout(self.user):
+            time.sleep(0.05)
+            with self.assertRaises(CartStoreBusy):
+                CacheCartStore().add(self.user, self.rice.id, 1)
+
+    @override_settings(CART_STORE='cart.storage.CacheCartStore', CART_STORE_LOCK_TIMEOUT=0.01)
+    def test_busy_cart_returns_503(self):
+        self.add(self.tea, 1)
+        store = get_cart_store()
+        with store._locked(store._key(self.user), timeout=5):
+            response = self.client.post('/cart/add/', {'product': self.tea.id, 'quantity': 1}, HTTP_IDEMPOTENCY_KEY='k')
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response['Retry-After'], '1')
+            response = self.client.post('/order/create', {'address': 'Hà Nội', 'phone_number': '0901234567'})
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        # 503 không được lưu theo Idempotency-Key: gửi lại thì được xử lý
+        response = self.client.post('/cart/add/', {'product': self.tea.id, 'quantity': 1}, HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class CartBatchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='khach', password='pass12345', first_name='A', last_name='B')
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.get(user=self.user)
+        self.products = [Product.objects.create(name=f'Món {i}', price=10000) for i in range(6)]
+
+    def batch(self, operations):
+        return self.client.post('/cart/batch/', {'operations': operations}, format='json')
+
+    def quantities(self, response):
+        return [(item['product'], item['quantity']) for item in response.data['items']]
+
+    def test_operations_apply_in_order(self):
+        first, second, third = self.products[:3]
+        CartItem.objects.create(cart=self.cart, product=first, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=second, quantity=5)
+        response = self.batch([
+            {'op': 'add', 'product': first.id, 'quantity': 2},
+            {'op': 'remove', 'product': second.id},
+            {'op': 'add', 'product': third.id},
+            {'op': 'set', 'product': third.id, 'quantity': 4},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.quantities(response), [(first.id, 3), (third.id, 4)])
+        self.assertEqual(
+            dict(self.cart.cartitem_set.values_list('product_id', 'id')),
+            {item['product']: item['id'] for item in response.data['items']},
+        )
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        for size in (2, 6):
+            CartItem.objects.all().delete()
+            CartItem.objects.bulk_create(
+                CartItem(cart=self.cart, product=product, quantity=1) for product in self.products[:size // 2]
+            )
+            operations = [{'op': 'add', 'product': product.id} for product in self.products[:size]]
+            # Kiểm tra sản phẩm, savepoint, khóa giỏ, đọc CartItem, bulk_update, bulk_create, savepoint, đọc Product
+            with self.assertNumQueries(8):
+                response = self.batch(operations)
+            self.assertEqual(
+                [quantity for _, quantity in self.quantities(response)], [2] * (size // 2) + [1] * (size - size // 2)
+            )
+
+    def test_invalid_batches_change_nothing(self):
+        Product.objects.filter(pk=self.products[5].pk).update(is_active=False)
+        for operations in (
+            [],
+            [{'op': 'add', 'product': 9999}],
+            [{'op': 'add', 'product': self.products[0].id}, {'op': 'set', 'product': self.products[5].id, 'quantity': 2}],
+            [{'op': 'add', 'product': self.products[0].id, 'quantity': 0}],
+            [{'op': 'double', 'product': self.products[0].id}],
+        ):
+            self.assertEqual(self.batch(operations).status_code, status.HTTP_400_BAD_REQUEST, operations)
+        self.assertFalse(CartItem.objects.exists())
+
+    @override_settings(CART_STORE='cart.storage.CacheCartStore')
+    def test_cache_store_batch(self):
+        self.client.post('/cart/add/', {'product': self.products[0].id})
+        response = self.batch([
+            {'op': 'add', 'product': self.products[0].id},
+            {'op': 'add', 'product': self.products[1].id, 'quantity': 3},
+        ])
+        self.assertEqual(self.quantities(response), [(self.products[0].id, 2), (self.products[1].id, 3)])
+        self.assertTrue(all(item['id'] for item in response.data['items']))
+
+    def test_add_combo_and_reorder(self):
+        combo = ProductCombo.objects.create(name='Combo', discount_amount=1000)
+        ProductComboItem.objects.create(combo=combo, product=self.products[0], quantity=1)
+        ProductComboItem.objects.create(combo=combo, product=self.products[1], quantity=2)
+        response = self.client.post(f'/cart/combo/{combo.id}/add/', {'quantity': 2})
+        self.assertEqual(self.quantities(response), [(self.products[0].id, 2), (self.products[1].id, 4)])
+
+        order = Order.objects.create(user=self.user, total_price=30000)
+        OrderDetail.objects.create(order=order, product=self.products[1], quantity=1)
+        OrderDetail.objects.create(order=order, product=self.products[2], quantity=3)
+        Product.objects.filter(pk=self.products[2].pk).update(is_active=False)
+        response = self.client.post(f'/cart/reorder/{order.id}/')
+        self.assertEqual(self.quantities(response), [(self.products[0].id, 2), (self.products[1].id, 5)])
+
+        # Cùng một quy tắc: sản phẩm ngừng bán không vào giỏ qua batch, combo hay thêm lẻ
+        ProductComboItem.objects.create(combo=combo, product=self.products[2], quantity=1)
+        self.assertEqual(self.client.post(f'/cart/combo/{combo.id}/add/').status_code, 400)
+        self.assertEqual(self.client.post('/cart/add/', {'product': self.products[2].id}).status_code, 404)
+        self.assertNotIn(self.products[2].id, self.cart.cartitem_set.values_list('product_id', flat=True))
+        response = self.batch([{'op': 'remove', 'product': self.products[1].id}])
+        self.assertEqual(self.quantities(response), [(self.products[0].id, 2)])
+
+        other = User.objects.create_user(username='khac', password='pass12345')
+        other_order = Order.objects.create(user=other, total_price=0)
+        self.assertEqual(self.client.post(f'/cart/reorder/{other_order.id}/').status_code, 404)
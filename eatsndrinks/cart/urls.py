@@ -1,10 +1,16 @@
 from django.urls import path
-from .views import UserCartView, RemoveCartItemView, AddToCartView, UpdateCartItemQuantityView, GetApplicableCombosView
+from .views import (
+    UserCartView, RemoveCartItemView, AddToCartView, UpdateCartItemQuantityView, GetApplicableCombosView,
+    CartBatchView, AddComboToCartView, ReorderView,
+)
 
 urlpatterns = [
     path("user/cart/", UserCartView.as_view(), name="user-cart"),
     path("add/", AddToCartView.as_view(), name="add-to-cart"),
     path("remove/<int:pk>/", RemoveCartItemView.as_view(), name="remove-cart-item"),
     path("update/<int:pk>/", UpdateCartItemQuantityView.as_view(), name="update-cart-item-quantity"),
+    path("batch/", CartBatchView.as_view(), name="cart-batch"),
+    path("combo/<int:pk>/add/", AddComboToCartView.as_view(), name="add-combo-to-cart"),
+    path("reorder/<int:order_id>/", ReorderView.as_view(), name="reorder"),
     path("applicable-combos/", GetApplicableCombosView.as_view(), name="applicable-combos"),
 ]
@@ -2,33 +2,64 @@ from rest_framework.generics import RetrieveUpdateAPIView, DestroyAPIView, Creat
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer, CartItemQuantitySerializer
+from .serializers import CartSerializer, CartItemSerializer, CartItemQuantitySerializer, CartBatchSerializer, QuantitySerializer
+from .mixins import CartStoreBusyMixin
+from .storage import ADD, get_cart_store
 from django.shortcuts import get_object_or_404
 from catalogue.models import Product, ProductCombo
 from rest_framework.generics import RetrieveDestroyAPIView
-from rest_framework.permissions import IsAuthenticated
-from .models import Cart
-from .serializers import CartSerializer
-from django.db import transaction
 from catalogue.serializers import ProductComboSerializer
+from api.idempotency import IdempotencyMixin
+from catalogue.combos import best_combos_for_cart
+from catalogue.views import with_combo_items
+from order.models import Order
+
+def attach_products(lines):
+    """Gắn Product cho các dòng giỏ hàng bằng một truy vấn; bỏ dòng có sản phẩm đã bị xóa"""
+    products = Product.objects.in_bulk([line.product_id for line in lines])
+    for line in lines:
+        line.product = products.get(line.product_id)
+    return [line for line in lines if line.product is not None]
+
+
+def cart_data(store, request, lines=None):
+    """
+    Dữ liệu giỏ hàng cùng định dạng với CartSerializer. `lines` là (cart_id, [CartLine]) đã có id;
+    bỏ trống để đọc qua store.
+    """
+    cart_id, lines = lines or store.lines(request.user, persisted=True)
+    items = CartItemSerializer(attach_products(lines), many=True, context={"request": request}).data
+    return {"id": cart_id, "user": request.user.pk, "items": items}
+
+
+def validated_quantity(request):
+    """Số lượng trong request (mặc định 1); sai kiểu hoặc nhỏ hơn 1 thì raise ValidationError (400)"""
+    serializer = QuantitySerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data["quantity"]
+
+
+def apply_to_cart(request, operations):
+    """Áp dụng các thao tác vào giỏ hàng và trả về toàn bộ giỏ hàng sau khi cập nhật"""
+    store = get_cart_store()
+    lines = store.apply(request.user, operations, persisted=True)
+    return Response(cart_data(store, request, lines), status=status.HTTP_200_OK)
 
-class UserCartView(RetrieveDestroyAPIView):
+
+class UserCartView(CartStoreBusyMixin, RetrieveDestroyAPIView):
     """Retrieve and delete the user's cart (GET, DELETE only)."""
     permission_classes = [IsAuthenticated]
     serializer_class = CartSerializer
 
-    def get_object(self):
-        """Ensure each user can only access their own cart."""
-        return Cart.objects.get(user=self.request.user)
+    def retrieve(self, request, *args, **kwargs):
+        return Response(cart_data(get_cart_store(), request))
 
     def delete(self, request, *args, **kwargs):
         """Xóa toàn bộ sản phẩm trong giỏ hàng nhưng không xóa giỏ hàng."""
-        cart = self.get_object()
-        cart.cartitem_set.all().delete()  # ✅ Xóa tất cả sản phẩm trong giỏ hàng
+        get_cart_store().clear(request.user)  # ✅ Xóa tất cả sản phẩm trong giỏ hàng
         return Response({"message": "Đã xóa toàn bộ sản phẩm trong giỏ hàng"}, status=status.HTTP_204_NO_CONTENT)
 
-class UpdateCartItemQuantityView(UpdateAPIView):
+class UpdateCartItemQuantityView(CartStoreBusyMixin, UpdateAPIView):
     """
     API để cập nhật số lượng sản phẩm trong giỏ hàng (PATCH /cart/item/{pk}/update/)
     """
@@ -37,104 +68,103 @@ class UpdateCartItemQuantityView(UpdateAPIView):
     http_method_names = ["patch"]  # Chỉ cho phép PATCH
 
     def patch(self, request, pk, *args, **kwargs):
-        try:
-            cart_item = CartItem.objects.get(pk=pk, cart__user=request.user)
-            new_quantity = request.data.get("quantity")
-
-            if new_quantity is None:
-                return Response({"error": "Bạn phải gửi số lượng mới."}, status=status.HTTP_400_BAD_REQUEST)
-
-            new_quantity = int(new_quantity)
-
-            if new_quantity < 1:
-                return Response({"error": "Số lượng phải ít nhất là 1."}, status=status.HTTP_400_BAD_REQUEST)
-
-            cart_item.quantity = new_quantity
-            cart_item.save()
+        store = get_cart_store()
+        product_id = store.find_product(request.user, pk)
+        if product_id is None:
+            return Response({"error": "Sản phẩm không tồn tại trong giỏ hàng."}, status=status.HTTP_404_NOT_FOUND)
 
-            return Response(CartItemQuantitySerializer(cart_item).data, status=status.HTTP_200_OK)
+        if request.data.get("quantity") is None:
+            return Response({"error": "Bạn phải gửi số lượng mới."}, status=status.HTTP_400_BAD_REQUEST)
 
-        except CartItem.DoesNotExist:
-            return Response({"error": "Sản phẩm không tồn tại trong giỏ hàng."}, status=status.HTTP_404_NOT_FOUND)
+        new_quantity = validated_quantity(request)
+        line = store.set_quantity(request.user, product_id, new_quantity)
+        return Response(CartItemQuantitySerializer(line).data, status=status.HTTP_200_OK)
 
 
-class RemoveCartItemView(DestroyAPIView):
+class RemoveCartItemView(CartStoreBusyMixin, DestroyAPIView):
     """Remove an item from the cart."""
     permission_classes = [IsAuthenticated]
     serializer_class = CartItemSerializer
     def delete(self, request, pk, *args, **kwargs):
-        try:
-            cart_item = CartItem.objects.get(pk=pk, cart__user=request.user)
-            cart_item.delete()
-            return Response({"message": "Item removed from cart."}, status=status.HTTP_200_OK)
-        except CartItem.DoesNotExist:
+        store = get_cart_store()
+        product_id = store.find_product(request.user, pk)
+        if product_id is None or not store.remove(request.user, product_id):
             return Response({"error": "Item not found in cart."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "Item removed from cart."}, status=status.HTTP_200_OK)
 
-class AddToCartView(CreateAPIView):
-    """Add a product to the cart."""
+class AddToCartView(CartStoreBusyMixin, IdempotencyMixin, CreateAPIView):
+    """Add a product to the cart. Supports the Idempotency-Key header so retries do not add twice."""
     permission_classes = [IsAuthenticated]
     serializer_class = CartItemSerializer
 
-    def post(self, request, *args, **kwargs):
-        user = request.user
+    def create(self, request, *args, **kwargs):
         product_id = request.data.get("product")
-        quantity = request.data.get("quantity", 1)
-
-        product = get_object_or_404(Product, pk=product_id)
-
-        with transaction.atomic():
-            # Xử lý trường hợp có nhiều cart (nếu có)
-            carts = Cart.objects.filter(user=user)
-            if carts.count() > 1:
-                # Giữ lại cart đầu tiên và xóa các cart còn lại
-                main_cart = carts.first()
-                # Di chuyển tất cả các items từ các cart khác vào main_cart
-                CartItem.objects.filter(cart__in=carts.exclude(id=main_cart.id)).update(cart=main_cart)
-                # Xóa các cart thừa
-                carts.exclude(id=main_cart.id).delete()
-                cart = main_cart
-            else:
-                # Nếu không có cart nào, tạo mới
-                cart, _ = Cart.objects.get_or_create(user=user)
-
-            # Kiểm tra xem sản phẩm đã có trong giỏ hàng chưa
-            cart_item, item_created = CartItem.objects.get_or_create(cart=cart, product=product)
-
-            if not item_created:
-                cart_item.quantity += int(quantity)  # Cập nhật số lượng nếu đã tồn tại
-            else:
-                cart_item.quantity = int(quantity)
-
-            cart_item.save()
-
-            return Response(CartItemSerializer(cart_item).data, status=status.HTTP_201_CREATED)
-
-class GetApplicableCombosView(RetrieveAPIView):
-    """Get all combos that can be applied to the current cart."""
+        quantity = validated_quantity(request)
+        product = get_object_or_404(Product, pk=product_id, is_active=True)
+
+        # Cộng dồn nguyên tử trong store (một câu UPDATE hoặc một thao tác trên hash trong cache)
+        line = get_cart_store().add(request.user, product.id, quantity)
+        line.product = product
+        return Response(CartItemSerializer(line).data, status=status.HTTP_201_CREATED)
+
+class CartBatchView(CartStoreBusyMixin, IdempotencyMixin, CreateAPIView):
+    """
+    Áp dụng nhiều thao tác lên giỏ hàng trong một request (POST /cart/batch/):
+    {"operations": [{"op": "add" | "set" | "remove", "product": id, "quantity": n}, ...]}.
+    Các thao tác chạy theo thứ tự trong một transaction; trả về toàn bộ giỏ hàng.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartBatchSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return apply_to_cart(request, serializer.validated_data["operations"])
+
+
+class AddComboToCartView(CartStoreBusyMixin, IdempotencyMixin, CreateAPIView):
+    """Thêm mọi món của một combo vào giỏ hàng (POST /cart/combo/{pk}/add/, quantity = số combo)"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartSerializer
+
+    def create(self, request, pk, *args, **kwargs):
+        combo = get_object_or_404(ProductCombo, pk=pk, is_active=True)
+        quantity = validated_quantity(request)
+        items = list(combo.items.values_list("product_id", "quantity", "product__is_active"))
+        # Sản phẩm đã ngừng bán không được thêm vào giỏ; thiếu một món thì không còn là combo
+        if not all(is_active for _, _, is_active in items):
+            return Response({"error": "Combo có sản phẩm đã ngừng bán."}, status=status.HTTP_400_BAD_REQUEST)
+        return apply_to_cart(request, [(ADD, product_id, count * quantity) for product_id, count, _ in items])
+
+
+class ReorderView(CartStoreBusyMixin, IdempotencyMixin, CreateAPIView):
+    """Thêm lại các món của một đơn hàng cũ vào giỏ hàng (POST /cart/reorder/{order_id}/)"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartSerializer
+
+    def create(self, request, order_id, *args, **kwargs):
+        order = get_object_or_404(Order, pk=order_id, user=request.user)
+        # Sản phẩm đã ngừng bán thì bỏ qua
+        details = order.orderdetail_set.filter(product__is_active=True).values_list("product_id", "quantity")
+        operations = [(ADD, product_id, quantity) for product_id, quantity in details]
+        if not operations:
+            return Response({"error": "Không còn sản phẩm nào của đơn hàng này đang bán."}, status=status.HTTP_400_BAD_REQUEST)
+        return apply_to_cart(request, operations)
+
+
+class GetApplicableCombosView(CartStoreBusyMixin, RetrieveAPIView):
+    """Get the best set of combos the current cart qualifies for (the combos applied at checkout)."""
     permission_classes = [IsAuthenticated]
     serializer_class = ProductComboSerializer
 
     def get(self, request, *args, **kwargs):
-        cart = Cart.objects.get(user=request.user)
-        cart_items = cart.cartitem_set.all()
-        
-        # Get all active combos
-        combos = ProductCombo.objects.filter(is_active=True)
-        applicable_combos = []
-
-        for combo in combos:
-            combo_items = combo.items.all()
-            can_apply = True
-            
-            # Check if all items in the combo are in the cart with sufficient quantity
-            for combo_item in combo_items:
-                cart_item = cart_items.filter(product=combo_item.product).first()
-                if not cart_item or cart_item.quantity < combo_item.quantity:
-                    can_apply = False
-                    break
-            
-            if can_apply:
-                applicable_combos.append(combo)
-
-        serializer = self.get_serializer(applicable_combos, many=True)
+        items = get_cart_store().quantities(request.user).items()
+
+        # Chỉ mục combo nằm trong bộ nhớ nên số truy vấn không phụ thuộc số combo
+        best, _ = best_combos_for_cart(items)
+        if not best:
+            return Response([])
+
+        combos = {combo.id: combo for combo in with_combo_items(ProductCombo.objects.filter(id__in=[c.id for c in best]))}
+        serializer = self.get_serializer([combos[c.id] for c in best], many=True)
         return Response(serializer.data)
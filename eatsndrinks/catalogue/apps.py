@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CatalogueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalogue'
+
+    def ready(self):
+        import catalogue.signals  # Tăng phiên bản cache khi dữ liệu danh mục thay đổi
@@ -0,0 +1,347 @@
+import csv
+import io
+import json
+from collections import defaultdict, deque
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from analytics.services import record_new_products
+from api.images import schedule_derivatives
+from search.services import index_products
+from .cache import bump_catalogue_version
+from .models import Category, Product, ProductImage
+
+FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+# Thứ tự cột của file export, cũng là các cột mà import chấp nhận
+COLUMNS = [
+    "id",
+    "name",
+    "description",
+    "price",
+    "flash_sale_price",
+    "flash_sale_start",
+    "flash_sale_end",
+    "category",
+    "is_active",
+    "mainimage",
+    "images",
+]
+UPDATE_FIELDS = [
+    "name",
+    "description",
+    "price",
+    "flash_sale_price",
+    "flash_sale_start",
+    "flash_sale_end",
+    "category",
+    "is_active",
+    "mainimage",
+    "effective_price",
+    "price_changes_at",
+    "updated_at",
+]
+IMAGE_SEPARATOR = "|"  # Trong CSV, danh sách ảnh được nối bằng ký tự này
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """Kiểm tra một dòng dữ liệu import; category là tên danh mục, images là đường dẫn ảnh đã có trên storage"""
+
+    id = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0"))
+    flash_sale_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal("0"), required=False, allow_null=True, default=None
+    )
+    flash_sale_start = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    flash_sale_end = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    category = serializers.CharField(max_length=100, required=False, allow_null=True, default=None)
+    is_active = serializers.BooleanField(required=False, default=True)
+    mainimage = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    images = serializers.ListField(child=serializers.CharField(max_length=100), required=False, allow_null=True)
+
+    def validate(self, attrs):
+        flash_sale = [attrs["flash_sale_price"], attrs["flash_sale_start"], attrs["flash_sale_end"]]
+        if any(value is not None for value in flash_sale):
+            if any(value is None for value in flash_sale):
+                raise serializers.ValidationError(
+                    "Cần truyền đầy đủ: flash_sale_price, flash_sale_start, flash_sale_end."
+                )
+            if attrs["flash_sale_start"] >= attrs["flash_sale_end"]:
+                raise serializers.ValidationError("flash_sale_start phải trước flash_sale_end.")
+        return attrs
+
+
+def detect_format(filename, default="csv"):
+    """Suy ra định dạng từ phần mở rộng của tên file"""
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    return default
+
+
+def _clean_csv_row(row):
+    """Ô trống trong CSV nghĩa là không có giá trị; images được nối bằng IMAGE_SEPARATOR"""
+    cleaned = {key: value for key, value in row.items() if key and value not in ("", None)}
+    if "images" in row:
+        images = row.get("images") or ""
+        cleaned["images"] = [image for image in images.split(IMAGE_SEPARATOR) if image]
+    return cleaned
+
+
+def iter_rows(stream, file_format):
+    """
+    Đọc từng dòng từ stream (bytes hoặc text) mà không nạp cả file vào bộ nhớ.
+    Sinh ra (số dòng, dict dữ liệu hoặc None, lỗi hoặc None).
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, _clean_csv_row(row), None
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"JSON không hợp lệ: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Mỗi dòng phải là một object JSON."
+            continue
+        yield line_number, row, None
+
+
+class CategoryResolver:
+    """Tra danh mục theo tên, chỉ truy vấn những tên chưa gặp và giữ kết quả suốt lần import"""
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.by_name = {}
+
+    def load(self, names):
+        missing = {name for name in names if name not in self.by_name}
+        if not missing:
+            return
+        for category in Category.objects.filter(name__in=missing).order_by("id"):
+            self.by_name.setdefault(category.name, category)
+        missing -= self.by_name.keys()
+        if missing and self.create_missing:
+            created = Category.objects.bulk_create(Category(name=name) for name in sorted(missing))
+            if not connection.features.can_return_rows_from_bulk_insert:
+                created = Category.objects.filter(name__in=missing)
+            self.by_name.update({category.name: category for category in created})
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+
+class ProductImporter:
+    """
+    Import sản phẩm theo từng lô: kiểm tra dữ liệu, rồi bulk_create/bulk_update trong một transaction mỗi lô.
+    Dòng lỗi được ghi lại và bỏ qua, không làm hỏng cả lần import.
+    bulk_* không gọi save() hay signal nên effective_price, chỉ mục tìm kiếm, số liệu tổng hợp,
+    ảnh phái sinh và phiên bản cache được cập nhật trực tiếp ở đây.
+    """
+
+    def __init__(self, create_categories=False, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.categories = CategoryResolver(create_missing=create_categories)
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk)
+        if self.created or self.updated:
+            bump_catalogue_version()
+        return self.result()
+
+    def result(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def _validate_chunk(self, chunk):
+        valid = []
+        serializer = ProductImportRowSerializer()
+        for line, row, error in chunk:
+            if error:
+                self.add_error(line, {"non_field_errors": [error]})
+                continue
+            try:
+                valid.append((line, serializer.run_validation(row)))
+            except serializers.ValidationError as e:
+                self.add_error(line, e.detail)
+        return valid
+
+    def _import_chunk(self, chunk):
+        valid = self._validate_chunk(chunk)
+        self.categories.load({data["category"] for _, data in valid if data["category"]})
+        now = timezone.now()
+
+        with transaction.atomic():
+            existing = Product.objects.in_bulk([data["id"] for _, data in valid if data.get("id")])
+            to_create, to_update, images, main_images = [], [], [], []
+            for line, data in valid:
+                category_name = data.pop("category")
+                category = None
+                if category_name:
+                    category = self.categories.get(category_name)
+                    if category is None:
+                        self.add_error(line, {"category": [f"Không tìm thấy danh mục '{category_name}'."]})
+                        continue
+
+                product_id = data.pop("id", None)
+                if product_id:
+                    product = existing.get(product_id)
+                    if product is None:
+                        self.add_error(line, {"id": [f"Không tìm thấy sản phẩm có id={product_id}."]})
+                        continue
+                    to_update.append(product)
+                else:
+                    product = Product()
+                    to_create.append(product)
+
+                # Ảnh chỉ bị thay khi dòng có cột tương ứng
+                image_paths = data.pop("images", None)
+                if "mainimage" in data:
+                    data["mainimage"] = data["mainimage"] or ""
+                for field, value in data.items():
+                    setattr(product, field, value)
+                product.category = category
+                product.updated_at = now
+                product.refresh_effective_price(now)
+                if image_paths is not None:
+                    images.append((product, image_paths))
+                if data.get("mainimage"):
+                    main_images.append(product)
+
+            if to_create:
+                self._create_products(to_create)
+                record_new_products(to_create)
+            if to_update:
+                Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=self.chunk_size)
+            gallery = self._replace_images(images)
+            index_products(to_create + to_update)
+
+            # Như signal post_save: ảnh phái sinh được tạo trong thread pool sau khi lô commit
+            for product in main_images:
+                schedule_derivatives(product.mainimage, on_done=bump_catalogue_version)
+            for image in gallery:
+                schedule_derivatives(image.image, on_done=bump_catalogue_version)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+
+    def _create_products(self, products):
+        Product.objects.bulk_create(products, batch_size=self.chunk_size)
+        if connection.features.can_return_rows_from_bulk_insert:
+            return
+        # Backend không trả về id sau bulk insert (vd. MySQL): đọc lại id bằng một truy vấn theo
+        # khoảng created_at mà bulk_create vừa gán, rồi ghép theo (tên, created_at) và thứ tự id
+        created = [product.created_at for product in products]
+        rows = (
+            Product.objects.filter(created_at__range=(min(created), max(created)))
+            .order_by("id")
+            .values_list("id", "name", "created_at")
+        )
+        ids = defaultdict(deque)
+        for product_id, name, created_at in rows:
+            ids[(name, created_at)].append(product_id)
+        for product in products:
+            product.pk = ids[(product.name, product.created_at)].popleft()
+
+    def _replace_images(self, products_with_images):
+        if not products_with_images:
+            return []
+        ProductImage.objects.filter(product__in=[product for product, _ in products_with_images]).delete()
+        return ProductImage.objects.bulk_create(
+            (
+                ProductImage(product=product, image=path)
+                for product, paths in products_with_images
+                for path in paths
+            ),
+            batch_size=self.chunk_size,
+        )
+
+
+def import_products(stream, file_format="csv", create_categories=False, chunk_size=CHUNK_SIZE):
+    """Import sản phẩm từ file CSV/JSONL, trả về số sản phẩm đã tạo/cập nhật và danh sách lỗi theo dòng"""
+    importer = ProductImporter(create_categories=create_categories, chunk_size=chunk_size)
+    return importer.run(iter_rows(stream, file_format))
+
+
+def _export_record(product):
+    return {
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "price": str(product.price),
+        "flash_sale_price": None if product.flash_sale_price is None else str(product.flash_sale_price),
+        "flash_sale_start": product.flash_sale_start.isoformat() if product.flash_sale_start else None,
+        "flash_sale_end": product.flash_sale_end.isoformat() if product.flash_sale_end else None,
+        "category": product.category.name if product.category else None,
+        "is_active": product.is_active,
+        "mainimage": product.mainimage.name or None,
+        "images": [image.image.name for image in product.images.all()],
+    }
+
+
+class _Echo:
+    """Bộ đệm giả cho csv.writer: trả thẳng dòng đã định dạng thay vì ghi vào bộ nhớ"""
+
+    def write(self, value):
+        return value
+
+
+def export_products(queryset=None, file_format="csv", chunk_size=CHUNK_SIZE):
+    """
+    Sinh nội dung file export theo từng dòng, đọc sản phẩm bằng iterator(chunk_size)
+    nên bộ nhớ không phụ thuộc kích thước danh mục.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    products = (
+        queryset.select_related("category").prefetch_related("images").order_by("id").iterator(chunk_size=chunk_size)
+    )
+
+    if file_format == "jsonl":
+        for product in products:
+            yield json.dumps(_export_record(product), ensure_ascii=False) + "\n"
+        return
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for product in products:
+        record = _export_record(product)
+        record["images"] = IMAGE_SEPARATOR.join(record["images"])
+        yield writer.writerow(["" if record[column] is None else record[column] for column in COLUMNS])
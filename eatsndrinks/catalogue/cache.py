@@ -0,0 +1,80 @@
+import hashlib
+import json
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+VERSION_KEY = "catalogue:version"
+RESPONSE_KEY_PREFIX = "catalogue:response"
+
+
+def get_catalogue_version() -> int:
+    """Phiên bản hiện tại của dữ liệu danh mục; tăng mỗi khi sản phẩm/danh mục/combo thay đổi"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Khởi tạo theo thời gian để không trùng với các phiên bản cũ nếu khóa bị cache xóa
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _incr_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def bump_catalogue_version() -> None:
+    """
+    Tăng phiên bản ngay lập tức và thêm một lần nữa sau khi transaction commit,
+    tránh trường hợp request khác đọc dữ liệu cũ rồi lưu vào cache dưới phiên bản mới.
+    """
+    _incr_version()
+    transaction.on_commit(_incr_version)
+
+
+def response_cache_key(request) -> str:
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    # Gồm cả host vì các link phân trang trong phản hồi là URL tuyệt đối
+    digest = hashlib.md5(f"{request.get_host()}{request.path}?{query}".encode()).hexdigest()
+    staff = int(bool(request.user and request.user.is_staff))
+    return f"{RESPONSE_KEY_PREFIX}:{get_catalogue_version()}:{staff}:{digest}"
+
+
+def _etag_matches(request, etag) -> bool:
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+
+def cache_response(view_func):
+    """
+    Cache kết quả GET của các endpoint công khai theo phiên bản danh mục.
+    Khóa phụ thuộc đường dẫn, tham số truy vấn và quyền staff; phản hồi kèm ETag
+    và trả 304 khi client gửi If-None-Match trùng khớp.
+    """
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        key = response_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = view_func(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            content = JSONRenderer().render(response.data)
+            cached = ('"%s"' % hashlib.md5(content).hexdigest(), json.loads(content))
+            cache.set(key, cached, settings.CATALOGUE_CACHE_TIMEOUT)
+
+        etag, data = cached
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(data, headers={"ETag": etag})
+
+    return wrapper
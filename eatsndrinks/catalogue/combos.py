@@ -0,0 +1,161 @@
+import threading
+from collections import defaultdict
+
+from .cache import get_catalogue_version
+from .models import ProductComboItem
+
+MAX_SEARCH_NODES = 5000  # Giới hạn số nút duyệt; quá giới hạn thì dùng kết quả tốt nhất đã tìm được
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class Combo:
+    __slots__ = ("id", "discount", "requirements")
+
+    def __init__(self, combo_id, discount):
+        self.id = combo_id
+        self.discount = discount
+        self.requirements = defaultdict(int)  # product_id -> số lượng cần
+
+    def fits(self, quantities):
+        return all(quantities.get(product_id, 0) >= needed for product_id, needed in self.requirements.items())
+
+
+class ComboIndex:
+    """Các combo đang bán cùng món của chúng, tra theo product_id; nạp bằng một truy vấn"""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.combos = {}
+        self.by_product = defaultdict(list)
+        for combo_id, discount, product_id, quantity in rows:
+            combo = self.combos.get(combo_id)
+            if combo is None:
+                combo = self.combos[combo_id] = Combo(combo_id, discount)
+            if not combo.requirements.get(product_id):
+                self.by_product[product_id].append(combo)
+            combo.requirements[product_id] += quantity
+
+    @classmethod
+    def load(cls, version):
+        rows = (
+            ProductComboItem.objects.filter(combo__is_active=True)
+            .order_by("combo_id", "id")
+            .values_list("combo_id", "combo__discount_amount", "product_id", "quantity")
+        )
+        return cls(version, rows)
+
+    def applicable(self, quantities):
+        """Các combo mà giỏ hàng đủ món nếu chỉ xét riêng từng combo"""
+        seen = set()
+        combos = []
+        for product_id in quantities:
+            for combo in self.by_product.get(product_id, ()):
+                if combo.id not in seen:
+                    seen.add(combo.id)
+                    if combo.fits(quantities):
+                        combos.append(combo)
+        return combos
+
+    def best_combination(self, quantities):
+        """
+        Chọn tập combo có tổng giảm giá lớn nhất mà giỏ hàng đủ số lượng cho tất cả cùng lúc
+        (mỗi combo áp dụng tối đa một lần, các combo không dùng chung một món trong giỏ).
+        Các nhóm combo không chung sản phẩm được giải độc lập. Trả về (danh sách combo, tổng giảm giá).
+        """
+        chosen, total = [], 0
+        for group in _independent_groups(self.applicable(quantities)):
+            combos, discount = _search_group(group, quantities)
+            chosen.extend(combos)
+            total += discount
+        chosen.sort(key=lambda combo: (-combo.discount, combo.id))
+        return chosen, total
+
+
+def _independent_groups(combos):
+    """Tách các combo thành nhóm liên thông theo sản phẩm dùng chung (union-find)"""
+    parent = {}
+
+    def find(key):
+        while parent.setdefault(key, key) != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for combo in combos:
+        products = list(combo.requirements)
+        for product_id in products[1:]:
+            parent[find(product_id)] = find(products[0])
+
+    groups = defaultdict(list)
+    for combo in combos:
+        groups[find(next(iter(combo.requirements)))].append(combo)
+    return list(groups.values())
+
+
+def _search_group(combos, quantities):
+    """
+    DFS nhánh và cận: với mỗi combo, thử chọn rồi thử bỏ qua; cắt nhánh khi tổng giảm giá
+    còn lại không thể vượt kết quả tốt nhất. Nhánh đầu tiên chính là cách chọn tham lam theo
+    mức giảm, nên khi vượt MAX_SEARCH_NODES kết quả vẫn không tệ hơn cách chọn tham lam.
+    """
+    candidates = sorted(combos, key=lambda combo: (-combo.discount, combo.id))
+    # suffix[i]: tổng giảm giá của các combo từ vị trí i trở đi, dùng làm cận trên
+    suffix = [0] * (len(candidates) + 1)
+    for i in range(len(candidates) - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + candidates[i].discount
+
+    remaining = dict(quantities)
+    chosen = []
+    best = ([], 0)
+    nodes = 0
+
+    def search(i, discount):
+        nonlocal best, nodes
+        if discount > best[1]:
+            best = (list(chosen), discount)
+        while i < len(candidates) and not candidates[i].fits(remaining):
+            i += 1
+        if i == len(candidates) or discount + suffix[i] <= best[1] or nodes >= MAX_SEARCH_NODES:
+            return
+        nodes += 1
+
+        combo = candidates[i]
+        for product_id, needed in combo.requirements.items():
+            remaining[product_id] -= needed
+        chosen.append(combo)
+        search(i + 1, discount + combo.discount)
+        chosen.pop()
+        for product_id, needed in combo.requirements.items():
+            remaining[product_id] += needed
+        search(i + 1, discount)
+
+    search(0, 0)
+    return best
+
+
+def get_combo_index():
+    """Trả về chỉ mục combo hiện tại, nạp lại khi phiên bản danh mục thay đổi"""
+    global _index
+    version = get_catalogue_version()
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != version:
+                index = _index = ComboIndex.load(version)
+    return index
+
+
+def cart_quantities(items):
+    """Gộp (product_id, quantity) của giỏ hàng thành {product_id: tổng số lượng}"""
+    quantities = defaultdict(int)
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+    return dict(quantities)
+
+
+def best_combos_for_cart(items):
+    """Tập combo tối ưu cho giỏ hàng gồm các cặp (product_id, quantity)"""
+    return get_combo_index().best_combination(cart_quantities(items))
@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+
+from api.benchmark import median_ms, throwaway_database
+from catalogue.models import Category, Product, ProductImage
+from catalogue.serializers import CompactProductListSerializer, ProductSerializer
+
+SPARSE_FIELDS = 'id,name,current_price'
+
+
+class Command(BaseCommand):
+    help = 'Compare serialization throughput of the full, sparse (?fields=) and compact product list modes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--images', type=int, default=2, help='Gallery images per product')
+        parser.add_argument('--repeat', type=int, default=10, help='Runs per mode; the median is reported')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            self.seed(options)
+            count = options['products']
+            modes = [
+                ('full', self.full),
+                (f'sparse ?fields={SPARSE_FIELDS}', self.sparse),
+                ('compact', self.compact),
+            ]
+            baseline = None
+            for label, run in modes:
+                # Gồm cả thời gian truy vấn vì chế độ gọn còn tiết kiệm ở bước dựng model
+                elapsed = median_ms(run, options['repeat'])
+                baseline = baseline or elapsed
+                self.stdout.write(
+                    f'{label:<40} {elapsed:9.2f} ms  {count / elapsed * 1000:10.0f} products/s  '
+                    f'({baseline / elapsed:.1f}x)'
+                )
+
+    def seed(self, options):
+        category = Category.objects.create(name='Đồ uống')
+        products = []
+        for i in range(options['products']):
+            product = Product(
+                name=f'Sản phẩm {i}', description='Mô tả ' * 20, price=Decimal(10000 + i),
+                category=category, mainimage=f'product_main_images/{i}.jpg',
+            )
+            product.refresh_effective_price()
+            products.append(product)
+        products = Product.objects.bulk_create(products)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL không trả id sau bulk_create: đọc lại các sản phẩm vừa tạo trong database tạm
+            products = Product.objects.filter(category=category).only('id')
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f'product_images/{product.id}_{n}.jpg')
+            for product in products for n in range(options['images'])
+        )
+
+    def request(self, query=None):
+        return Request(APIRequestFactory().get('/catalogue/products/', query or {}))
+
+    def queryset(self):
+        return Product.objects.order_by('id')
+
+    def full(self):
+        context = {'request': self.request()}
+        return ProductSerializer(self.queryset().prefetch_related('images'), many=True, context=context).data
+
+    def sparse(self):
+        context = {'request': self.request({'fields': SPARSE_FIELDS})}
+        return ProductSerializer(self.queryset(), many=True, context=context).data
+
+    def compact(self):
+        context = {'request': self.request()}
+        rows = CompactProductListSerializer.get_queryset(self.queryset())
+        return CompactProductListSerializer(rows, context=context).data
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from catalogue.bulk import FORMATS, detect_format, export_products
+
+
+class Command(BaseCommand):
+    help = 'Stream all products to a CSV or JSONL file in the import format'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='Output file (defaults to stdout)')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the output extension, or csv')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['format'] or detect_format(output)
+        if not output:
+            for line in export_products(file_format=file_format):
+                self.stdout.write(line, ending='')
+            return
+
+        count = -1 if file_format == 'csv' else 0  # Không tính dòng tiêu đề CSV
+        with open(output, 'w', encoding='utf-8', newline='') as stream:
+            for line in export_products(file_format=file_format):
+                stream.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f'✅ Exported {count} products to {output}'))
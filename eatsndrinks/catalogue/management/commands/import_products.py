@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from catalogue.bulk import CHUNK_SIZE, FORMATS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Bulk import products from a CSV or JSONL file (rows with an id update existing products)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV/JSONL file to import')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--create-categories', action='store_true', help='Create categories that do not exist yet')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        try:
+            stream = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(e)
+
+        with stream:
+            result = import_products(
+                stream,
+                file_format,
+                create_categories=options['create_categories'],
+                chunk_size=options['chunk_size'],
+            )
+
+        for error in result['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        if result['error_count'] > len(result['errors']):
+            self.stderr.write(f"... {result['error_count'] - len(result['errors'])} more errors")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Created {result['created']}, updated {result['updated']} products, "
+                f"{result['error_count']} rows skipped"
+            )
+        )
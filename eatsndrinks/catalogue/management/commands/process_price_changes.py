@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from catalogue.pricing import next_price_change, process_due_price_changes
+
+
+class Command(BaseCommand):
+    help = 'Switch flash-sale prices on/off for products whose sale window starts or ends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running as a worker')
+        parser.add_argument('--interval', type=float, default=30, help='Max seconds between checks in loop mode')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        while True:
+            updated = process_due_price_changes(batch_size=options['batch_size'])
+            if updated:
+                self.stdout.write(self.style.SUCCESS(f'✅ Updated effective price of {updated} products'))
+            if not options['loop']:
+                break
+
+            # Ngủ tới lần chuyển đổi kế tiếp, nhưng không quá interval để nhận các flash sale mới
+            delay = options['interval']
+            upcoming = next_price_change()
+            if upcoming is not None:
+                delay = min(delay, max((upcoming - timezone.now()).total_seconds(), 0))
+            time.sleep(delay)
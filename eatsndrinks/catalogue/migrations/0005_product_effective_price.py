@@ -0,0 +1,55 @@
+# Generated by Django 5.1 on 2026-10-18 15:05
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from catalogue.pricing import effective_price_at
+
+
+BATCH_SIZE = 1000
+
+
+def populate_effective_price(apps, schema_editor):
+    Product = apps.get_model('catalogue', 'Product')
+    now = timezone.now()
+    last_pk = 0
+    # Duyệt theo khóa chính từng đợt để không nạp toàn bộ bảng vào bộ nhớ
+    while True:
+        products = list(Product.objects.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not products:
+            break
+        for product in products:
+            product.effective_price, product.price_changes_at = effective_price_at(
+                product.price,
+                product.flash_sale_price,
+                product.flash_sale_start,
+                product.flash_sale_end,
+                now,
+            )
+        Product.objects.bulk_update(products, ['effective_price', 'price_changes_at'])
+        last_pk = products[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogue', '0004_productcombo_productcomboitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='price_changes_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'effective_price'], name='product_active_price_idx'),
+        ),
+        migrations.RunPython(populate_effective_price, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ from .models import Category, Product, ProductImage
 from .serializers import CategorySerializer, ProductSerializer, ProductImageSerializer
 from rest_framework.response import Response
 from rest_framework import status
+from .cache import cache_response
 class CustomPermissionMixin:
     def get_permissions(self):
         """
@@ -31,6 +32,7 @@ class CategorySchemaMixin:
         description="Lấy danh sách tất cả các danh mục có sẵn.",
         responses={200: CategorySerializer(many=True)},
     )
+    @cache_response
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -39,6 +41,7 @@ class CategorySchemaMixin:
         description="Nhận thông tin chi tiết về một danh mục cụ thể.",
         responses={200: CategorySerializer},
     )
+    @cache_response
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -102,6 +105,7 @@ class ProductSchemaMixin:
         description='Nhận thông tin chi tiết về một sản phẩm cụ thể.',
         responses={200: ProductSerializer},
     )
+    @cache_response
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -1,7 +1,9 @@
 from django.db import models
 
 # from taggit.managers import TaggableManager
+from datetime import datetime
 from django.utils import timezone
+from .pricing import effective_price_at
 
 # Create your models here.
 class Category(models.Model):
@@ -12,6 +14,30 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def flash_sale_active(self, now=None):
+        """Sản phẩm đang trong thời gian flash sale"""
+        now = now or timezone.now()
+        return self.filter(
+            flash_sale_start__lte=now,
+            flash_sale_end__gte=now,
+            flash_sale_price__isnull=False,
+        )
+
+    def effective_price_between(self, minimum=None, maximum=None):
+        """Lọc theo giá đang áp dụng (đã tính flash sale)"""
+        queryset = self
+        if minimum is not None:
+            queryset = queryset.filter(effective_price__gte=minimum)
+        if maximum is not None:
+            queryset = queryset.filter(effective_price__lte=maximum)
+        return queryset
+
+    def order_by_effective_price(self, descending=False):
+        """Sắp xếp theo giá đang áp dụng, dùng chỉ mục (is_active, effective_price)"""
+        return self.order_by("-effective_price" if descending else "effective_price", "id")
+
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -26,10 +52,48 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Giá đang áp dụng, được tính lại khi lưu và khi tới price_changes_at (xem catalogue.pricing)
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    price_changes_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_active", "effective_price"], name="product_active_price_idx"),
+            models.Index(fields=["is_active", "category"], name="product_active_category_idx"),
+            models.Index(fields=["flash_sale_start", "flash_sale_end"], name="product_flash_sale_idx"),
+            models.Index(fields=["created_at"], name="product_created_at_idx"),
+        ]
+
+    def refresh_effective_price(self, now=None):
+        """Tính lại effective_price và thời điểm giá thay đổi lần tới"""
+        values = {}
+        for name in ("price", "flash_sale_price", "flash_sale_start", "flash_sale_end"):
+            # Các view có thể gán chuỗi trực tiếp (vd. set_flash_sale), chuyển về đúng kiểu trước khi so sánh
+            value = self._meta.get_field(name).to_python(getattr(self, name))
+            if isinstance(value, datetime) and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            values[name] = value
+
+        self.effective_price, self.price_changes_at = effective_price_at(
+            values["price"],
+            values["flash_sale_price"],
+            values["flash_sale_start"],
+            values["flash_sale_end"],
+            now or timezone.now(),
+        )
+
+    def save(self, *args, **kwargs):
+        self.refresh_effective_price()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "effective_price", "price_changes_at"}
+        super().save(*args, **kwargs)
 
     def is_flash_sale_active(self):
         now = timezone.now()
-        return (
+        return bool(
             self.flash_sale_start
             and self.flash_sale_end
             and self.flash_sale_start <= now <= self.flash_sale_end
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+# Flash sale kết thúc "sau" flash_sale_end (is_flash_sale_active so sánh <=),
+# nên thời điểm tắt giá sale là ngay sau flash_sale_end
+SALE_END_RESOLUTION = timedelta(microseconds=1)
+
+
+def effective_price_at(price, flash_sale_price, flash_sale_start, flash_sale_end, now):
+    """
+    Trả về (giá áp dụng tại thời điểm now, thời điểm giá thay đổi lần tới hoặc None).
+    Cùng quy tắc với Product.is_flash_sale_active() và Product.current_price().
+    """
+    if not (flash_sale_price and flash_sale_start and flash_sale_end):
+        return price, None
+    if now < flash_sale_start:
+        return price, flash_sale_start
+    if now <= flash_sale_end:
+        return flash_sale_price, flash_sale_end + SALE_END_RESOLUTION
+    return price, None
+
+
+def process_due_price_changes(now=None, batch_size=500):
+    """
+    Bật/tắt giá flash sale cho các sản phẩm đã tới thời điểm chuyển đổi.
+    Xử lý theo lô bằng bulk_update, trả về số sản phẩm đã cập nhật.
+    """
+    from .cache import bump_catalogue_version
+    from .models import Product
+
+    now = now or timezone.now()
+    updated = 0
+    while True:
+        batch = list(
+            Product.objects.filter(price_changes_at__lte=now).order_by("price_changes_at", "id")[:batch_size]
+        )
+        if not batch:
+            break
+        for product in batch:
+            product.refresh_effective_price(now)
+            product.updated_at = now
+        Product.objects.bulk_update(batch, ["effective_price", "price_changes_at", "updated_at"])
+        updated += len(batch)
+
+    if updated:
+        bump_catalogue_version()  # bulk_update không gửi signal post_save
+    return updated
+
+
+def next_price_change():
+    """Thời điểm chuyển đổi giá gần nhất còn đang chờ, hoặc None"""
+    from .models import Product
+
+    return (
+        Product.objects.filter(price_changes_at__isnull=False)
+        .order_by("price_changes_at")
+        .values_list("price_changes_at", flat=True)
+        .first()
+    )
@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .cache import get_catalogue_version
+from .models import Product
+
+POOL_MAX_AGE = 300  # Giây; nạp lại định kỳ kể cả khi phiên bản không đổi
+MAX_PAGE = 50  # Chi phí mỗi lần chọn tỉ lệ với page * count nên giới hạn số trang
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ProductIdPool:
+    """Danh sách id sản phẩm đang bán, chia theo danh mục và theo trạng thái flash sale"""
+
+    def __init__(self, version, rows, now):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        groups = defaultdict(lambda: ([], []))
+        for product_id, category_id, flash_start, flash_end, flash_price in rows:
+            on_sale = bool(flash_price and flash_start and flash_end and flash_start <= now <= flash_end)
+            bucket = 0 if on_sale else 1
+            groups[None][bucket].append(product_id)
+            if category_id is not None:
+                groups[category_id][bucket].append(product_id)
+        self.groups = {key: (tuple(flash), tuple(regular)) for key, (flash, regular) in groups.items()}
+
+    @classmethod
+    def load(cls, version):
+        rows = Product.objects.filter(is_active=True).order_by("id").values_list(
+            "id", "category_id", "flash_sale_start", "flash_sale_end", "flash_sale_price"
+        )
+        return cls(version, rows, timezone.now())
+
+    def is_stale(self, version):
+        return self.version != version or time.monotonic() - self.loaded_at > POOL_MAX_AGE
+
+    def get_group(self, category_id=None):
+        return self.groups.get(category_id, ((), ()))
+
+
+def get_product_pool():
+    """Trả về pool hiện tại, nạp lại khi phiên bản danh mục thay đổi hoặc pool quá cũ"""
+    global _pool
+    version = get_catalogue_version()
+    pool = _pool
+    if pool is None or pool.is_stale(version):
+        with _pool_lock:
+            pool = _pool
+            if pool is None or pool.is_stale(version):
+                pool = _pool = ProductIdPool.load(version)
+    return pool
+
+
+class _LazyShuffle:
+    """Fisher–Yates từng bước: mỗi lần rút O(1), không cần sao chép cả danh sách"""
+
+    def __init__(self, items, rng):
+        self.items = items
+        self.rng = rng
+        self.swaps = {}
+        self.drawn = 0
+
+    @property
+    def remaining(self):
+        return len(self.items) - self.drawn
+
+    def draw(self):
+        i = self.drawn
+        j = self.rng.randrange(i, len(self.items))
+        picked = self.swaps.get(j, j)
+        self.swaps[j] = self.swaps.get(i, i)
+        self.drawn += 1
+        return self.items[picked]
+
+
+def sample_product_ids(count=8, category_id=None, flash_sale_weight=1.0, seed=None, page=1):
+    """
+    Chọn ngẫu nhiên `count` id sản phẩm đang bán.
+    - flash_sale_weight > 1 ưu tiên sản phẩm đang flash sale theo tỉ lệ trọng số.
+    - Với cùng seed (vd. theo session) thứ tự là cố định, nên các trang liên tiếp không trùng nhau.
+      RNG chỉ phụ thuộc seed; phiên bản danh mục chỉ quyết định khi nào pool được nạp lại, nên
+      thứ tự vẫn giữ nguyên nếu danh sách sản phẩm không đổi.
+    Chi phí tỉ lệ với page * count (page tối đa MAX_PAGE), không phụ thuộc kích thước danh mục.
+    """
+    pool = get_product_pool()
+    flash, regular = pool.get_group(category_id)
+    rng = random.Random(str(seed)) if seed is not None else random.Random()
+    flash_draws, regular_draws = _LazyShuffle(flash, rng), _LazyShuffle(regular, rng)
+
+    picked = []
+    total = page * count
+    while len(picked) < total and (flash_draws.remaining or regular_draws.remaining):
+        if not regular_draws.remaining:
+            source = flash_draws
+        elif not flash_draws.remaining:
+            source = regular_draws
+        else:
+            flash_mass = flash_sale_weight * flash_draws.remaining
+            in_flash = rng.random() * (flash_mass + regular_draws.remaining) < flash_mass
+            source = flash_draws if in_flash else regular_draws
+        picked.append(source.draw())
+    return picked[(page - 1) * count:total]
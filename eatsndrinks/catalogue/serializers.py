@@ -1,8 +1,18 @@
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
 from .models import Category, Product, ProductImage, ProductCombo, ProductComboItem
 from drf_spectacular.utils import extend_schema_field
 from decimal import Decimal
+from api.images import ImageSrcsetField
+from api.serializers import CompactListSerializer, SparseFieldsetMixin
+
+
+def decimal_to_string(value):
+    """Cùng định dạng với DecimalField(decimal_places=2) của DRF, vd. '10000.00'"""
+    return None if value is None else f"{value:.2f}"
 
 
 # Category Serializer
@@ -14,9 +24,11 @@ class CategorySerializer(serializers.ModelSerializer):
 
 # Product Image Serializer
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = ImageSrcsetField(source="image")
+
     class Meta:
         model = ProductImage
-        fields = ["id", "image", "product"]
+        fields = ["id", "image", "srcset", "product"]
 
     def validate_image(self, value):
         # Allowed extensions
@@ -37,8 +49,9 @@ class ProductImageSerializer(serializers.ModelSerializer):
 
 
 # Product Serializer
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
+    mainimage_srcset = ImageSrcsetField(source="mainimage")
     is_flash_sale_active = serializers.SerializerMethodField()
     current_price = serializers.SerializerMethodField()
     uploaded_images = serializers.ListField(
@@ -52,6 +65,7 @@ class ProductSerializer(serializers.ModelSerializer):
             "name",
             "description",
             "mainimage",
+            "mainimage_srcset",
             "price",
             "flash_sale_price",
             "flash_sale_start",
@@ -131,7 +145,7 @@ class ProductComboItemSerializer(serializers.ModelSerializer):
         return None
 
 
-class ProductComboSerializer(serializers.ModelSerializer):
+class ProductComboSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = ProductComboItemSerializer(many=True, read_only=True)
     total_original_price = serializers.SerializerMethodField()
     total_discounted_price = serializers.SerializerMethodField()
@@ -170,18 +184,21 @@ class ProductComboSerializer(serializers.ModelSerializer):
             
         return value
 
-    @extend_schema_field(serializers.DecimalField(max_digits=10, decimal_places=2))
-    def get_total_original_price(self, obj):
-        total = sum(
+    def to_representation(self, instance):
+        # Tổng giá gốc được tính một lần cho mỗi combo và dùng lại cho cả hai trường tổng
+        self._total_original_price = sum(
             item.product.price * item.quantity
-            for item in obj.items.all()
+            for item in instance.items.all()
         )
-        return total
+        return super().to_representation(instance)
+
+    @extend_schema_field(serializers.DecimalField(max_digits=10, decimal_places=2))
+    def get_total_original_price(self, obj):
+        return self._total_original_price
 
     @extend_schema_field(serializers.DecimalField(max_digits=10, decimal_places=2))
     def get_total_discounted_price(self, obj):
-        original_price = self.get_total_original_price(obj)
-        return max(0, original_price - obj.discount_amount)
+        return max(0, self._total_original_price - obj.discount_amount)
 
     def create(self, validated_data):
         combo_items = validated_data.pop('combo_items', [])
@@ -214,3 +231,71 @@ class ProductComboSerializer(serializers.ModelSerializer):
                 )
         
         return instance
+
+
+
+class CompactProductListSerializer(CompactListSerializer):
+    """
+    Danh sách sản phẩm gọn (?compact=1). Giá hiện tại và trạng thái flash sale cùng được tính
+    theo đồng hồ lúc trả lời, như Product.current_price() và Product.is_flash_sale_active(),
+    nên không lệch nhau khi cột effective_price chưa kịp cập nhật tới price_changes_at.
+    """
+
+    value_fields = (
+        "id", "name", "price", "flash_sale_price", "flash_sale_start", "flash_sale_end",
+        "mainimage", "category_id",
+    )
+    fields = ("id", "name", "price", "current_price", "is_flash_sale_active", "mainimage", "category")
+
+    def build(self, rows):
+        request = self.context.get("request")
+        media_url = default_storage.url("")
+        if request is not None:
+            media_url = request.build_absolute_uri(media_url)
+        now = timezone.now()
+        data = []
+        for row in rows:
+            # Cùng biểu thức với Product.is_flash_sale_active() để khớp với ProductSerializer
+            on_sale = bool(
+                row["flash_sale_start"] and row["flash_sale_end"]
+                and row["flash_sale_start"] <= now <= row["flash_sale_end"]
+            )
+            data.append({
+                "id": row["id"],
+                "name": row["name"],
+                "price": decimal_to_string(row["price"]),
+                "current_price": row["flash_sale_price"] if on_sale and row["flash_sale_price"] else row["price"],
+                "is_flash_sale_active": on_sale,
+                "mainimage": media_url + filepath_to_uri(row["mainimage"]) if row["mainimage"] else None,
+                "category": row["category_id"],
+            })
+        return data
+
+
+class CompactProductComboListSerializer(CompactListSerializer):
+    """Danh sách combo gọn: một truy vấn cho combo và một truy vấn cho toàn bộ món, không dựng model"""
+
+    value_fields = ("id", "name", "discount_amount", "is_active")
+    fields = ("id", "name", "discount_amount", "is_active", "items", "total_original_price", "total_discounted_price")
+
+    def build(self, rows):
+        combos = list(rows)
+        items = ProductComboItem.objects.filter(combo_id__in=[combo["id"] for combo in combos]).order_by("id")
+        items_by_combo = {}
+        for item in items.values("combo_id", "product_id", "quantity", "product__price"):
+            items_by_combo.setdefault(item["combo_id"], []).append(item)
+
+        data = []
+        for combo in combos:
+            combo_items = items_by_combo.get(combo["id"], [])
+            total = sum(item["product__price"] * item["quantity"] for item in combo_items)
+            data.append({
+                "id": combo["id"],
+                "name": combo["name"],
+                "discount_amount": decimal_to_string(combo["discount_amount"]),
+                "is_active": combo["is_active"],
+                "items": [{"product": item["product_id"], "quantity": item["quantity"]} for item in combo_items],
+                "total_original_price": total,
+                "total_discounted_price": max(0, total - combo["discount_amount"]),
+            })
+        return data
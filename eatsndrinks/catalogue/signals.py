@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.images import delete_derivatives, schedule_derivatives
+from .cache import bump_catalogue_version
+from .models import Category, Product, ProductImage, ProductCombo, ProductComboItem
+
+CATALOGUE_MODELS = (Category, Product, ProductImage, ProductCombo, ProductComboItem)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_catalogue_cache(sender, **kwargs):
+    """Mọi thay đổi dữ liệu danh mục đều làm cache phản hồi cũ hết hiệu lực"""
+    if sender in CATALOGUE_MODELS:
+        bump_catalogue_version()
+
+
+@receiver(post_save, sender=Product)
+def generate_product_image_derivatives(sender, instance, raw=False, **kwargs):
+    # Hash nội dung trong manifest giúp bỏ qua ảnh không đổi khi sản phẩm được lưu lại
+    if not raw:
+        schedule_derivatives(instance.mainimage, on_done=bump_catalogue_version)
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_gallery_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_derivatives(instance.image, on_done=bump_catalogue_version)
+
+
+@receiver(post_delete, sender=ProductImage)
+def delete_gallery_image_derivatives(sender, instance, **kwargs):
+    if instance.image:
+        delete_derivatives(instance.image.name)
@@ -1,3 +1,477 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from search.services import search_product_ids
+from users.models import User
+from .cache import bump_catalogue_version, get_catalogue_version
+from .models import Category, Product, ProductImage, ProductCombo, ProductComboItem
+from .serializers import CompactProductListSerializer
+from .combos import best_combos_for_cart, get_combo_index
+from .pricing import SALE_END_RESOLUTION, process_due_price_changes
+from .sampling import get_product_pool, sample_product_ids
 
-# Create your tests here.
+
+class CatalogueQueryBudgetTest(APITestCase):
+    """Số truy vấn của mỗi endpoint phải cố định, không phụ thuộc số bản ghi trên trang"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Đồ uống')
+
+    def create_products(self, count):
+        products = []
+        for i in range(count):
+            product = Product.objects.create(name=f'Món {i}', price=10000 + i, category=self.category)
+            ProductImage.objects.create(product=product, image=f'product_images/{i}.png')
+            products.append(product)
+        return products
+
+    def create_combos(self, count, products):
+        for i in range(count):
+            combo = ProductCombo.objects.create(name=f'Combo {i}', discount_amount=1000)
+            for product in products[:3]:
+                ProductComboItem.objects.create(combo=combo, product=product, quantity=2)
+
+    def assertQueryBudget(self, budget, url, params=None):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_product_list(self):
+        for count in (2, 8):
+            self.create_products(count // 2)
+            self.assertQueryBudget(3, '/catalogue/products/', {'page_size': 100})
+
+    def test_product_detail(self):
+        product = self.create_products(1)[0]
+        self.assertQueryBudget(2, f'/catalogue/products/{product.id}/')
+
+    def test_category_products(self):
+        for count in (2, 8):
+            self.create_products(count // 2)
+            self.assertQueryBudget(3, f'/catalogue/categories/{self.category.id}/products/')
+
+    def test_combo_list(self):
+        products = self.create_products(3)
+        for count in (1, 5):
+            self.create_combos(count, products)
+            response = self.assertQueryBudget(2, '/catalogue/combos/')
+        combo = response.data[0]
+        self.assertEqual(combo['total_original_price'], (10000 + 10001 + 10002) * 2)
+        self.assertEqual(combo['total_discounted_price'], (10000 + 10001 + 10002) * 2 - 1000)
+
+    def test_related_combos(self):
+        products = self.create_products(3)
+        for count in (1, 5):
+            self.create_combos(count, products)
+            self.assertQueryBudget(4, f'/catalogue/products/{products[0].id}/related-combos/')
+
+
+class CatalogueResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Đồ uống')
+        self.product = Product.objects.create(name='Trà đào', price=30000, category=self.category)
+
+    def test_second_request_is_served_from_cache(self):
+        self.client.get('/catalogue/products/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/catalogue/products/')
+        self.assertEqual(response.data['results'][0]['name'], 'Trà đào')
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/catalogue/products/', {'page_size': 1})
+        with self.assertNumQueries(3):
+            self.client.get('/catalogue/products/', {'page_size': 2})
+
+    def test_staff_and_anonymous_responses_are_cached_separately(self):
+        self.product.is_active = False
+        self.product.save()
+        self.assertEqual(self.client.get('/catalogue/products/').data['count'], 0)
+
+        admin = User.objects.create_user(
+            username='admin', password='adminpass123', first_name='Ad', last_name='Min', is_staff=True
+        )
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get('/catalogue/products/').data['count'], 1)
+
+    def test_saving_catalogue_models_bumps_version(self):
+        for save in (
+            self.product.save,
+            self.category.save,
+            lambda: ProductImage.objects.create(product=self.product),
+            lambda: ProductCombo.objects.create(name='Combo', discount_amount=0),
+        ):
+            version = get_catalogue_version()
+            save()
+            self.assertGreater(get_catalogue_version(), version)
+
+    def test_product_change_invalidates_cached_list(self):
+        self.client.get('/catalogue/products/')
+        self.product.name = 'Trà vải'
+        self.product.save()
+        response = self.client.get('/catalogue/products/')
+        self.assertEqual(response.data['results'][0]['name'], 'Trà vải')
+
+    def test_etag_returns_not_modified(self):
+        response = self.client.get(f'/catalogue/categories/{self.category.id}/')
+        etag = response['ETag']
+        response = self.client.get(f'/catalogue/categories/{self.category.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.category.name = 'Giải khát'
+        self.category.save()
+        response = self.client.get(f'/catalogue/categories/{self.category.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class EffectivePriceTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.cheap = Product.objects.create(name='Nước suối', price=5000)
+        self.sale = Product.objects.create(
+            name='Trà sữa', price=40000, flash_sale_price=3000,
+            flash_sale_start=self.now - timedelta(hours=1),
+            flash_sale_end=self.now + timedelta(hours=1),
+        )
+        self.upcoming = Product.objects.create(
+            name='Cà phê', price=25000, flash_sale_price=1000,
+            flash_sale_start=self.now + timedelta(hours=2),
+            flash_sale_end=self.now + timedelta(hours=3),
+        )
+
+    def test_effective_price_is_computed_on_save(self):
+        self.assertEqual(self.cheap.effective_price, 5000)
+        self.assertIsNone(self.cheap.price_changes_at)
+        self.assertEqual(self.sale.effective_price, 3000)
+        self.assertEqual(self.sale.price_changes_at, self.sale.flash_sale_end + SALE_END_RESOLUTION)
+        self.assertEqual(self.upcoming.effective_price, 25000)
+        self.assertEqual(self.upcoming.price_changes_at, self.upcoming.flash_sale_start)
+
+    def test_effective_price_accepts_string_values(self):
+        self.cheap.flash_sale_price = '4000'
+        self.cheap.flash_sale_start = (self.now - timedelta(minutes=5)).isoformat()
+        self.cheap.flash_sale_end = (self.now + timedelta(minutes=5)).isoformat()
+        self.cheap.save()
+        self.assertEqual(self.cheap.effective_price, 4000)
+
+    def test_scheduler_switches_sale_windows(self):
+        self.assertEqual(process_due_price_changes(now=self.now + timedelta(hours=2, minutes=30)), 2)
+        self.sale.refresh_from_db()
+        self.upcoming.refresh_from_db()
+        self.assertEqual(self.sale.effective_price, 40000)
+        self.assertIsNone(self.sale.price_changes_at)
+        self.assertEqual(self.upcoming.effective_price, 1000)
+        self.assertEqual(self.upcoming.price_changes_at, self.upcoming.flash_sale_end + SALE_END_RESOLUTION)
+
+        self.assertEqual(process_due_price_changes(now=self.now + timedelta(hours=2, minutes=30)), 0)
+
+    def test_scheduler_bumps_catalogue_version(self):
+        version = get_catalogue_version()
+        process_due_price_changes(now=self.now + timedelta(hours=2))
+        self.assertGreater(get_catalogue_version(), version)
+
+    def test_order_and_filter_by_effective_price(self):
+        ordered = list(Product.objects.order_by_effective_price().values_list('id', flat=True))
+        self.assertEqual(ordered, [self.sale.id, self.cheap.id, self.upcoming.id])
+        in_range = Product.objects.effective_price_between(4000, 30000)
+        self.assertEqual(list(in_range.values_list('id', flat=True)), [self.cheap.id, self.upcoming.id])
+
+    def test_product_list_price_params(self):
+        response = self.client.get('/catalogue/products/', {'ordering': '-price', 'max_price': 30000})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.upcoming.id, self.cheap.id, self.sale.id])
+        response = self.client.get('/catalogue/products/', {'min_price': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RandomProductSamplingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.drinks = Category.objects.create(name='Đồ uống')
+        self.food = Category.objects.create(name='Đồ ăn')
+        self.products = [
+            Product.objects.create(name=f'Món {i}', price=10000, category=self.drinks if i % 2 else self.food)
+            for i in range(20)
+        ]
+        self.on_sale = Product.objects.create(
+            name='Trà sữa', price=40000, flash_sale_price=30000, category=self.drinks,
+            flash_sale_start=now - timedelta(hours=1), flash_sale_end=now + timedelta(hours=1),
+        )
+        Product.objects.create(name='Ngừng bán', price=10000, is_active=False)
+
+    def test_returns_eight_distinct_active_products(self):
+        response = self.client.get('/catalogue/products/random/')
+        ids = [p['id'] for p in response.data]
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(len(set(ids)), 8)
+        self.assertTrue(Product.objects.filter(id__in=ids, is_active=True).count() == 8)
+
+    def test_query_count_is_constant_once_pool_is_loaded(self):
+        self.client.get('/catalogue/products/random/')
+        with self.assertNumQueries(2):
+            self.client.get('/catalogue/products/random/')
+
+    def test_category_filter(self):
+        response = self.client.get('/catalogue/products/random/', {'category': self.food.id})
+        self.assertTrue(all(p['category'] == self.food.id for p in response.data))
+
+    def test_seed_gives_stable_non_overlapping_pages(self):
+        first = sample_product_ids(seed='session-1', page=1)
+        self.assertEqual(first, sample_product_ids(seed='session-1', page=1))
+        second = sample_product_ids(seed='session-1', page=2)
+        self.assertFalse(set(first) & set(second))
+        third = sample_product_ids(seed='session-1', page=3)
+        self.assertEqual(len(first + second + third), 21)
+
+    def test_seed_order_survives_unrelated_catalogue_changes(self):
+        first, pool = sample_product_ids(seed='session-1', page=1), get_product_pool()
+        bump_catalogue_version()  # vd. sửa một danh mục, danh sách sản phẩm vẫn như cũ
+        self.assertIsNot(get_product_pool(), pool)
+        self.assertEqual(sample_product_ids(seed='session-1', page=1), first)
+
+    def test_flash_sale_weight_prefers_sale_products(self):
+        hits = sum(self.on_sale.id in sample_product_ids(count=1, flash_sale_weight=1000) for _ in range(50))
+        self.assertGreater(hits, 40)
+
+    def test_pool_refreshes_when_catalogue_changes(self):
+        pool = get_product_pool()
+        product = Product.objects.create(name='Mới', price=10000)
+        self.assertIsNot(get_product_pool(), pool)
+        self.assertIn(product.id, get_product_pool().get_group()[1])
+
+    def test_invalid_params(self):
+        for params in ({'flash_sale_weight': '0'}, {'flash_sale_weight': 'inf'}, {'flash_sale_weight': 'nan'}, {'page': '51'}):
+            response = self.client.get('/catalogue/products/random/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_uncategorized_products_are_drawn_once(self):
+        extra = Product.objects.bulk_create(Product(name=f'Lẻ {i}', price=10000) for i in range(20))
+        cache.clear()  # bulk_create không đổi phiên bản danh mục
+        flash, regular = get_product_pool().get_group()
+        self.assertEqual(len(regular), len(set(regular)))
+        self.assertTrue({product.id for product in extra} <= set(regular))
+        for seed in range(50):
+            ids = sample_product_ids(count=20, seed=seed)
+            self.assertEqual(len(ids), len(set(ids)))
+
+
+class ProductBulkImportExportTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Đồ uống')
+        self.product = Product.objects.create(name='Trà đào', price=30000, category=self.category)
+        self.admin = User.objects.create_user(
+            username='admin', password='adminpass123', first_name='Ad', last_name='Min', is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, name, content, **data):
+        return self.client.post(
+            '/catalogue/products/import/',
+            {'file': SimpleUploadedFile(name, content.encode()), **data},
+            format='multipart',
+        )
+
+    def test_csv_import_creates_updates_and_reports_errors(self):
+        now = timezone.now()
+        content = (
+            'id,name,price,flash_sale_price,flash_sale_start,flash_sale_end,category,images\n'
+            f'{self.product.id},Trà đào cam sả,35000,,,,Đồ uống,\n'
+            f',Cà phê sữa,25000,20000,{(now - timedelta(hours=1)).isoformat()},{(now + timedelta(hours=1)).isoformat()},Đồ uống,a.png|b.png\n'
+            ',Không giá,,,,,Đồ uống,\n'
+            ',Bánh mì,15000,,,,Đồ ăn,\n'
+            '999999,Không tồn tại,10000,,,,,\n'
+        )
+        version = get_catalogue_version()
+        response = self.upload('menu.csv', content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [4, 5, 6])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.assertGreater(get_catalogue_version(), version)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, 'Trà đào cam sả')
+        self.assertEqual(self.product.effective_price, 35000)
+        coffee = Product.objects.get(name='Cà phê sữa')
+        self.assertEqual(coffee.effective_price, 20000)
+        self.assertEqual(sorted(image.image.name for image in coffee.images.all()), ['a.png', 'b.png'])
+        self.assertEqual(list(search_product_ids('ca phe').values_list('product_id', flat=True)), [coffee.id])
+
+    def test_jsonl_import_can_create_categories(self):
+        content = '{"name": "Bánh mì", "price": "15000", "category": "Đồ ăn"}\nnot json\n'
+        response = self.upload('menu.jsonl', content, create_categories='true')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['line'], 2)
+        self.assertEqual(Product.objects.get(name='Bánh mì').category.name, 'Đồ ăn')
+
+    def test_import_without_bulk_insert_returning_ids(self):
+        saved = []
+        receiver = lambda instance, **kwargs: saved.append(instance.pk)
+        post_save.connect(receiver, sender=Product)
+        self.addCleanup(post_save.disconnect, receiver, sender=Product)
+        content = 'name,price,images\nBánh mì,15000,a.png\nBánh mì,16000,b.png\nXôi,20000,\n'
+        # Như MySQL: bulk_create không gán id cho các object
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.upload('menu.csv', content)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(saved, [])
+        breads = Product.objects.filter(name='Bánh mì').order_by('price')
+        self.assertEqual([p.images.get().image.name for p in breads], ['a.png', 'b.png'])
+        self.assertEqual(
+            list(search_product_ids('xoi').values_list('product_id', flat=True)), [Product.objects.get(name='Xôi').id]
+        )
+
+    def test_import_queues_image_derivatives_after_commit(self):
+        content = 'name,price,mainimage,images\nBánh mì,15000,product_main_images/m.png,a.png|b.png\nXôi,20000,,\n'
+        with mock.patch('api.images.get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.upload('menu.csv', content)
+                get_executor.assert_not_called()  # Chỉ chạy sau khi lô đã commit
+        submitted = sorted(call.args[1] for call in get_executor.return_value.submit.call_args_list)
+        self.assertEqual(submitted, ['a.png', 'b.png', 'product_main_images/m.png'])
+
+    def test_import_requires_admin(self):
+        self.client.force_authenticate(None)
+        response = self.upload('menu.csv', 'name,price\nBánh,1000\n')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get('/catalogue/products/export/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_round_trips_through_import(self):
+        ProductImage.objects.create(product=self.product, image='product_images/1.png')
+        response = self.client.get('/catalogue/products/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Trà đào', content)
+        self.assertIn('product_images/1.png', content)
+
+        response = self.upload('products.csv', content)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['error_count']), (0, 1, 0))
+        self.assertEqual(self.product.images.get().image.name, 'product_images/1.png')
+
+        response = self.client.get('/catalogue/products/export/', {'file_format': 'jsonl'})
+        record = json.loads(b''.join(response.streaming_content).decode().splitlines()[0])
+        self.assertEqual(record['category'], 'Đồ uống')
+
+
+class SparseFieldsAndCompactListTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.category = Category.objects.create(name='Đồ uống')
+        self.products = [
+            Product.objects.create(name=f'Món {i}', price=10000 + i, category=self.category) for i in range(3)
+        ]
+        self.sale = Product.objects.create(
+            name='Trà sữa', price=40000, flash_sale_price=30000, category=self.category,
+            mainimage='product_main_images/tra-sua.jpg',
+            flash_sale_start=now - timedelta(hours=1), flash_sale_end=now + timedelta(hours=1),
+        )
+        ProductImage.objects.create(product=self.sale, image='product_images/1.png')
+
+    def test_fields_param_limits_product_fields_and_skips_images_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/catalogue/products/', {'fields': 'id,name,current_price'})
+        self.assertEqual(response.data['results'][3], {'id': self.sale.id, 'name': 'Trà sữa', 'current_price': 30000})
+
+        response = self.client.get(f'/catalogue/products/{self.sale.id}/', {'fields': 'id,images'})
+        self.assertEqual(set(response.data), {'id', 'images'})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/catalogue/products/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compact_products_match_full_serializer(self):
+        full = self.client.get('/catalogue/products/').data['results']
+        compact = self.client.get('/catalogue/products/', {'compact': '1'}).data['results']
+        self.assertEqual(len(compact), len(full))
+        for full_item, compact_item in zip(full, compact):
+            self.assertEqual(set(compact_item), set(CompactProductListSerializer.fields))
+            for key in compact_item:
+                self.assertEqual(compact_item[key], full_item[key], key)
+
+    def test_compact_price_and_flash_sale_flag_agree(self):
+        # Flash sale đã bắt đầu nhưng effective_price chưa được process_due_price_changes cập nhật
+        now = timezone.now()
+        Product.objects.filter(pk=self.products[0].pk).update(
+            flash_sale_price=5000, flash_sale_start=now - timedelta(minutes=1), flash_sale_end=now + timedelta(hours=1),
+        )
+        compact = self.client.get('/catalogue/products/', {'compact': '1'}).data['results']
+        self.assertEqual((compact[0]['current_price'], compact[0]['is_flash_sale_active']), (5000, True))
+        self.assertIs(compact[1]['is_flash_sale_active'], False)
+        full = self.client.get('/catalogue/products/').data['results']
+        self.assertEqual((full[0]['current_price'], full[0]['is_flash_sale_active']), (5000, True))
+
+    def test_compact_products_with_cursor_and_fields(self):
+        response = self.client.get(
+            '/catalogue/products/', {'compact': '1', 'cursor': '', 'page_size': 2, 'fields': 'id,current_price'}
+        )
+        self.assertEqual(response.data['results'], [
+            {'id': self.products[0].id, 'current_price': 10000},
+            {'id': self.products[1].id, 'current_price': 10001},
+        ])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['id'] for item in response.data['results']], [self.products[2].id, self.sale.id])
+
+    def test_compact_combos(self):
+        combo = ProductCombo.objects.create(name='Combo', discount_amount=1000)
+        for product in self.products[:2]:
+            ProductComboItem.objects.create(combo=combo, product=product, quantity=2)
+        full = self.client.get('/catalogue/combos/').data[0]
+        with self.assertNumQueries(2):
+            compact = self.client.get('/catalogue/combos/', {'compact': 'true'}).data[0]
+        self.assertEqual(compact['total_original_price'], full['total_original_price'])
+        self.assertEqual(compact['total_discounted_price'], full['total_discounted_price'])
+        self.assertEqual(compact['discount_amount'], full['discount_amount'])
+        self.assertEqual(compact['items'], [{'product': p.id, 'quantity': 2} for p in self.products[:2]])
+
+
+class ComboEngineTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.tea, self.cake, self.coffee = [
+            Product.objects.create(name=name, price=20000) for name in ('Trà', 'Bánh', 'Cà phê')
+        ]
+
+    def create_combo(self, discount, *items, is_active=True):
+        combo = ProductCombo.objects.create(name=f'Combo {discount}', discount_amount=discount, is_active=is_active)
+        for product, quantity in items:
+            ProductComboItem.objects.create(combo=combo, product=product, quantity=quantity)
+        return combo
+
+    def test_picks_optimal_set_instead_of_largest_first(self):
+        # Combo lớn nhất dùng hết trà; hai combo nhỏ hơn cùng áp dụng được lại giảm nhiều hơn
+        self.create_combo(5000, (self.tea, 2), (self.cake, 1))
+        small_a = self.create_combo(3000, (self.tea, 1), (self.coffee, 1))
+        small_b = self.create_combo(3000, (self.tea, 1), (self.cake, 1))
+        best, discount = best_combos_for_cart([(self.tea.id, 2), (self.cake.id, 1), (self.coffee.id, 1)])
+        self.assertEqual(discount, 6000)
+        self.assertEqual({combo.id for combo in best}, {small_a.id, small_b.id})
+
+    def test_each_combo_applies_once_and_needs_enough_quantity(self):
+        combo = self.create_combo(2000, (self.tea, 2))
+        self.assertEqual(best_combos_for_cart([(self.tea.id, 1)]), ([], 0))
+        best, discount = best_combos_for_cart([(self.tea.id, 3), (self.tea.id, 2)])
+        self.assertEqual(([c.id for c in best], discount), ([combo.id], 2000))
+
+    def test_index_is_reloaded_when_combos_change(self):
+        combo = self.create_combo(2000, (self.tea, 1), is_active=False)
+        with self.assertNumQueries(1):
+            get_combo_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(best_combos_for_cart([(self.tea.id, 1)]), ([], 0))
+        combo.is_active = True
+        combo.save()
+        self.assertEqual(best_combos_for_cart([(self.tea.id, 1)])[1], 2000)
@@ -10,9 +10,12 @@ from .mixins import (
 from .models import Category, Product, ProductImage, ProductCombo, ProductComboItem
 from .serializers import (
     CategorySerializer, ProductSerializer, ProductImageSerializer,
-    ProductComboSerializer, ProductComboItemSerializer
+    ProductComboSerializer, ProductComboItemSerializer,
+    CompactProductListSerializer, CompactProductComboListSerializer,
 )
-from rest_framework.pagination import PageNumberPagination
+from analytics.services import month_over_month
+from api.pagination import OptInCursorPagination
+from api.serializers import requested_fields
 from rest_framework.decorators import action
 from rest_framework import status
 from rest_framework.decorators import action
@@ -26,6 +29,26 @@ from rest_framework import status, viewsets
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.utils import timezone
 from rest_framework.permissions import IsAdminUser
+import math
+from decimal import Decimal, InvalidOperation
+from django.db.models import OuterRef, Prefetch, Subquery
+from search.services import search_product_ids
+from .cache import cache_response
+from .sampling import MAX_PAGE, sample_product_ids
+from .bulk import FORMATS, detect_format, export_products, import_products
+from django.http import StreamingHttpResponse
+
+
+def wants_compact(request):
+    """?compact=1: trả danh sách gọn dựng từ values() thay vì serializer đầy đủ"""
+    return request.query_params.get("compact", "").lower() in ("1", "true")
+
+
+def with_combo_items(queryset):
+    """Nạp sẵn các món trong combo cùng sản phẩm của chúng để serializer không truy vấn theo từng combo"""
+    return queryset.prefetch_related(
+        Prefetch("items", queryset=ProductComboItem.objects.select_related("product").order_by("id"))
+    )
 
 class CategoryViewSet(
     CustomPermissionMixin, CategorySchemaMixin, viewsets.ModelViewSet
@@ -42,11 +65,12 @@ class CategoryViewSet(
         return queryset
 
     @action(detail=True, methods=["get"], url_path="products")
+    @cache_response
     def get_products(self, request, pk=None):
         """Chỉ trả về sản phẩm is_active=True thuộc category nếu là user thường"""
         try:
             category = self.get_object()
-            products = Product.objects.filter(category=category)
+            products = Product.objects.filter(category=category).prefetch_related("images")
 
             if not request.user.is_staff:
                 products = products.filter(is_active=True)  # ✅ Lọc sản phẩm active
@@ -72,23 +96,14 @@ class CategoryViewSet(
             )
 
 
-class ProductPageNumberPagination(PageNumberPagination):
+class ProductPageNumberPagination(OptInCursorPagination):
     page_size = 10  # Default number of items per page
     page_size_query_param = (
         "page_size"  # Allow clients to set page size using this query parameter
     )
     max_page_size = 100  # Maximum number of items that can be requested per page
-
-    def get_paginated_response(self, data):
-        return Response(
-            {
-                "count": self.page.paginator.count,
-                "total_pages": self.page.paginator.num_pages,  # Add total pages here
-                "next": self.get_next_link(),
-                "previous": self.get_previous_link(),
-                "results": data,
-            }
-        )
+    cursor_ordering = ("id",)  # ?cursor= : phân trang keyset theo id, cùng thứ tự với trang số
+    follow_queryset_ordering = True  # ordering=price/-price và ?search= giữ nguyên thứ tự khi dùng cursor
 
 
 # Product ViewSet
@@ -102,10 +117,19 @@ class ProductViewSet(CustomPermissionMixin, ProductSchemaMixin, viewsets.ModelVi
     def get_queryset(self):
         """Lọc sản phẩm dựa vào quyền của người dùng"""
         queryset = Product.objects.all().order_by("id")
+        fields = requested_fields(self.request)
+        if fields is None or "images" in fields:
+            queryset = queryset.prefetch_related("images")
         if not self.request.user.is_staff:
             queryset = queryset.filter(is_active=True)
         return queryset
 
+    def get_permissions(self):
+        # CustomPermissionMixin phân quyền theo method nên cho phép GET công khai; các action này chỉ dành cho admin
+        if self.action in ("get_product_stats", "bulk_import", "bulk_export"):
+            return [IsAdminUser()]
+        return super().get_permissions()
+
     @action(detail=False, methods=["get"], url_path="stats", permission_classes=[IsAdminUser])
     @extend_schema(
         responses={
@@ -121,75 +145,71 @@ class ProductViewSet(CustomPermissionMixin, ProductSchemaMixin, viewsets.ModelVi
     )
     def get_product_stats(self, request):
         """Lấy thống kê số lượng sản phẩm mới trong tháng này và so sánh với tháng trước"""
-        # Get current date in UTC
-        now = timezone.now()
-        
-        # Calculate first day of current month
-        current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Calculate first day of previous month
-        if now.month == 1:
-            previous_month_start = now.replace(year=now.year-1, month=12, day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:
-            previous_month_start = now.replace(month=now.month-1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Calculate first day of next month
-        if now.month == 12:
-            next_month_start = now.replace(year=now.year+1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:
-            next_month_start = now.replace(month=now.month+1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Get product counts
-        current_month_products = Product.objects.filter(
-            created_at__gte=current_month_start,
-            created_at__lt=next_month_start
-        ).count()
-        
-        previous_month_products = Product.objects.filter(
-            created_at__gte=previous_month_start,
-            created_at__lt=current_month_start
-        ).count()
-        
-        # Calculate increase percentage
-        if previous_month_products == 0:
-            increase_percentage = 100 if current_month_products > 0 else 0
-        else:
-            increase_percentage = ((current_month_products - previous_month_products) / previous_month_products) * 100
-        
+        # Đọc từ bảng thống kê theo ngày thay vì đếm lại bảng Product
+        current_month_products, previous_month_products, increase_percentage = month_over_month("new_products")
+
         return Response({
             'current_month_products': current_month_products,
             'previous_month_products': previous_month_products,
-            'increase_percentage': round(increase_percentage, 2)
+            'increase_percentage': increase_percentage
         }, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["get"], url_path="related-combos")
+    @cache_response
     def get_related_combos(self, request, pk=None):
         """Lấy danh sách combo có chứa sản phẩm này"""
         product = self.get_object()
-        combos = ProductCombo.objects.filter(
-            items__product=product,
-            is_active=True
-        ).distinct()
+        combos = with_combo_items(
+            ProductCombo.objects.filter(items__product=product, is_active=True).distinct()
+        )
 
         serializer = ProductComboSerializer(combos, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"], url_path="random")
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name="category", type=int, location=OpenApiParameter.QUERY, required=False, description="Chỉ lấy trong danh mục này"),
+            OpenApiParameter(name="flash_sale_weight", type=float, location=OpenApiParameter.QUERY, required=False, description="Trọng số ưu tiên sản phẩm đang flash sale (mặc định 1)"),
+            OpenApiParameter(name="seed", type=str, location=OpenApiParameter.QUERY, required=False, description="Cố định thứ tự ngẫu nhiên (vd. theo session) để phân trang"),
+            OpenApiParameter(name="page", type=int, location=OpenApiParameter.QUERY, required=False),
+        ]
+    )
     def get_random_products(self, request):
-        """Lấy 8 sản phẩm ngẫu nhiên"""
-        queryset = self.get_queryset().order_by("?")[:8]
-        serializer = self.get_serializer(queryset, many=True)
+        """Lấy 8 sản phẩm ngẫu nhiên từ pool id trong bộ nhớ thay vì ORDER BY RANDOM()"""
+        try:
+            category_id = request.query_params.get("category")
+            category_id = int(category_id) if category_id else None
+            flash_sale_weight = float(request.query_params.get("flash_sale_weight", 1))
+            page = int(request.query_params.get("page", 1))
+        except ValueError:
+            return Response(
+                {"detail": "Giá trị 'category', 'flash_sale_weight' hoặc 'page' không hợp lệ."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not math.isfinite(flash_sale_weight) or flash_sale_weight <= 0 or not 1 <= page <= MAX_PAGE:
+            return Response(
+                {"detail": f"'flash_sale_weight' phải là số hữu hạn lớn hơn 0 và 'page' phải từ 1 đến {MAX_PAGE}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        product_ids = sample_product_ids(
+            count=8,
+            category_id=category_id,
+            flash_sale_weight=flash_sale_weight,
+            seed=request.query_params.get("seed"),
+            page=page,
+        )
+        products = Product.objects.filter(id__in=product_ids).prefetch_related("images")
+        by_id = {product.id: product for product in products}
+        serializer = self.get_serializer([by_id[pk] for pk in product_ids if pk in by_id], many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"], url_path="flash-sale")
+    @cache_response
     def get_flash_sale_products(self, request):
         """Lấy danh sách sản phẩm đang flash sale"""
-        now = timezone.now()
-        queryset = self.get_queryset().filter(
-            flash_sale_start__lte=now,
-            flash_sale_end__gte=now,
-            flash_sale_price__isnull=False,
-        )
+        queryset = self.get_queryset().flash_sale_active()
 
         limit = request.query_params.get("limit")
         if limit is not None:
@@ -233,31 +253,132 @@ class ProductViewSet(CustomPermissionMixin, ProductSchemaMixin, viewsets.ModelVi
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=False, methods=["post"], url_path="import",
+        permission_classes=[IsAdminUser], parser_classes=[MultiPartParser, FormParser],
+    )
+    @extend_schema(
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                    "file_format": {"type": "string", "enum": list(FORMATS)},
+                    "create_categories": {"type": "boolean"},
+                },
+                "required": ["file"],
+            }
+        },
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "created": {"type": "integer"},
+                    "updated": {"type": "integer"},
+                    "error_count": {"type": "integer"},
+                    "errors": {"type": "array", "items": {"type": "object"}},
+                },
+            }
+        },
+    )
+    def bulk_import(self, request):
+        """Import hàng loạt sản phẩm từ file CSV/JSONL; dòng có id sẽ được cập nhật, dòng lỗi được báo lại theo số dòng"""
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "Cần tải lên file CSV hoặc JSONL."}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get("file_format") or detect_format(upload.name)
+        if file_format not in FORMATS:
+            return Response({"detail": "file_format phải là 'csv' hoặc 'jsonl'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        create_categories = str(request.data.get("create_categories", "")).lower() in ("1", "true", "yes")
+        result = import_products(upload.file, file_format, create_categories=create_categories)
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="export", permission_classes=[IsAdminUser])
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name="file_format", type=str, location=OpenApiParameter.QUERY, required=False, enum=list(FORMATS)),
+            OpenApiParameter(name="category", type=int, location=OpenApiParameter.QUERY, required=False, description="ID danh mục"),
+        ],
+        responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    )
+    def bulk_export(self, request):
+        """Xuất toàn bộ sản phẩm dạng CSV/JSONL theo luồng, cùng định dạng với endpoint import"""
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in FORMATS:
+            return Response({"detail": "file_format phải là 'csv' hoặc 'jsonl'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Product.objects.all()
+        category_id = request.query_params.get("category")
+        if category_id:
+            queryset = queryset.filter(category_id=category_id)
+
+        content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+        response = StreamingHttpResponse(
+            export_products(queryset, file_format), content_type=f"{content_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="products.{file_format}"'
+        return response
+
     @extend_schema(
         parameters=[
             OpenApiParameter(name="category", type=int, location=OpenApiParameter.QUERY, required=False, description="ID danh mục"),
             OpenApiParameter(name="search", type=str, location=OpenApiParameter.QUERY, required=False, description="Tìm kiếm theo tên"),
+            OpenApiParameter(name="min_price", type=float, location=OpenApiParameter.QUERY, required=False, description="Giá đang áp dụng tối thiểu"),
+            OpenApiParameter(name="max_price", type=float, location=OpenApiParameter.QUERY, required=False, description="Giá đang áp dụng tối đa"),
+            OpenApiParameter(name="ordering", type=str, location=OpenApiParameter.QUERY, required=False, enum=["price", "-price"], description="Sắp xếp theo giá đang áp dụng"),
             OpenApiParameter(name="page", type=int, location=OpenApiParameter.QUERY, required=False),
             OpenApiParameter(name="page_size", type=int, location=OpenApiParameter.QUERY, required=False),
+            OpenApiParameter(name="fields", type=str, location=OpenApiParameter.QUERY, required=False, description="Chỉ trả các trường này, vd. id,name,current_price"),
+            OpenApiParameter(name="compact", type=bool, location=OpenApiParameter.QUERY, required=False, description="Danh sách gọn: id, name, price, current_price, is_flash_sale_active, mainimage, category"),
         ]
     )
+    @cache_response
     def list(self, request, *args, **kwargs):
-        """Lọc theo category, tìm kiếm theo tên, phân trang"""
+        """Lọc theo category, tìm kiếm theo tên, lọc/sắp xếp theo giá đang áp dụng, phân trang"""
         category_id = request.query_params.get("category")
         search_query = request.query_params.get("search")
+        ordering = request.query_params.get("ordering")
         queryset = self.get_queryset()
 
         if category_id:
             queryset = queryset.filter(category_id=category_id)
+        try:
+            min_price = request.query_params.get("min_price")
+            max_price = request.query_params.get("max_price")
+            queryset = queryset.effective_price_between(
+                Decimal(min_price) if min_price else None,
+                Decimal(max_price) if max_price else None,
+            )
+        except InvalidOperation:
+            return Response(
+                {"detail": "Giá trị 'min_price'/'max_price' không hợp lệ."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if ordering in ("price", "-price"):
+            queryset = queryset.order_by_effective_price(descending=ordering == "-price")
         if search_query:
-            queryset = queryset.filter(name__icontains=search_query)
+            # Tra cứu qua chỉ mục tìm kiếm thay vì quét bảng bằng name__icontains
+            ranked = search_product_ids(search_query, active_only=not request.user.is_staff)
+            if ranked is not None:
+                score = ranked.filter(product_id=OuterRef("pk")).values("score")[:1]
+                queryset = queryset.annotate(search_score=Subquery(score)).filter(search_score__isnull=False)
+                if ordering not in ("price", "-price"):
+                    # Không chỉ định sắp xếp thì giữ thứ tự liên quan của kết quả tìm kiếm
+                    queryset = queryset.order_by("-search_score", "id")
+
+        if wants_compact(request):
+            queryset = CompactProductListSerializer.get_queryset(queryset)
+            page = self.paginate_queryset(queryset)
+            serializer = CompactProductListSerializer(
+                page if page is not None else queryset, context=self.get_serializer_context()
+            )
+        else:
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page if page is not None else queryset, many=True)
 
-        page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -276,7 +397,7 @@ class ProductComboViewSet(CustomPermissionMixin, viewsets.ModelViewSet):
     http_method_names = ["get", "post", "put", "patch"]
 
     def get_queryset(self):
-        queryset = ProductCombo.objects.all().order_by("id")
+        queryset = with_combo_items(ProductCombo.objects.all().order_by("id"))
         if not self.request.user.is_staff:
             queryset = queryset.filter(is_active=True)
         return queryset
@@ -284,8 +405,11 @@ class ProductComboViewSet(CustomPermissionMixin, viewsets.ModelViewSet):
     @extend_schema(
         parameters=[
             OpenApiParameter(name="search", type=str, location=OpenApiParameter.QUERY, required=False, description="Tìm kiếm theo tên"),
+            OpenApiParameter(name="fields", type=str, location=OpenApiParameter.QUERY, required=False, description="Chỉ trả các trường này, vd. id,name,total_discounted_price"),
+            OpenApiParameter(name="compact", type=bool, location=OpenApiParameter.QUERY, required=False, description="Danh sách gọn dựng trực tiếp từ values()"),
         ]
     )
+    @cache_response
     def list(self, request, *args, **kwargs):
         search_query = request.query_params.get("search")
         queryset = self.get_queryset()
@@ -293,9 +417,18 @@ class ProductComboViewSet(CustomPermissionMixin, viewsets.ModelViewSet):
         if search_query:
             queryset = queryset.filter(name__icontains=search_query)
 
-        serializer = self.get_serializer(queryset, many=True)
+        if wants_compact(request):
+            serializer = CompactProductComboListSerializer(
+                CompactProductComboListSerializer.get_queryset(queryset), context=self.get_serializer_context()
+            )
+        else:
+            serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True, methods=["post"])
     def add_item(self, request, pk=None):
         combo = self.get_object()
@@ -0,0 +1,194 @@
+import json
+import threading
+
+from django.utils import timezone
+
+from catalogue.cache import get_catalogue_version
+from catalogue.models import Category, Product
+from catalogue.pricing import effective_price_at
+
+DESCRIPTION_LIMIT = 160  # Ký tự mô tả tối đa mỗi sản phẩm đưa vào prompt
+FETCH_BATCH_SIZE = 500
+
+PRODUCT_FIELDS = (
+    "id", "updated_at", "name", "description", "category_id",
+    "price", "flash_sale_price", "flash_sale_start", "flash_sale_end",
+)
+
+SYSTEM_PROMPT = """
+Bạn là một chatbot thông minh cho trang web EatsNDrinks - một trang web bán đồ ăn và thức uống. Nhiệm vụ của bạn là:
+
+1. Trả lời các câu hỏi về sản phẩm
+2. Đề xuất sản phẩm phù hợp dựa trên yêu cầu của khách hàng
+3. Cung cấp thông tin về giá cả, khuyến mãi
+4. Hỗ trợ tìm kiếm sản phẩm theo danh mục
+
+Dữ liệu sản phẩm hiện có:
+- Tổng cộng {product_count} sản phẩm
+- {category_count} danh mục
+
+Danh mục sản phẩm (i=id, n=tên, d=mô tả):
+{categories}
+
+Sản phẩm{scope} (i=id, n=tên, c=id danh mục, p=giá hiện tại VND, g=giá gốc khi đang flash sale, d=mô tả):
+{products}
+
+Hướng dẫn trả lời:
+- Khi khách hàng chào hỏi (xin chào, hello, hi): Chỉ chào lại và giới thiệu về khả năng của bạn, KHÔNG đề xuất sản phẩm
+- Khi khách hàng hỏi chung chung: Giới thiệu về trang web và hỏi họ muốn tìm gì
+- Khi khách hàng hỏi về sản phẩm cụ thể: Cung cấp thông tin chi tiết
+- Khi khách hàng muốn tìm sản phẩm theo danh mục: Đề xuất các sản phẩm phù hợp
+- Khi có khuyến mãi (sản phẩm có g): Nhấn mạnh thông tin này
+- Trả lời bằng tiếng Việt, thân thiện và hữu ích
+
+QUAN TRỌNG - Đề xuất sản phẩm:
+- CHỈ đề xuất sản phẩm khi khách hàng yêu cầu tìm kiếm, đề xuất, hoặc hỏi về sản phẩm cụ thể
+- KHÔNG đề xuất sản phẩm khi khách hàng chỉ chào hỏi
+- Khi đề xuất, hãy đề xuất 3-5 sản phẩm phù hợp từ danh sách trên
+- Nếu được yêu cầu đề xuất sản phẩm, hãy trả về danh sách ID sản phẩm được đề xuất trong format JSON: {{"recommendations": [id1, id2, id3]}}
+- Nếu không có format JSON, hãy đề xuất sản phẩm bằng cách nhắc tên sản phẩm trong câu trả lời
+
+Hãy trả lời ngắn gọn, thân thiện và hữu ích!
+"""
+
+_digest = None
+_digest_lock = threading.Lock()
+
+
+def _compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _short(text):
+    text = " ".join(text.split())
+    return text if len(text) <= DESCRIPTION_LIMIT else text[:DESCRIPTION_LIMIT - 1] + "…"
+
+
+class ProductEntry:
+    """Một sản phẩm trong bản tóm tắt: JSON đã định dạng sẵn và thời điểm cần định dạng lại"""
+
+    __slots__ = ("updated_at", "changes_at", "text")
+
+    def __init__(self, row, now):
+        product_id, self.updated_at, name, description, category_id, price, sale_price, sale_start, sale_end = row
+        current, self.changes_at = effective_price_at(price, sale_price, sale_start, sale_end, now)
+        data = {"i": product_id, "n": name, "c": category_id, "p": int(current)}
+        if current != price:
+            data["g"] = int(price)
+        if description:
+            data["d"] = _short(description)
+        self.text = _compact(data)
+
+
+class CatalogueDigest:
+    """
+    Bản tóm tắt gọn (JSON không thụt lề, khóa ngắn) của sản phẩm và danh mục đang bán, cùng
+    system prompt dựng từ nó. Khi phiên bản danh mục đổi, chỉ đọc lại đầy đủ các sản phẩm có
+    updated_at khác trước (một truy vấn nhẹ lấy id, updated_at để so sánh); khi tới thời điểm
+    flash sale bắt đầu/kết thúc, chỉ định dạng lại các sản phẩm đó. Một bản đã dựng xong không
+    bị sửa nữa: cập nhật tạo bản mới (xem refreshed) nên các luồng đang đọc không thấy trạng thái dở dang.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.entries = {}  # product_id -> ProductEntry
+        self.expires_at = None  # Thời điểm giá của một sản phẩm trong bản tóm tắt sẽ đổi
+        self.categories = "[]"
+        self.category_count = 0
+        self.system_prompt = ""
+        self.reloaded = 0  # Số sản phẩm đã định dạng lại khi dựng bản này
+
+    def is_stale(self, version, now):
+        return self.version != version or (self.expires_at is not None and now >= self.expires_at)
+
+    def refreshed(self, version, now):
+        """
+        Bản tóm tắt mới đồng bộ với DB, dựng từ bản sao các sản phẩm của bản này (ProductEntry
+        không đổi sau khi tạo nên dùng chung được); bản hiện tại giữ nguyên.
+        """
+        digest = CatalogueDigest()
+        digest.entries = dict(self.entries)
+        digest.categories, digest.category_count = self.categories, self.category_count
+        changed = set()
+        if self.version != version:
+            current = dict(Product.objects.filter(is_active=True).values_list("id", "updated_at"))
+            for product_id in digest.entries.keys() - current.keys():
+                del digest.entries[product_id]
+            changed.update(
+                product_id for product_id, updated_at in current.items()
+                if product_id not in digest.entries or digest.entries[product_id].updated_at != updated_at
+            )
+            digest._load_categories()
+        changed.update(
+            product_id for product_id, entry in digest.entries.items()
+            if entry.changes_at is not None and entry.changes_at <= now
+        )
+        # Lần đầu thì đọc tất cả bằng một truy vấn, không cần lọc theo id
+        digest._load_products(None if not digest.entries else sorted(changed), now)
+
+        digest.version = version
+        digest.expires_at = min(
+            (entry.changes_at for entry in digest.entries.values() if entry.changes_at is not None), default=None
+        )
+        digest.system_prompt = digest.prompt_for(sorted(digest.entries))
+        digest.reloaded = len(changed)
+        return digest
+
+    def prompt_for(self, product_ids, scope=""):
+        """System prompt chỉ chứa các sản phẩm trong product_ids (theo thứ tự đó)"""
+        entries = [self.entries[product_id].text for product_id in product_ids if product_id in self.entries]
+        return SYSTEM_PROMPT.format(
+            product_count=len(self.entries),
+            category_count=self.category_count,
+            categories=self.categories,
+            products="[" + ",".join(entries) + "]",
+            scope=scope,
+        )
+
+    def _load_products(self, product_ids, now):
+        """Định dạng lại các sản phẩm trong product_ids (None: mọi sản phẩm đang bán)"""
+        queryset = Product.objects.filter(is_active=True).values_list(*PRODUCT_FIELDS)
+        if product_ids is None:
+            batches = [queryset]
+        else:
+            batches = (
+                queryset.filter(pk__in=product_ids[start:start + FETCH_BATCH_SIZE])
+                for start in range(0, len(product_ids), FETCH_BATCH_SIZE)
+            )
+        for batch in batches:
+            for row in batch:
+                self.entries[row[0]] = ProductEntry(row, now)
+
+    def _load_categories(self):
+        # Danh mục ít nên luôn đọc lại cả bảng khi phiên bản đổi
+        categories = Category.objects.filter(is_active=True).order_by("id").values_list("id", "name", "description")
+        data = [{"i": category_id, "n": name, **({"d": _short(description)} if description else {})}
+                for category_id, name, description in categories]
+        self.categories = _compact(data)
+        self.category_count = len(data)
+
+
+def get_catalogue_digest():
+    """Bản tóm tắt hiện tại, cập nhật phần thay đổi khi phiên bản danh mục đổi hoặc giá sale tới hạn"""
+    global _digest
+    version = get_catalogue_version()
+    now = timezone.now()
+    digest = _digest
+    if digest is None or digest.is_stale(version, now):
+        with _digest_lock:
+            digest = _digest or CatalogueDigest()
+            if digest.is_stale(version, now):
+                # Dựng bản mới rồi mới thay, người đọc không khóa luôn thấy một bản hoàn chỉnh
+                digest = _digest = digest.refreshed(version, now)
+    return digest
+
+
+def get_system_prompt(product_ids=None):
+    """
+    System prompt cho chatbot, đọc từ bản tóm tắt đã dựng sẵn. product_ids giới hạn sản phẩm
+    đưa vào prompt (vd. kết quả của retrieval); None để đưa toàn bộ danh mục.
+    """
+    digest = get_catalogue_digest()
+    if product_ids is None:
+        return digest.system_prompt
+    return digest.prompt_for(product_ids, scope=f" liên quan nhất tới câu hỏi ({len(product_ids)})")
@@ -0,0 +1,98 @@
+"""
+Đánh giá offline bước retrieval của chatbot: với mỗi câu hỏi lấy từ test_recommendations.py và
+test_chatbot_intents.py, so sánh các sản phẩm được chọn đưa vào prompt với tập sản phẩm đúng
+(xác định bằng luật trên dữ liệu danh mục) và tính recall@k.
+"""
+from decimal import Decimal
+
+from catalogue.models import Category, Product
+from search.services import normalize_text
+from .retrieval import TOP_K
+from .services import ChatbotService
+
+# relevant: ("category", tên) | ("name", từ khóa) | ("cheapest",) | ("most_expensive",) | None = không cần sản phẩm
+CASES = [
+    ("Xin chào", None),
+    ("Hello", None),
+    ("Hi", None),
+    ("Chào bạn", None),
+    ("Tôi muốn tìm đồ uống", ("category", "Đồ uống")),
+    ("Đề xuất cho tôi món ăn ngon", ("category", "Món ăn")),
+    ("Đề xuất cho tôi món ăn", ("category", "Món ăn")),
+    ("Có gì rẻ không?", ("cheapest",)),
+    ("Có sản phẩm nào rẻ không?", ("cheapest",)),
+    ("Có sản phẩm nào cao cấp không?", ("most_expensive",)),
+    ("Tôi muốn mua Milo", ("name", "Milo")),
+    ("Tôi muốn mua đồ uống có ga", ("category", "Đồ uống")),
+    ("Tôi muốn mua thức ăn nhanh", ("category", "Thức ăn nhanh")),
+]
+
+# Danh mục mẫu cho --sample: (danh mục, [(tên, mô tả, giá)])
+SAMPLE_CATALOGUE = [
+    ("Đồ uống", [
+        ("Coca Cola", "Nước ngọt có ga, uống lạnh", 15000),
+        ("Pepsi", "Nước ngọt có ga vị cola", 15000),
+        ("Milo", "Sữa lúa mạch Milo", 12000),
+        ("Trà đào", "Trà đào cam sả mát lạnh", 35000),
+        ("Cà phê sữa đá", "Cà phê phin pha sữa đặc", 29000),
+        ("Sinh tố bơ", "Sinh tố bơ sánh mịn", 45000),
+        ("Nước suối", "Nước khoáng đóng chai", 8000),
+    ]),
+    ("Món ăn", [
+        ("Cơm tấm sườn", "Cơm tấm sườn nướng, bì, chả", 55000),
+        ("Phở bò", "Phở bò tái nạm nước dùng ninh xương", 60000),
+        ("Bún chả", "Bún chả Hà Nội chả nướng than hoa", 50000),
+        ("Bò bít tết", "Thăn bò Úc áp chảo sốt tiêu đen", 250000),
+        ("Cá hồi nướng", "Phi lê cá hồi Na Uy nướng bơ tỏi", 220000),
+    ]),
+    ("Thức ăn nhanh", [
+        ("Gà rán", "Gà rán giòn cay", 40000),
+        ("Khoai tây chiên", "Khoai tây chiên giòn", 25000),
+        ("Hamburger bò", "Bánh mì kẹp thịt bò phô mai", 65000),
+        ("Bánh mì thịt", "Bánh mì pate thịt nguội", 20000),
+    ]),
+    ("Tráng miệng", [
+        ("Bánh flan", "Bánh flan caramel", 15000),
+        ("Chè khúc bạch", "Chè khúc bạch hạnh nhân", 30000),
+        ("Kem dừa", "Kem dừa Thái Lan", 35000),
+    ]),
+]
+
+
+def create_sample_catalogue():
+    for category_name, products in SAMPLE_CATALOGUE:
+        category = Category.objects.create(name=category_name)
+        for name, description, price in products:
+            Product.objects.create(name=name, description=description, price=Decimal(price), category=category)
+
+
+def relevant_product_ids(relevant, k):
+    """Tập sản phẩm đúng của một câu hỏi theo luật trong CASES"""
+    products = Product.objects.filter(is_active=True)
+    kind = relevant[0]
+    if kind == "cheapest":
+        return set(products.order_by_effective_price().values_list("id", flat=True)[:k])
+    if kind == "most_expensive":
+        return set(products.order_by_effective_price(descending=True).values_list("id", flat=True)[:k])
+    field = "category__name" if kind == "category" else "name"
+    wanted = normalize_text(relevant[1])
+    return {product_id for product_id, text in products.values_list("id", field) if wanted in normalize_text(text or "")}
+
+
+def evaluate(k=TOP_K, cases=CASES):
+    """
+    Chạy retrieval cho từng câu hỏi, trả về danh sách kết quả (câu hỏi, số sản phẩm đúng, số trúng,
+    recall). Recall = số trúng / min(số sản phẩm đúng, k); câu không cần sản phẩm đạt 1 khi
+    không có sản phẩm nào được chọn.
+    """
+    service = ChatbotService()
+    results = []
+    for message, relevant in cases:
+        retrieved = set(service.select_context_products(message)[:k])
+        if relevant is None:
+            results.append((message, 0, len(retrieved), float(not retrieved)))
+            continue
+        expected = relevant_product_ids(relevant, k)
+        hits = len(retrieved & expected)
+        results.append((message, len(expected), hits, hits / min(len(expected), k) if expected else 1.0))
+    return results
@@ -0,0 +1,145 @@
+import threading
+from collections import deque
+
+from catalogue.cache import get_catalogue_version
+from catalogue.models import Category
+
+GREETING = "greeting"
+GENERAL_QUESTION = "general_question"
+SEARCH = "search"
+RECOMMENDATION = "recommendation"
+FLASH_SALE = "flash_sale"
+PRICE = "price"
+CATEGORY = "category"
+
+# Nhóm từ khóa (khớp chuỗi con trên câu đã chuyển chữ thường)
+KEYWORD_GROUPS = {
+    GREETING: ["xin chào", "chào", "hello", "hi", "hey", "chào bạn", "xin chào bạn"],
+    GENERAL_QUESTION: ["là gì", "gì vậy", "thế nào", "có gì", "bán gì", "có những gì"],
+    SEARCH: ["tìm", "kiếm", "có", "bán", "mua"],
+    RECOMMENDATION: ["đề xuất", "gợi ý", "nên", "phù hợp", "ngon", "tốt", "hay"],
+    FLASH_SALE: ["flash sale", "khuyến mãi", "giảm giá", "sale", "đang khuyến mãi"],
+    PRICE: ["rẻ", "giá thấp", "dưới", "trên", "đắt", "cao cấp"],
+}
+
+# Intent khi nhiều nhóm cùng khớp: nhóm đứng sau thắng. Từ khóa giá chỉ quyết định intent
+# khi không nhóm nào khác khớp.
+INTENT_PRIORITY = [
+    (GREETING, "greeting"),
+    (GENERAL_QUESTION, "general_question"),
+    (SEARCH, "search"),
+    (RECOMMENDATION, "recommendation"),
+    (FLASH_SALE, "flash_sale"),
+    (CATEGORY, "category_search"),
+]
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+class IntentEngine:
+    """
+    Máy Aho–Corasick chứa mọi từ khóa intent và tên các danh mục đang bán: một lần duyệt câu
+    hỏi tìm ra mọi từ khóa xuất hiện (kể cả chồng lên nhau, vd. "chào" trong "xin chào"), sau
+    đó intent được chọn theo INTENT_PRIORITY. Dựng lại khi phiên bản danh mục thay đổi.
+    """
+
+    def __init__(self, version, categories):
+        self.version = version
+        self.goto = [{}]  # Mỗi nút: {ký tự: nút con}
+        self.fail = [0]
+        self.outputs = [[]]  # Nhãn của các mẫu kết thúc tại nút (gồm cả qua liên kết fail)
+        for group, keywords in KEYWORD_GROUPS.items():
+            for keyword in keywords:
+                self._add(keyword, (group, keyword))
+        # Tên danh mục khớp trước theo thứ tự trong DB được ưu tiên
+        for position, (category_id, name) in enumerate(categories):
+            if name:
+                self._add(name.lower(), (CATEGORY, (position, category_id)))
+        self._link()
+
+    @classmethod
+    def load(cls, version):
+        return cls(version, Category.objects.filter(is_active=True).values_list("id", "name"))
+
+    def _add(self, pattern, label):
+        node = 0
+        for char in pattern:
+            child = self.goto[node].get(char)
+            if child is None:
+                child = len(self.goto)
+                self.goto[node][char] = child
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            node = child
+        self.outputs[node].append(label)
+
+    def _link(self):
+        """Tính liên kết fail theo chiều rộng và gộp nhãn của nút fail vào từng nút"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+                queue.append(child)
+
+    def matches(self, text):
+        """{nhóm: tập từ khóa đã khớp} sau một lần duyệt text"""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        found = {}
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for group, value in outputs[node]:
+                found.setdefault(group, set()).add(value)
+        return found
+
+    def analyze(self, message):
+        """Cùng định dạng với ChatbotService.analyze_user_intent"""
+        found = self.matches(message.lower())
+        category = min(found[CATEGORY]) if CATEGORY in found else None
+        prices = found.get(PRICE, ())
+
+        intent = "general_query"
+        for group, name in INTENT_PRIORITY:
+            if group in found:
+                intent = name
+        if prices and intent == "general_query":
+            intent = "price_search"
+
+        return {
+            "intent": intent,
+            "category_filter": category[1] if category else None,
+            "price_range": None,
+            "keywords": [keyword for keyword in KEYWORD_GROUPS[PRICE] if keyword in prices],
+            "is_search": SEARCH in found,
+            "is_recommendation_request": RECOMMENDATION in found,
+            "is_greeting": GREETING in found,
+            "is_general_question": GENERAL_QUESTION in found,
+            "is_flash_sale": FLASH_SALE in found,
+        }
+
+
+def get_intent_engine():
+    """Trả về máy intent hiện tại, dựng lại khi phiên bản danh mục thay đổi"""
+    global _engine
+    version = get_catalogue_version()
+    engine = _engine
+    if engine is None or engine.version != version:
+        with _engine_lock:
+            engine = _engine
+            if engine is None or engine.version != version:
+                engine = _engine = IntentEngine.load(version)
+    return engine
+
+
+def analyze_intent(message):
+    return get_intent_engine().analyze(message)
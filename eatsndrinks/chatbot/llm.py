@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+
+_client = None
+_client_options = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> (options, AsyncOpenAI)
+
+
+def _options():
+    return (
+        settings.OPENAI_API_KEY,
+        settings.OPENAI_BASE_URL,
+        settings.CHATBOT_LLM_TIMEOUT,
+        settings.CHATBOT_LLM_CONNECT_TIMEOUT,
+        settings.CHATBOT_LLM_MAX_CONNECTIONS,
+        settings.CHATBOT_LLM_MAX_RETRIES,
+    )
+
+
+def _client_arguments(options):
+    api_key, base_url, timeout, connect_timeout, max_connections, max_retries = options
+    timeout = httpx.Timeout(timeout, connect=connect_timeout)
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return {"api_key": api_key, "base_url": base_url, "timeout": timeout, "max_retries": max_retries}, limits
+
+
+def get_openai_client():
+    """
+    OpenAI client dùng chung cho cả tiến trình: một connection pool httpx giữ kết nối keep-alive
+    tới API giữa các request, kèm timeout. None nếu chưa cấu hình OPENAI_API_KEY hoặc chưa cài openai.
+    """
+    global _client, _client_options
+    options = _options()
+    if not options[0]:
+        return None
+    if _client is None or _client_options != options:
+        with _client_lock:
+            if _client is None or _client_options != options:
+                try:
+                    from openai import OpenAI
+                except ImportError as e:
+                    print(f"Error initializing OpenAI client: {e}")
+                    return None
+                arguments, limits = _client_arguments(options)
+                _client = OpenAI(**arguments, http_client=httpx.Client(limits=limits, timeout=arguments["timeout"]))
+                _client_options = options
+    return _client
+
+
+def get_async_openai_client():
+    """
+    AsyncOpenAI client dùng chung trong event loop hiện tại (kết nối httpx gắn với loop nên
+    mỗi loop có một client riêng). Chỉ gọi bên trong coroutine.
+    """
+    options = _options()
+    if not options[0]:
+        return None
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None or entry[0] != options:
+        try:
+            from openai import AsyncOpenAI
+        except ImportError as e:
+            print(f"Error initializing OpenAI client: {e}")
+            return None
+        arguments, limits = _client_arguments(options)
+        client = AsyncOpenAI(**arguments, http_client=httpx.AsyncClient(limits=limits, timeout=arguments["timeout"]))
+        entry = _async_clients[loop] = (options, client)
+    return entry[1]
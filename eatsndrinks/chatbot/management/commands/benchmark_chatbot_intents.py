@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.benchmark import median_ms, throwaway_database
+from catalogue.models import Category
+from chatbot.evaluation import CASES
+from chatbot.intents import IntentEngine, analyze_intent, get_intent_engine
+
+
+class Command(BaseCommand):
+    help = 'Measure per-message intent classification time of the compiled intent engine on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20000, help='Classifications per measurement')
+
+    def handle(self, *args, **options):
+        messages = [message for message, _ in CASES]
+        with throwaway_database():
+            Category.objects.bulk_create(
+                Category(name=f'Danh mục {i}') for i in range(options['categories'])
+            )
+            build_ms = median_ms(lambda: IntentEngine.load(0), 5)
+            get_intent_engine()
+
+            rounds = max(1, options['repeat'] // len(messages))
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for message in messages:
+                    analyze_intent(message)
+            per_message_us = (time.perf_counter() - started) / (rounds * len(messages)) * 1e6
+
+        self.stdout.write(f'build ({options["categories"]} categories): {build_ms:.2f} ms')
+        self.stdout.write(f'classify: {per_message_us:.2f} µs per message')
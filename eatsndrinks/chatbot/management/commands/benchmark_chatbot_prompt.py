@@ -0,0 +1,60 @@
+import json
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.benchmark import median_ms, throwaway_database
+from catalogue.models import Category, Product
+from chatbot.context import CatalogueDigest, get_system_prompt
+from chatbot.services import ChatbotService
+
+
+class Command(BaseCommand):
+    help = 'Compare building the chatbot system prompt per message with the cached catalogue digest on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the median is reported')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            categories = Category.objects.bulk_create(
+                Category(name=f'Danh mục {i}', description='Mô tả danh mục') for i in range(20)
+            )
+            Product.objects.bulk_create(
+                Product(
+                    name=f'Sản phẩm {i}',
+                    description='Món ăn được chế biến trong ngày từ nguyên liệu tươi. ' * 4,
+                    price=Decimal(10000 + i),
+                    effective_price=Decimal(10000 + i),
+                    category=categories[i % len(categories)],
+                )
+                for i in range(options['products'])
+            )
+            service = ChatbotService()
+
+            def per_message_prompt():
+                # Cách cũ: đọc toàn bộ danh mục và json.dumps(indent=2) cho mỗi tin nhắn
+                return json.dumps(service.get_categories_data(), ensure_ascii=False, indent=2) + json.dumps(
+                    service.get_products_data(), ensure_ascii=False, indent=2
+                )
+
+            digest = CatalogueDigest().refreshed(1, timezone.now())
+            product = Product.objects.order_by('id').first()
+
+            def incremental_refresh():
+                product.save()  # Đổi updated_at của một sản phẩm
+                digest.refreshed(object(), timezone.now())
+
+            get_system_prompt()
+            rows = [
+                ('per message', median_ms(per_message_prompt, options['repeat']), len(per_message_prompt())),
+                ('full build', median_ms(lambda: CatalogueDigest().refreshed(1, timezone.now()), options['repeat']), None),
+                ('1 changed', median_ms(incremental_refresh, options['repeat']), None),
+                ('cached', median_ms(get_system_prompt, options['repeat'] * 100), len(get_system_prompt())),
+            ]
+
+            self.stdout.write(f'{"prompt":>12} {"median ms":>12} {"chars":>10}')
+            for name, ms, chars in rows:
+                self.stdout.write(f'{name:>12} {ms:>12.4f} {chars or "":>10}')
@@ -0,0 +1,86 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from api.benchmark import throwaway_database
+from chatbot.evaluation import create_sample_catalogue
+from chatbot.services import ChatbotService
+from chatbot.streaming import stream_chat
+from chatbot.testing import FakeLLMServer
+
+REPLY = ' '.join(['Bạn có thể thử Coca Cola hoặc trà đào mát lạnh cho ngày nóng nhé.'] * 3)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare time to first byte and worker occupancy of /chatbot/chat/ and the streaming '
+        '/chatbot/chat/stream/ against a local fake LLM server on a throwaway database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help='Simultaneous chat requests')
+        parser.add_argument('--workers', type=int, default=4, help='Sync worker threads (like gunicorn --threads)')
+        parser.add_argument('--first-token-ms', type=float, default=300)
+        parser.add_argument('--token-ms', type=float, default=10)
+
+    def handle(self, *args, **options):
+        concurrency, workers = options['concurrency'], options['workers']
+        with throwaway_database():
+            create_sample_catalogue()
+            with FakeLLMServer(
+                reply=REPLY,
+                first_token_delay=options['first_token_ms'] / 1000,
+                token_delay=options['token_ms'] / 1000,
+            ) as server:
+                with override_settings(OPENAI_API_KEY='benchmark', OPENAI_BASE_URL=server.base_url):
+                    sync_ttfb, sync_busy, sync_wall = self.run_sync(concurrency, workers)
+                    async_ttfb, async_wall = asyncio.run(self.run_async(concurrency))
+
+        self.stdout.write(f'{concurrency} concurrent chats, LLM first token {options["first_token_ms"]:.0f} ms')
+        self.stdout.write(
+            f'sync  ({workers} workers): TTFB median {statistics.median(sync_ttfb):.0f} ms, '
+            f'max {max(sync_ttfb):.0f} ms, wall {sync_wall:.0f} ms, '
+            f'each request holds a worker {statistics.mean(sync_busy):.0f} ms'
+        )
+        self.stdout.write(
+            f'async (1 event loop): TTFB median {statistics.median(async_ttfb):.0f} ms, '
+            f'max {max(async_ttfb):.0f} ms, wall {async_wall:.0f} ms'
+        )
+        self.stdout.write(self.style.SUCCESS('✅ Done'))
+
+    def run_sync(self, concurrency, workers):
+        """process_chat trên một pool thread như worker WSGI; byte đầu tiên chỉ có khi trả lời xong"""
+        started = time.perf_counter()
+
+        def chat(position):
+            queued = time.perf_counter()
+            try:
+                ChatbotService().process_chat(f'Tôi muốn tìm đồ uống {position}')
+            finally:
+                connection.close()
+            done = time.perf_counter()
+            return (done - started) * 1000, (done - queued) * 1000
+
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(chat, range(concurrency)))
+        wall = (time.perf_counter() - started) * 1000
+        return [ttfb for ttfb, _ in results], [busy for _, busy in results], wall
+
+    async def run_async(self, concurrency):
+        """Các stream chạy đồng thời trong một event loop; TTFB là lúc nhận sự kiện "token" đầu tiên"""
+        started = time.perf_counter()
+
+        async def chat(position):
+            first = None
+            async for event in stream_chat(f'Tôi muốn tìm đồ uống {position}'):
+                if first is None and event.startswith('event: token'):
+                    first = (time.perf_counter() - started) * 1000
+            return first
+
+        ttfb = await asyncio.gather(*(chat(position) for position in range(concurrency)))
+        return ttfb, (time.perf_counter() - started) * 1000
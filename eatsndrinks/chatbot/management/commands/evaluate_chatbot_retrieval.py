@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmark import throwaway_database
+from chatbot.evaluation import create_sample_catalogue, evaluate
+from chatbot.retrieval import TOP_K
+
+
+class Command(BaseCommand):
+    help = 'Measure recall@k of the chatbot product retrieval on the recommendation and intent test cases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=TOP_K)
+        parser.add_argument(
+            '--sample', action='store_true',
+            help='Evaluate on a labelled sample catalogue in a throwaway database instead of the configured one',
+        )
+
+    def handle(self, *args, **options):
+        if options['sample']:
+            with throwaway_database():
+                create_sample_catalogue()
+                results = evaluate(options['k'])
+        else:
+            results = evaluate(options['k'])
+
+        self.stdout.write(f'{"message":<36} {"relevant":>9} {"hits":>5} {"recall":>7}')
+        for message, relevant, hits, recall in results:
+            self.stdout.write(f'{message:<36} {relevant:>9} {hits:>5} {recall:>7.2f}')
+        mean = sum(recall for *_, recall in results) / len(results)
+        self.stdout.write(self.style.SUCCESS(f'✅ Mean recall@{options["k"]}: {mean:.2f}'))
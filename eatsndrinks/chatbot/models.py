@@ -27,6 +27,9 @@ class ChatMessage(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['session', 'timestamp'], name='chatmessage_session_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.message_type}: {self.content[:50]}..."
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+
+from catalogue.cache import get_catalogue_version
+
+HIT, MISS, BYPASS = "hit", "miss", "bypass"
+
+_WORD_RE = re.compile(r"\w+")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_message(message):
+    """
+    Chữ thường, bỏ dấu câu và khoảng trắng thừa nhưng giữ dấu tiếng Việt
+    ("Đồ uống  rẻ?" -> "đồ uống rẻ"; "bò" và "bơ" vẫn là hai câu khác nhau)
+    """
+    return " ".join(_WORD_RE.findall(unicodedata.normalize("NFC", message.lower())))
+
+
+def response_key(message, intent_analysis):
+    """Khóa cache: câu hỏi đã chuẩn hóa, kết quả phân tích intent và phiên bản danh mục"""
+    intent = json.dumps(intent_analysis, sort_keys=True, default=str)
+    digest = hashlib.md5(f"{normalize_message(message)}\n{intent}".encode()).hexdigest()
+    return f"{get_catalogue_version()}:{digest}"
+
+
+class ResponseCache:
+    """
+    Cache LRU trong bộ nhớ tiến trình cho câu trả lời của model: key -> (câu trả lời gốc,
+    [product_id đề xuất]). Mục quá ttl giây bị coi như không có; khi đầy thì bỏ mục ít dùng nhất.
+    Chỉ lưu id sản phẩm, giá và flash sale được đọc lại từ DB mỗi lần dùng (xem
+    ChatbotService.cached_response).
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (hết hạn lúc, câu trả lời, product_ids)
+        self._lock = threading.Lock()
+
+    def get(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key, response, product_ids, now=None):
+        if self.max_entries <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[key] = (now + self.ttl, response, list(product_ids))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_response_cache():
+    """Cache câu trả lời dùng chung cho cả tiến trình, tạo lại khi cấu hình thay đổi"""
+    global _cache
+    size, ttl = settings.CHATBOT_RESPONSE_CACHE_SIZE, settings.CHATBOT_RESPONSE_CACHE_TTL
+    cache = _cache
+    if cache is None or (cache.max_entries, cache.ttl) != (size, ttl):
+        with _cache_lock:
+            cache = _cache
+            if cache is None or (cache.max_entries, cache.ttl) != (size, ttl):
+                cache = _cache = ResponseCache(size, ttl)
+    return cache
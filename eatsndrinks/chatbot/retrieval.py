@@ -0,0 +1,145 @@
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from catalogue.cache import get_catalogue_version
+from catalogue.models import Product
+from search.services import FIELD_WEIGHTS, tokenize
+
+TOP_K = 8  # Số sản phẩm tối đa đưa vào prompt
+K1 = 1.2
+B = 0.75
+HISTORY_WEIGHT = 0.5  # Từ trong các tin nhắn trước của user được tính nửa trọng số
+HISTORY_MESSAGES = 3
+
+# Từ hay gặp trong câu hỏi nhưng không nói gì về sản phẩm (đã bỏ dấu)
+STOP_WORDS = frozenset(
+    "toi minh ban muon tim mua cho co khong gi nao de xuat la va cua nhe a oi nhi the thi voi mot cac "
+    "nhung hay duoc can xem goi y dang nay".split()
+)
+
+CHEAP, EXPENSIVE = "cheap", "expensive"
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def terms(text):
+    """Từ đơn và cặp từ liền nhau ("do uong" -> do, uong, do_uong) của văn bản đã bỏ dấu"""
+    tokens = tokenize(text)
+    return tokens + [f"{first}_{second}" for first, second in zip(tokens, tokens[1:])]
+
+
+def query_terms(message, history=()):
+    """Trọng số từng từ của câu hỏi hiện tại và vài tin nhắn trước của user"""
+    weights = Counter()
+    for text, weight in [(message, 1.0), *((text, HISTORY_WEIGHT) for text in history)]:
+        for term in terms(text):
+            if term not in STOP_WORDS:
+                weights[term] = max(weights[term], weight)
+    return weights
+
+
+class RetrievalIndex:
+    """
+    Chỉ mục BM25 trên tên, danh mục và mô tả của sản phẩm đang bán, lưu dạng postings nén
+    bằng mảng NumPy: postings của từ t là docs[start:end] với trọng số BM25 đã tính sẵn trong
+    weights[start:end] (phần chuẩn hóa độ dài không phụ thuộc câu hỏi). Tần suất của từ được
+    nhân theo FIELD_WEIGHTS của tìm kiếm sản phẩm. Thứ tự tài liệu là thứ tự đề xuất mặc định.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        product_ids, prices, lengths = [], [], []
+        postings = defaultdict(list)
+        for doc, (product_id, name, description, category, price) in enumerate(rows):
+            frequencies = Counter()
+            for field, text in (("name", name), ("category", category), ("description", description)):
+                for term in terms(text or ""):
+                    frequencies[term] += FIELD_WEIGHTS[field]
+            for term, frequency in frequencies.items():
+                postings[term].append((doc, frequency))
+            product_ids.append(product_id)
+            prices.append(float(price or 0))
+            lengths.append(sum(frequencies.values()))
+
+        self.product_ids = np.array(product_ids, dtype=np.int64)
+        self.prices = np.array(prices, dtype=np.float64)
+        self.spans = {}
+        counts = np.fromiter((len(entries) for entries in postings.values()), dtype=np.int64, count=len(postings))
+        ends = np.cumsum(counts)
+        for (term, _), start, end in zip(postings.items(), ends - counts, ends):
+            self.spans[term] = (int(start), int(end))
+        flat = [entry for entries in postings.values() for entry in entries]
+        self.docs = np.array([doc for doc, _ in flat], dtype=np.int32)
+        frequencies = np.array([frequency for _, frequency in flat], dtype=np.float32)
+
+        count = len(product_ids)
+        lengths = np.array(lengths, dtype=np.float32)
+        average = float(lengths.mean()) if count else 1.0
+        idf = np.log1p((count - counts + 0.5) / (counts + 0.5)).astype(np.float32)
+        norm = K1 * (1 - B + B * lengths[self.docs] / (average or 1.0))
+        self.weights = np.repeat(idf, counts) * frequencies * (K1 + 1) / (frequencies + norm)
+
+    @classmethod
+    def load(cls, version):
+        # Cùng thứ tự mặc định với ChatbotService.get_recommendations: flash sale trước, mới nhất trước
+        rows = (
+            Product.objects.filter(is_active=True)
+            .order_by("-flash_sale_price", "-created_at", "id")
+            .values_list("id", "name", "description", "category__name", "effective_price")
+        )
+        return cls(version, rows)
+
+    def scores(self, weights):
+        scores = np.zeros(len(self.product_ids), dtype=np.float32)
+        for term, weight in weights.items():
+            span = self.spans.get(term)
+            if span:
+                start, end = span
+                # Mỗi tài liệu xuất hiện tối đa một lần trong postings của một từ nên cộng trực tiếp được
+                scores[self.docs[start:end]] += weight * self.weights[start:end]
+        return scores
+
+    def top_k(self, weights, k=TOP_K, order=None):
+        """
+        product_id của k sản phẩm có điểm BM25 cao nhất. Không sản phẩm nào khớp thì lấy theo thứ tự
+        mặc định. order=CHEAP/EXPENSIVE xếp các sản phẩm khớp (hoặc mọi sản phẩm) theo giá.
+        """
+        if k <= 0 or not len(self.product_ids):
+            return []
+        scores = self.scores(weights)
+        candidates = np.flatnonzero(scores > 0)
+        if order is not None:
+            if not len(candidates):
+                candidates = np.arange(len(self.product_ids))
+            prices = self.prices[candidates]
+            # Cùng thứ tự với order_by_effective_price: giá rồi tới id
+            ranked = candidates[np.lexsort((self.product_ids[candidates], -prices if order == EXPENSIVE else prices))]
+        elif len(candidates):
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            # Điểm bằng nhau thì giữ thứ tự mặc định
+            ranked = candidates[np.lexsort((candidates, -scores[candidates]))]
+        else:
+            ranked = np.arange(min(k, len(self.product_ids)))
+        return self.product_ids[ranked[:k]].tolist()
+
+
+def get_retrieval_index():
+    """Trả về chỉ mục hiện tại, nạp lại khi phiên bản danh mục thay đổi"""
+    global _index
+    version = get_catalogue_version()
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != version:
+                index = _index = RetrievalIndex.load(version)
+    return index
+
+
+def retrieve_product_ids(message, history=(), k=TOP_K, order=None):
+    """Các sản phẩm liên quan nhất tới câu hỏi và lịch sử gần đây của user"""
+    return get_retrieval_index().top_k(query_terms(message, history[-HISTORY_MESSAGES:]), k, order)
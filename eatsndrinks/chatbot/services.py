@@ -6,19 +6,16 @@ from django.conf import settings
 from catalogue.models import Product, Category
 from users.models import User
 from .models import ChatSession, ChatMessage, ProductRecommendation, ChatbotConfig
-from decouple import config
+from .context import get_system_prompt
+from .intents import analyze_intent
+from .llm import get_openai_client
+from .response_cache import BYPASS, HIT, MISS, get_response_cache, response_key
+from .retrieval import CHEAP, EXPENSIVE, retrieve_product_ids
 
 class ChatbotService:
     def __init__(self):
-        self.openai_api_key = config('OPENAI_API_KEY', default='')
-        self.client = None
-        if self.openai_api_key:
-            try:
-                from openai import OpenAI
-                self.client = OpenAI(api_key=self.openai_api_key)
-            except Exception as e:
-                print(f"Error initializing OpenAI client: {e}")
-                self.client = None
+        self.openai_api_key = settings.OPENAI_API_KEY
+        self.client = get_openai_client()  # Dùng chung cho cả tiến trình, xem llm.py
     
     def get_or_create_session(self, session_id: str = None, user_id: int = None) -> ChatSession:
         """Get existing session or create new one"""
@@ -59,47 +56,31 @@ class ChatbotService:
         categories = Category.objects.filter(is_active=True)
         return [{'id': cat.id, 'name': cat.name, 'description': cat.description} for cat in categories]
     
-    def create_system_prompt(self) -> str:
-        """Create system prompt with product information"""
-        products_data = self.get_products_data()
-        categories_data = self.get_categories_data()
-        
-        system_prompt = f"""
-Bạn là một chatbot thông minh cho trang web EatsNDrinks - một trang web bán đồ ăn và thức uống. Nhiệm vụ của bạn là:
-
-1. Trả lời các câu hỏi về sản phẩm
-2. Đề xuất sản phẩm phù hợp dựa trên yêu cầu của khách hàng
-3. Cung cấp thông tin về giá cả, khuyến mãi
-4. Hỗ trợ tìm kiếm sản phẩm theo danh mục
-
-Dữ liệu sản phẩm hiện có:
-- Tổng cộng {len(products_data)} sản phẩm
-- {len(categories_data)} danh mục
-
-Danh mục sản phẩm:
-{json.dumps(categories_data, ensure_ascii=False, indent=2)}
-
-Sản phẩm:
-{json.dumps(products_data, ensure_ascii=False, indent=2)}
-
-Hướng dẫn trả lời:
-- Khi khách hàng chào hỏi (xin chào, hello, hi): Chỉ chào lại và giới thiệu về khả năng của bạn, KHÔNG đề xuất sản phẩm
-- Khi khách hàng hỏi chung chung: Giới thiệu về trang web và hỏi họ muốn tìm gì
-- Khi khách hàng hỏi về sản phẩm cụ thể: Cung cấp thông tin chi tiết
-- Khi khách hàng muốn tìm sản phẩm theo danh mục: Đề xuất các sản phẩm phù hợp
-- Khi có khuyến mãi (flash_sale): Nhấn mạnh thông tin này
-- Trả lời bằng tiếng Việt, thân thiện và hữu ích
+    def price_order(self, intent_analysis: Dict[str, Any]):
+        """Thứ tự giá khách hàng yêu cầu (rẻ/cao cấp), hoặc None"""
+        keywords = intent_analysis['keywords']
+        if 'rẻ' in keywords or 'giá thấp' in keywords:
+            return CHEAP
+        if 'đắt' in keywords or 'cao cấp' in keywords:
+            return EXPENSIVE
+        return None
 
-QUAN TRỌNG - Đề xuất sản phẩm:
-- CHỈ đề xuất sản phẩm khi khách hàng yêu cầu tìm kiếm, đề xuất, hoặc hỏi về sản phẩm cụ thể
-- KHÔNG đề xuất sản phẩm khi khách hàng chỉ chào hỏi
-- Khi đề xuất, hãy đề xuất 3-5 sản phẩm phù hợp từ danh sách trên
-- Nếu được yêu cầu đề xuất sản phẩm, hãy trả về danh sách ID sản phẩm được đề xuất trong format JSON: {{"recommendations": [id1, id2, id3]}}
-- Nếu không có format JSON, hãy đề xuất sản phẩm bằng cách nhắc tên sản phẩm trong câu trả lời
+    def select_context_products(self, message: str, history: List[Dict[str, str]] = (), intent_analysis: Dict[str, Any] = None) -> List[int]:
+        """Top-k product ids relevant to the message and recent user messages (BM25, see retrieval.py)"""
+        intent_analysis = intent_analysis or self.analyze_user_intent(message)
+        if intent_analysis['is_greeting']:
+            return []  # Chỉ chào hỏi thì không cần thông tin sản phẩm
+        previous = [item['content'] for item in history if item['role'] == 'user']
+        return retrieve_product_ids(message, previous, order=self.price_order(intent_analysis))
 
-Hãy trả lời ngắn gọn, thân thiện và hữu ích!
-"""
-        return system_prompt
+    def create_system_prompt(self, message: str = None, history: List[Dict[str, str]] = (), intent_analysis: Dict[str, Any] = None) -> str:
+        """
+        Create system prompt with product information (cached catalogue digest, see context.py).
+        With a message, only the products retrieved for it are included instead of the whole catalogue.
+        """
+        if message is None:
+            return get_system_prompt()
+        return get_system_prompt(self.select_context_products(message, history, intent_analysis))
     
     def get_chat_history(self, session: ChatSession, limit: int = 10) -> List[Dict[str, str]]:
         """Get recent chat history for context"""
@@ -111,69 +92,8 @@ Hãy trả lời ngắn gọn, thân thiện và hữu ích!
         return history
     
     def analyze_user_intent(self, message: str) -> Dict[str, Any]:
-        """Analyze user intent and extract relevant information"""
-        intent_analysis = {
-            'intent': 'general_query',
-            'category_filter': None,
-            'price_range': None,
-            'keywords': [],
-            'is_search': False,
-            'is_recommendation_request': False,
-            'is_greeting': False,
-            'is_general_question': False,
-            'is_flash_sale': False
-        }
-        
-        message_lower = message.lower()
-        
-        # Check for greeting intent
-        greeting_keywords = ['xin chào', 'chào', 'hello', 'hi', 'hey', 'chào bạn', 'xin chào bạn']
-        if any(keyword in message_lower for keyword in greeting_keywords):
-            intent_analysis['is_greeting'] = True
-            intent_analysis['intent'] = 'greeting'
-        
-        # Check for general questions
-        question_keywords = ['là gì', 'gì vậy', 'thế nào', 'có gì', 'bán gì', 'có những gì']
-        if any(keyword in message_lower for keyword in question_keywords):
-            intent_analysis['is_general_question'] = True
-            intent_analysis['intent'] = 'general_question'
-        
-        # Check for search intent
-        search_keywords = ['tìm', 'kiếm', 'có', 'bán', 'mua']
-        if any(keyword in message_lower for keyword in search_keywords):
-            intent_analysis['is_search'] = True
-            intent_analysis['intent'] = 'search'
-        
-        # Check for recommendation intent
-        rec_keywords = ['đề xuất', 'gợi ý', 'nên', 'phù hợp', 'ngon', 'tốt', 'hay']
-        if any(keyword in message_lower for keyword in rec_keywords):
-            intent_analysis['is_recommendation_request'] = True
-            intent_analysis['intent'] = 'recommendation'
-        
-        # Check for flash sale intent
-        flash_sale_keywords = ['flash sale', 'khuyến mãi', 'giảm giá', 'sale', 'đang khuyến mãi']
-        if any(keyword in message_lower for keyword in flash_sale_keywords):
-            intent_analysis['intent'] = 'flash_sale'
-            intent_analysis['is_flash_sale'] = True
-        
-        # Extract category keywords
-        categories = Category.objects.filter(is_active=True)
-        for category in categories:
-            if category.name.lower() in message_lower:
-                intent_analysis['category_filter'] = category.id
-                intent_analysis['intent'] = 'category_search'
-                break
-        
-        # Extract price keywords
-        price_keywords = ['rẻ', 'giá thấp', 'dưới', 'trên', 'đắt', 'cao cấp']
-        for keyword in price_keywords:
-            if keyword in message_lower:
-                intent_analysis['keywords'].append(keyword)
-                if intent_analysis['intent'] == 'general_query':
-                    intent_analysis['intent'] = 'price_search'
-        
-        print('[DEBUG] intent_analysis:', intent_analysis)
-        return intent_analysis
+        """Analyze user intent and extract relevant information (single pass, see intents.py)"""
+        return analyze_intent(message)
     
     def get_recommendations(self, intent_analysis: Dict[str, Any], limit: int = 5) -> List[Product]:
         """Get product recommendations based on intent analysis"""
@@ -181,9 +101,7 @@ Hãy trả lời ngắn gọn, thân thiện và hữu ích!
         
         # Nếu intent là flash_sale thì chỉ lấy sản phẩm đang flash sale
         if intent_analysis.get('is_flash_sale'):
-            products = [p for p in products if p.is_flash_sale_active()]
-            products = sorted(products, key=lambda p: p.flash_sale_price or p.price)[:limit]
-            return products
+            return list(products.flash_sale_active().order_by_effective_price()[:limit])
         
         # Apply category filter
         if intent_analysis['category_filter']:
@@ -191,9 +109,9 @@ Hãy trả lời ngắn gọn, thân thiện và hữu ích!
         
         # Apply price filters
         if 'rẻ' in intent_analysis['keywords'] or 'giá thấp' in intent_analysis['keywords']:
-            products = products.order_by('price')[:limit]
+            products = products.order_by_effective_price()[:limit]
         elif 'đắt' in intent_analysis['keywords'] or 'cao cấp' in intent_analysis['keywords']:
-            products = products.order_by('-price')[:limit]
+            products = products.order_by_effective_price(descending=True)[:limit]
         else:
             # Default: recommend products with flash sale first, then by popularity
             products = products.order_by('-flash_sale_price', '-created_at')[:limit]
@@ -214,100 +132,154 @@ Hãy trả lời ngắn gọn, thân thiện và hữu ích!
             'mainimage': product.mainimage.url if product.mainimage else None,
         }
     
-    def generate_response(self, message: str, session: ChatSession) -> Dict[str, Any]:
+    def build_messages(self, message: str, session: ChatSession, intent_analysis: Dict[str, Any], chat_history: List[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        """Messages for the chat completion: system prompt, recent history and the new message"""
+        if chat_history is None:
+            chat_history = self.get_chat_history(session)
+        system_prompt = self.create_system_prompt(message, chat_history, intent_analysis)
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(chat_history)
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def generate_response(self, message: str, session: ChatSession, intent_analysis: Dict[str, Any] = None) -> Dict[str, Any]:
         """Generate chatbot response using OpenAI"""
+        intent_analysis = intent_analysis or self.analyze_user_intent(message)
         if not self.openai_api_key or not self.client:
-            return self.generate_fallback_response(message, session)
+            return self.generate_fallback_response(message, session, intent_analysis)
+        chat_history = self.get_chat_history(session)
+        cache_key = self.response_cache_key(message, chat_history, intent_analysis)
+        cached = self.cached_response(cache_key, intent_analysis)
+        if cached:
+            return cached
         try:
-            system_prompt = self.create_system_prompt()
-            chat_history = self.get_chat_history(session)
-            messages = [{"role": "system", "content": system_prompt}]
-            messages.extend(chat_history)
-            messages.append({"role": "user", "content": message})
             response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
+                model=settings.CHATBOT_MODEL,
+                messages=self.build_messages(message, session, intent_analysis, chat_history),
                 max_tokens=500,
                 temperature=0.7
             )
             bot_response = response.choices[0].message.content
-            # Try to extract recommendations from response
-            recommendations = []
-            intent_analysis = self.analyze_user_intent(message)
-            try:
-                # Method 1: Look for JSON format
-                if '{"recommendations":' in bot_response:
-                    import re
-                    json_match = re.search(r'\{.*\}', bot_response)
-                    if json_match:
-                        rec_data = json.loads(json_match.group())
-                        if 'recommendations' in rec_data:
-                            product_ids = rec_data['recommendations']
-                            recommended_products = Product.objects.filter(
-                                id__in=product_ids, is_active=True
-                            )
-                            recommendations = [self.convert_product_to_dict(p) for p in recommended_products]
-                # Method 2: Extract product names from text and find matching products
-                if not recommendations:
-                    # Get all product names for matching
-                    all_products = Product.objects.filter(is_active=True)
-                    # Nếu intent là flash sale, chỉ lấy sản phẩm đang flash sale
-                    if intent_analysis.get('is_flash_sale'):
-                        all_products = [p for p in all_products if p.is_flash_sale_active()]
-                    product_names = {p.name.lower(): p for p in all_products}
-                    response_lower = bot_response.lower()
-                    found_products = []
-                    for product_name, product in product_names.items():
-                        if product_name in response_lower:
-                            found_products.append(product)
-                    # Take first 5 products found
-                    recommendations = [self.convert_product_to_dict(p) for p in found_products[:5]]
-                # Method 3: Only use intent analysis if it's NOT a greeting
-                if not recommendations:
-                    # Only recommend if it's not a greeting
-                    if not intent_analysis['is_greeting']:
-                        recommended_products = self.get_recommendations(intent_analysis, 5)
+            tokens_used = response.usage.total_tokens if getattr(response, 'usage', None) else 0
+            return self.complete_response(bot_response, intent_analysis, tokens_used, cache_key)
+        except Exception as e:
+            return self.error_response(message, session, intent_analysis, e)
+
+    def response_cache_key(self, message: str, chat_history: List[Dict[str, str]], intent_analysis: Dict[str, Any]):
+        """
+        Key of the shared answer cache (see response_cache.py), or None for personalized questions:
+        once the session has earlier messages the answer depends on the conversation.
+        """
+        if len(chat_history) > 1:  # Lịch sử đã gồm tin nhắn hiện tại của user
+            return None
+        return response_key(message, intent_analysis)
+
+    def cached_response(self, cache_key, intent_analysis: Dict[str, Any]):
+        """
+        Response data from a cached answer, or None. Recommended products are loaded again so
+        prices and flash sale state are always current.
+        """
+        cached = get_response_cache().get(cache_key) if cache_key else None
+        if cached is None:
+            return None
+        bot_response, product_ids = cached
+        products = Product.objects.filter(id__in=product_ids, is_active=True).select_related('category')
+        if intent_analysis.get('is_flash_sale'):
+            products = products.flash_sale_active()
+        products = {p.id: p for p in products}
+        recommendations = [self.convert_product_to_dict(products[i]) for i in product_ids if i in products]
+        # Các sản phẩm đã cache không còn phù hợp (hết flash sale, ngừng bán) thì đề xuất lại như Method 3
+        if not recommendations and not intent_analysis['is_greeting']:
+            recommendations = [self.convert_product_to_dict(p) for p in self.get_recommendations(intent_analysis, 5)]
+        return self.format_response(bot_response, recommendations, intent_analysis, 0, HIT)
+
+    def complete_response(self, bot_response: str, intent_analysis: Dict[str, Any], tokens_used: int = 0, cache_key=None) -> Dict[str, Any]:
+        """Extract recommendations from the model's answer, build the response data and cache the answer"""
+        # Try to extract recommendations from response
+        recommendations = []
+        try:
+            # Method 1: Look for JSON format
+            if '{"recommendations":' in bot_response:
+                import re
+                json_match = re.search(r'\{.*\}', bot_response)
+                if json_match:
+                    rec_data = json.loads(json_match.group())
+                    if 'recommendations' in rec_data:
+                        product_ids = rec_data['recommendations']
+                        recommended_products = Product.objects.filter(
+                            id__in=product_ids, is_active=True
+                        )
                         recommendations = [self.convert_product_to_dict(p) for p in recommended_products]
-            except Exception as e:
-                print(f"Error extracting recommendations: {e}")
-                # Fallback to intent analysis only if not greeting
+            # Method 2: Extract product names from text and find matching products
+            if not recommendations:
+                # Get all product names for matching
+                all_products = Product.objects.filter(is_active=True)
+                # Nếu intent là flash sale, chỉ lấy sản phẩm đang flash sale
+                if intent_analysis.get('is_flash_sale'):
+                    all_products = all_products.flash_sale_active()
+                product_names = {p.name.lower(): p for p in all_products}
+                response_lower = bot_response.lower()
+                found_products = []
+                for product_name, product in product_names.items():
+                    if product_name in response_lower:
+                        found_products.append(product)
+                # Take first 5 products found
+                recommendations = [self.convert_product_to_dict(p) for p in found_products[:5]]
+            # Method 3: Only use intent analysis if it's NOT a greeting
+            if not recommendations:
+                # Only recommend if it's not a greeting
                 if not intent_analysis['is_greeting']:
                     recommended_products = self.get_recommendations(intent_analysis, 5)
                     recommendations = [self.convert_product_to_dict(p) for p in recommended_products]
+        except Exception as e:
+            print(f"Error extracting recommendations: {e}")
+            # Fallback to intent analysis only if not greeting
+            if not intent_analysis['is_greeting']:
+                recommended_products = self.get_recommendations(intent_analysis, 5)
+                recommendations = [self.convert_product_to_dict(p) for p in recommended_products]
 
-            # --- CUSTOM FLASH SALE MESSAGE ---
-            if intent_analysis.get('is_flash_sale'):
-                if recommendations:
-                    msg = "Hiện tại, có một số sản phẩm đang được giảm giá flash sale, bao gồm:\n\n"
-                    for idx, p in enumerate(recommendations, 1):
-                        msg += f"{idx}. {p['name']} - Giá flash sale: {int(p['flash_sale_price']):,} VND\n"
-                    msg += "\nNếu bạn quan tâm đến bất kỳ sản phẩm nào, hãy cho mình biết để được hỗ trợ thêm nhé!"
-                else:
-                    msg = "Hiện tại không có sản phẩm nào đang flash sale."
+        if cache_key:
+            get_response_cache().set(cache_key, bot_response, [p['id'] for p in recommendations])
+        return self.format_response(bot_response, recommendations, intent_analysis, tokens_used, MISS if cache_key else BYPASS)
+
+    def format_response(self, bot_response: str, recommendations: List[Dict[str, Any]], intent_analysis: Dict[str, Any], tokens_used: int, cache: str) -> Dict[str, Any]:
+        """Response data for the model's answer and the recommended products"""
+        # --- CUSTOM FLASH SALE MESSAGE ---
+        if intent_analysis.get('is_flash_sale'):
+            if recommendations:
+                msg = "Hiện tại, có một số sản phẩm đang được giảm giá flash sale, bao gồm:\n\n"
+                for idx, p in enumerate(recommendations, 1):
+                    msg += f"{idx}. {p['name']} - Giá flash sale: {int(p['flash_sale_price']):,} VND\n"
+                msg += "\nNếu bạn quan tâm đến bất kỳ sản phẩm nào, hãy cho mình biết để được hỗ trợ thêm nhé!"
             else:
-                msg = bot_response
-            print('[DEBUG] Số sản phẩm flash sale recommendations:', len(recommendations), [p['id'] for p in recommendations])
-            return {
-                'response': msg,
-                'recommendations': recommendations,
-                'metadata': {
-                    'model_used': 'gpt-3.5-turbo',
-                    'tokens_used': response.usage.total_tokens if hasattr(response, 'usage') else 0
-                }
+                msg = "Hiện tại không có sản phẩm nào đang flash sale."
+        else:
+            msg = bot_response
+        print('[DEBUG] Số sản phẩm flash sale recommendations:', len(recommendations), [p['id'] for p in recommendations])
+        return {
+            'response': msg,
+            'recommendations': recommendations,
+            'metadata': {
+                'model_used': settings.CHATBOT_MODEL,
+                'tokens_used': tokens_used,
+                'cache': cache
             }
-        except Exception as e:
-            # Log the error for debugging
-            print(f"OpenAI API Error: {str(e)}")
-            print(f"Error type: {type(e).__name__}")
-            # Return fallback with error info
-            fallback_result = self.generate_fallback_response(message, session)
-            fallback_result['metadata']['error'] = str(e)
-            fallback_result['metadata']['error_type'] = type(e).__name__
-            return fallback_result
+        }
+
+    def error_response(self, message: str, session: ChatSession, intent_analysis: Dict[str, Any], e: Exception) -> Dict[str, Any]:
+        """Fallback response after an OpenAI API error"""
+        # Log the error for debugging
+        print(f"OpenAI API Error: {str(e)}")
+        print(f"Error type: {type(e).__name__}")
+        # Return fallback with error info
+        fallback_result = self.generate_fallback_response(message, session, intent_analysis)
+        fallback_result['metadata']['error'] = str(e)
+        fallback_result['metadata']['error_type'] = type(e).__name__
+        return fallback_result
     
-    def generate_fallback_response(self, message: str, session: ChatSession) -> Dict[str, Any]:
+    def generate_fallback_response(self, message: str, session: ChatSession, intent_analysis: Dict[str, Any] = None) -> Dict[str, Any]:
         """Generate fallback response when OpenAI is not available"""
-        intent_analysis = self.analyze_user_intent(message)
+        intent_analysis = intent_analysis or self.analyze_user_intent(message)
         recommendations = []
         
         # Xử lý các intent khác nhau
@@ -357,22 +329,18 @@ Hãy trả lời ngắn gọn, thân thiện và hữu ích!
             }
         }
     
-    def process_chat(self, message: str, session_id: str = None, user_id: int = None) -> Dict[str, Any]:
-        """Main method to process chat message"""
-        # Get or create session
+    def start_chat(self, message: str, session_id: str = None, user_id: int = None) -> ChatSession:
+        """Get or create the session and save the user's message"""
         session = self.get_or_create_session(session_id, user_id)
-        
-        # Save user message
-        user_message = ChatMessage.objects.create(
+        ChatMessage.objects.create(
             session=session,
             message_type='user',
             content=message
         )
-        
-        # Generate response
-        response_data = self.generate_response(message, session)
-        
-        # Save bot response
+        return session
+
+    def save_response(self, session: ChatSession, response_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Save the bot's message with its recommendations and return the chat result"""
         bot_message = ChatMessage.objects.create(
             session=session,
             message_type='bot',
@@ -398,4 +366,10 @@ Hãy trả lời ngắn gọn, thân thiện và hữu ích!
             'session_id': session.session_id,
             'recommendations': response_data['recommendations'],
             'metadata': response_data['metadata']
-        } 
\ No newline at end of file
+        }
+
+    def process_chat(self, message: str, session_id: str = None, user_id: int = None) -> Dict[str, Any]:
+        """Main method to process chat message"""
+        session = self.start_chat(message, session_id, user_id)
+        response_data = self.generate_response(message, session)
+        return self.save_response(session, response_data)
@@ -0,0 +1,68 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .llm import get_async_openai_client
+from .services import ChatbotService
+
+
+def sse(event, data):
+    """Một server-sent event với dữ liệu JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _prepare(service, message, session_id, user_id, with_messages):
+    session = service.start_chat(message, session_id, user_id)
+    intent_analysis = service.analyze_user_intent(message)
+    cache_key = cached = messages = None
+    if with_messages:
+        chat_history = service.get_chat_history(session)
+        cache_key = service.response_cache_key(message, chat_history, intent_analysis)
+        cached = service.cached_response(cache_key, intent_analysis)
+        if cached is None:
+            messages = service.build_messages(message, session, intent_analysis, chat_history)
+    return session, intent_analysis, cache_key, cached, messages
+
+
+async def stream_chat(message, session_id=None, user_id=None):
+    """
+    Sinh các sự kiện SSE cho một lượt chat: "session" (session_id), "token" cho từng đoạn văn
+    bản model trả về, rồi "done" với đúng dữ liệu như POST /chatbot/chat/ sau khi tin nhắn đã
+    được lưu. Phần đọc/ghi DB chạy qua sync_to_async; trong lúc chờ LLM worker ASGI không bị
+    chiếm nên phục vụ được request khác. Nội dung cuối trong "done" có thể khác các token đã
+    gửi (vd. câu trả lời flash sale được dựng lại từ sản phẩm), client nên hiển thị theo "done".
+    Câu trả lời lấy từ cache (xem response_cache.py) được gửi trong một sự kiện "token".
+    """
+    service = ChatbotService()
+    client = get_async_openai_client()
+    session, intent_analysis, cache_key, response_data, messages = await sync_to_async(_prepare)(
+        service, message, session_id, user_id, client is not None
+    )
+    yield sse("session", {"session_id": session.session_id})
+
+    if client is None or response_data is not None:
+        if response_data is None:
+            response_data = await sync_to_async(service.generate_fallback_response)(message, session, intent_analysis)
+        yield sse("token", {"text": response_data["response"]})
+    else:
+        parts = []
+        try:
+            stream = await client.chat.completions.create(
+                model=settings.CHATBOT_MODEL,
+                messages=messages,
+                max_tokens=500,
+                temperature=0.7,
+                stream=True,
+            )
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    parts.append(text)
+                    yield sse("token", {"text": text})
+            response_data = await sync_to_async(service.complete_response)("".join(parts), intent_analysis, 0, cache_key)
+        except Exception as e:
+            response_data = await sync_to_async(service.error_response)(message, session, intent_analysis, e)
+
+    result = await sync_to_async(service.save_response)(session, response_data)
+    yield sse("done", result)
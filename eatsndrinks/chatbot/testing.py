@@ -0,0 +1,115 @@
+"""
+Server giả lập API chat completions của OpenAI chạy trên 127.0.0.1, dùng cho test và
+benchmark_chatbot_stream: đo thời gian tới token đầu tiên và số kết nối mà không cần mạng.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Giữ kết nối keep-alive như API thật
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        with fake.lock:
+            fake.requests += 1
+        model = body.get("model", "fake")
+        if body.get("stream"):
+            self._stream(fake, model)
+        else:
+            time.sleep(fake.first_token_delay + fake.token_delay * len(fake.tokens))
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": fake.reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 10, "completion_tokens": len(fake.tokens), "total_tokens": 10 + len(fake.tokens)},
+            })
+
+    def _send_json(self, code, data):
+        payload = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _chunk(self, data):
+        payload = f"data: {data}\n\n".encode()
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, fake, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(fake.first_token_delay)
+        for position, token in enumerate(fake.tokens):
+            if position:
+                time.sleep(fake.token_delay)
+            self._chunk(json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }))
+        self._chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class FakeLLMServer:
+    """
+    Dùng như context manager: with FakeLLMServer(reply="...") as server: ... server.base_url.
+    reply được trả về theo từng từ (token); first_token_delay/token_delay (giây) mô phỏng độ trễ
+    của model. requests và connections đếm số request và số kết nối TCP đã nhận.
+    """
+
+    def __init__(self, reply="Xin chào! Mình có thể giúp gì cho bạn?", token_delay=0.0, first_token_delay=0.0):
+        self.reply = reply
+        self.tokens = [word if not position else f" {word}" for position, word in enumerate(reply.split(" "))]
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -1,8 +1,18 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
+from .context import CatalogueDigest, get_system_prompt
+from .evaluation import create_sample_catalogue, evaluate
+from .intents import analyze_intent
+from .llm import get_openai_client
+from .response_cache import ResponseCache, get_response_cache, normalize_message
 from .models import ChatSession, ChatMessage, ProductRecommendation, ChatbotConfig
+from .retrieval import retrieve_product_ids
+from .services import ChatbotService
+from .testing import FakeLLMServer
 from catalogue.models import Category, Product
 from users.models import User
 import json
@@ -183,3 +193,242 @@ class ChatbotAPITest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn('error', response.data)
+
+
+class CatalogueDigestTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Đồ uống', description='Các loại đồ uống')
+        self.products = [
+            Product.objects.create(name=f'Món {i}', description='Mô tả ' * 100, price=10000 + i, category=self.category)
+            for i in range(5)
+        ]
+
+    def test_prompt_is_compact_and_cached(self):
+        prompt = get_system_prompt()
+        self.assertIn('{"i":%d,"n":"Món 0","c":%d,"p":10000' % (self.products[0].id, self.category.id), prompt)
+        self.assertIn('[{"i":%d,"n":"Đồ uống","d":"Các loại đồ uống"}]' % self.category.id, prompt)
+        self.assertIn('Tổng cộng 5 sản phẩm', prompt)
+        self.assertNotIn('Mô tả ' * 40, prompt)  # Mô tả được rút gọn
+        with self.assertNumQueries(0):
+            self.assertEqual(ChatbotService().create_system_prompt(), prompt)
+
+    def test_only_changed_products_are_reloaded(self):
+        now = timezone.now()
+        digest = CatalogueDigest().refreshed(1, now)
+        self.assertEqual(digest.reloaded, 5)
+
+        changed = self.products[0]
+        changed.name = 'Trà đào'
+        changed.save()
+        Product.objects.filter(pk=self.products[1].pk).update(is_active=False)
+        with self.assertNumQueries(3):  # id + updated_at, danh mục, sản phẩm đã đổi
+            refreshed = digest.refreshed(2, now)
+        self.assertEqual(refreshed.reloaded, 1)
+        self.assertIn('"n":"Trà đào"', refreshed.system_prompt)
+        self.assertNotIn('"n":"Món 1"', refreshed.system_prompt)
+        self.assertIn('Tổng cộng 4 sản phẩm', refreshed.system_prompt)
+        # Bản cũ không bị sửa khi dựng bản mới
+        self.assertIn('"n":"Món 1"', digest.prompt_for([self.products[1].id]))
+        self.assertEqual(len(digest.entries), 5)
+
+    def test_flash_sale_window_expires_entry(self):
+        now = timezone.now()
+        product = self.products[0]
+        product.flash_sale_price = 5000
+        product.flash_sale_start = now - timedelta(hours=1)
+        product.flash_sale_end = now + timedelta(hours=1)
+        product.save()
+
+        digest = CatalogueDigest().refreshed(1, now)
+        self.assertIn('"p":5000,"g":10000', digest.system_prompt)
+        self.assertFalse(digest.is_stale(1, now))
+
+        later = now + timedelta(hours=2)
+        self.assertTrue(digest.is_stale(1, later))
+        digest = digest.refreshed(1, later)
+        self.assertEqual(digest.reloaded, 1)
+        self.assertIn('"n":"Món 0","c":%d,"p":10000,"d"' % self.category.id, digest.system_prompt)
+        self.assertIsNone(digest.expires_at)
+
+
+class ProductRetrievalTest(TestCase):
+    def setUp(self):
+        create_sample_catalogue()
+        self.service = ChatbotService()
+
+    def names(self, product_ids):
+        products = Product.objects.in_bulk(product_ids)
+        return [products[product_id].name for product_id in product_ids]
+
+    def test_bm25_ranks_name_matches_without_accents(self):
+        self.assertEqual(self.names(retrieve_product_ids('ca phe sua', k=2))[0], 'Cà phê sữa đá')
+        self.assertEqual(self.names(retrieve_product_ids('Tôi muốn mua Milo', k=1)), ['Milo'])
+        # Tin nhắn trước giúp chọn đúng danh mục khi câu hiện tại không nói rõ
+        self.assertCountEqual(
+            self.names(retrieve_product_ids('loại có ga', ['Tôi muốn tìm đồ uống'], k=2)),
+            ['Coca Cola', 'Pepsi'],
+        )
+
+    def test_prompt_contains_only_retrieved_products(self):
+        prompt = self.service.create_system_prompt('Tôi muốn mua Milo')
+        self.assertIn('"n":"Milo"', prompt)
+        self.assertNotIn('"n":"Phở bò"', prompt)
+        self.assertIn('Tổng cộng 19 sản phẩm', prompt)
+        self.assertNotIn('"p":', self.service.create_system_prompt('Xin chào'))
+
+        cheapest = self.service.select_context_products('Có sản phẩm nào rẻ không?')
+        self.assertEqual(self.names(cheapest[:2]), ['Nước suối', 'Milo'])
+
+    def test_recall_on_sample_cases(self):
+        for message, _, _, recall in evaluate(k=3):
+            self.assertEqual(recall, 1.0, message)
+
+
+class IntentEngineTest(TestCase):
+    def setUp(self):
+        self.drinks = Category.objects.create(name='Đồ uống')
+        Category.objects.create(name='Đồ', is_active=False)
+
+    def test_classifies_script_messages(self):
+        cases = {
+            'Xin chào bạn': ('greeting', []),
+            'Trang web này bán gì?': ('search', []),
+            'Đề xuất cho tôi món ăn ngon': ('recommendation', []),
+            'Có gì rẻ không?': ('search', ['rẻ']),
+            'Giá thấp hay đắt?': ('recommendation', ['giá thấp', 'đắt']),
+            'cao cấp': ('price_search', ['cao cấp']),
+            'Có flash sale không': ('flash_sale', []),
+            'Tôi muốn mua ĐỒ UỐNG có ga': ('category_search', []),
+            'abc': ('general_query', []),
+        }
+        for message, (intent, keywords) in cases.items():
+            analysis = analyze_intent(message)
+            self.assertEqual((analysis['intent'], analysis['keywords']), (intent, keywords), message)
+
+        analysis = analyze_intent('Xin chào, có gì ngon?')
+        self.assertTrue(all(analysis[flag] for flag in ('is_greeting', 'is_general_question', 'is_search', 'is_recommendation_request')))
+        self.assertIsNone(analysis['category_filter'])
+        self.assertEqual(analyze_intent('đồ uống nào ngon')['category_filter'], self.drinks.id)
+
+    def test_cached_until_categories_change(self):
+        analyze_intent('đồ ăn')
+        with self.assertNumQueries(0):
+            self.assertEqual(analyze_intent('đồ ăn')['intent'], 'general_query')
+        food = Category.objects.create(name='Đồ ăn')
+        self.assertEqual(analyze_intent('đồ ăn')['category_filter'], food.id)
+
+
+class ChatStreamTest(TestCase):
+    def setUp(self):
+        drinks = Category.objects.create(name='Đồ uống')
+        Product.objects.create(name='Coca Cola', price=15000, category=drinks)
+
+    def events(self, body):
+        events = []
+        for block in body.decode().strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    async def stream(self, message):
+        response = await self.async_client.post(
+            reverse('chatbot:chat_stream'), {'message': message}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return self.events(b''.join([chunk async for chunk in response.streaming_content]))
+
+    def test_shared_client_reuses_connection(self):
+        with FakeLLMServer(reply='Bạn thử Coca Cola nhé') as server:
+            with override_settings(OPENAI_API_KEY='test', OPENAI_BASE_URL=server.base_url):
+                self.assertIs(get_openai_client(), ChatbotService().client)
+                first = ChatbotService().process_chat('Tôi muốn tìm đồ uống')
+                ChatbotService().process_chat('Còn gì nữa không?', first['session_id'])
+        self.assertEqual(first['message'], 'Bạn thử Coca Cola nhé')
+        self.assertEqual(first['metadata']['tokens_used'], 15)
+        self.assertEqual([p['name'] for p in first['recommendations']], ['Coca Cola'])
+        self.assertEqual((server.requests, server.connections), (2, 1))
+
+    async def test_stream_sends_tokens_and_saves_message(self):
+        with FakeLLMServer(reply='Bạn thử Coca Cola nhé') as server:
+            with override_settings(OPENAI_API_KEY='test', OPENAI_BASE_URL=server.base_url):
+                events = await self.stream('Tôi muốn tìm đồ uống')
+
+        names = [event for event, _ in events]
+        self.assertEqual((names[0], names[-1]), ('session', 'done'))
+        self.assertEqual(''.join(data['text'] for event, data in events if event == 'token'), 'Bạn thử Coca Cola nhé')
+        self.assertGreater(names.count('token'), 1)
+        done = events[-1][1]
+        self.assertEqual(done['session_id'], events[0][1]['session_id'])
+        self.assertEqual([p['name'] for p in done['recommendations']], ['Coca Cola'])
+        saved = [message async for message in ChatMessage.objects.filter(session__session_id=done['session_id']).order_by('id')]
+        self.assertEqual([(m.message_type, m.content) for m in saved], [
+            ('user', 'Tôi muốn tìm đồ uống'), ('bot', 'Bạn thử Coca Cola nhé'),
+        ])
+
+    @override_settings(OPENAI_API_KEY='')
+    async def test_stream_without_key_uses_fallback(self):
+        events = await self.stream('Xin chào')
+        self.assertEqual([event for event, _ in events], ['session', 'token', 'done'])
+        self.assertEqual(events[1][1]['text'], events[2][1]['message'])
+
+    async def test_stream_rejects_invalid_request(self):
+        response = await self.async_client.post(reverse('chatbot:chat_stream'), {}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        drinks = Category.objects.create(name='Đồ uống')
+        now = timezone.now()
+        self.coca = Product.objects.create(
+            name='Coca Cola', price=15000, category=drinks,
+            flash_sale_price=10000, flash_sale_start=now - timedelta(hours=1), flash_sale_end=now + timedelta(hours=1),
+        )
+
+    def test_lru_and_ttl(self):
+        cache = ResponseCache(max_entries=2, ttl=10)
+        cache.set('a', 'A', [1], now=0)
+        cache.set('b', 'B', [2], now=0)
+        self.assertEqual(cache.get('a', now=1), ('A', [1]))
+        cache.set('c', 'C', [3], now=1)  # 'b' ít dùng nhất bị bỏ
+        self.assertIsNone(cache.get('b', now=1))
+        self.assertEqual(cache.get('c', now=10), ('C', [3]))
+        self.assertIsNone(cache.get('a', now=10))
+        self.assertEqual(len(cache), 1)
+
+    def test_normalize_message(self):
+        self.assertEqual(normalize_message('  Đồ uống   RẺ?? '), 'đồ uống rẻ')
+        self.assertNotEqual(normalize_message('sinh tố bơ'), normalize_message('sinh tố bò'))
+
+    def test_repeated_question_skips_model_and_rehydrates_products(self):
+        with FakeLLMServer(reply='Bạn thử Coca Cola nhé') as server:
+            with override_settings(OPENAI_API_KEY='test', OPENAI_BASE_URL=server.base_url):
+                first = ChatbotService().process_chat('Tôi muốn tìm đồ uống')
+                # Flash sale kết thúc mà phiên bản danh mục không đổi
+                Product.objects.filter(id=self.coca.id).update(flash_sale_end=timezone.now() - timedelta(minutes=1))
+                second = ChatbotService().process_chat('tôi muốn tìm  ĐỒ UỐNG!')
+                follow_up = ChatbotService().process_chat('Tôi muốn tìm đồ uống', second['session_id'])
+
+        self.assertEqual(server.requests, 2)
+        self.assertEqual([first['metadata']['cache'], second['metadata']['cache'], follow_up['metadata']['cache']], ['miss', 'hit', 'bypass'])
+        self.assertEqual(second['message'], first['message'])
+        self.assertEqual(second['metadata']['tokens_used'], 0)
+        self.assertEqual(
+            [(p['id'], p['price'], p['is_flash_sale']) for p in first['recommendations']], [(self.coca.id, 10000.0, True)]
+        )
+        self.assertEqual(
+            [(p['id'], p['price'], bool(p['is_flash_sale'])) for p in second['recommendations']], [(self.coca.id, 15000.0, False)]
+        )
+        saved = ChatMessage.objects.filter(session__session_id=second['session_id'], message_type='bot').order_by('id')
+        self.assertEqual([m.metadata['cache'] for m in saved], ['hit', 'bypass'])
+
+    def test_catalogue_change_invalidates(self):
+        with FakeLLMServer(reply='Bạn thử Coca Cola nhé') as server:
+            with override_settings(OPENAI_API_KEY='test', OPENAI_BASE_URL=server.base_url):
+                ChatbotService().process_chat('Có gì rẻ không?')
+                self.coca.price = 12000
+                self.coca.save()
+                result = ChatbotService().process_chat('Có gì rẻ không?')
+        self.assertEqual((server.requests, result['metadata']['cache']), (2, 'miss'))
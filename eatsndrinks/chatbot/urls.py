@@ -5,6 +5,7 @@ app_name = 'chatbot'
 
 urlpatterns = [
     path('chat/', views.chat, name='chat'),
+    path('chat/stream/', views.chat_stream, name='chat_stream'),
     path('history/', views.chat_history, name='chat_history'),
     path('session/create/', views.CreateSessionView.as_view(), name='create_session'),
     path('config/', views.get_config, name='get_config'),
@@ -1,4 +1,9 @@
+import json
+
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -13,6 +18,7 @@ from .serializers import (
     ChatbotConfigSerializer
 )
 from .services import ChatbotService
+from .streaming import stream_chat
 from .models import ChatSession, ChatMessage, ChatbotConfig
 
 # Create your views here.
@@ -89,6 +95,43 @@ def chat(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@extend_schema(
+    tags=['Chatbot'],
+    summary='Chat với chatbot (streaming)',
+    description=(
+        'Giống POST /chatbot/chat/ nhưng trả về text/event-stream: sự kiện "session", các sự kiện "token" '
+        'theo từng đoạn câu trả lời, và "done" chứa dữ liệu như /chatbot/chat/ sau khi tin nhắn đã được lưu. '
+        'Cần chạy qua ASGI (eatsndrinks/asgi.py) để token được gửi ngay khi model trả về.'
+    ),
+    request=ChatRequestSerializer,
+    responses={200: str, 400: None},
+)
+@csrf_exempt
+@require_POST
+async def chat_stream(request):
+    """
+    Chat với chatbot, nhận câu trả lời dạng server-sent events
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = ChatRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(
+        stream_chat(
+            serializer.validated_data['message'],
+            serializer.validated_data.get('session_id'),
+            serializer.validated_data.get('user_id'),
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Không để proxy (nginx) gom các sự kiện lại
+    return response
+
 @extend_schema(
     tags=['Chatbot'],
     summary='Lấy lịch sử chat',
@@ -119,6 +119,9 @@ DATABASES = {
     }
 }
 
+# MySQL bỏ qua chỉ mục một phần (order_paid_created_idx) và dùng chỉ mục ghép tương ứng
+SILENCED_SYSTEM_CHECKS = ["models.W037"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -164,6 +167,45 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ảnh phái sinh (WebP/JPEG) được tạo cạnh ảnh gốc, xem api/images.py
+IMAGE_DERIVATIVE_WIDTHS = [320, 640, 1024]
+IMAGE_DERIVATIVE_WORKERS = 2
+IMAGE_MANIFEST_CACHE_TIMEOUT = 3600
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Thay bằng Redis/Memcached khi chạy nhiều tiến trình
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eatsndrinks',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+CATALOGUE_CACHE_TIMEOUT = 300  # Giây giữ phản hồi GET công khai của catalogue
+IDEMPOTENCY_KEY_TIMEOUT = 24 * 60 * 60  # Giây giữ phản hồi theo Idempotency-Key (xem api/idempotency.py)
+
+# Nơi lưu giỏ hàng (xem cart/storage.py): DatabaseCartStore ghi thẳng vào DB; CacheCartStore giữ
+# giỏ hàng trong cache và ghi xuống sau, cần một cache dùng chung (vd. Redis) khi chạy nhiều worker
+CART_STORE = os.getenv("CART_STORE", "cart.storage.DatabaseCartStore")
+CART_STORE_CACHE = "default"
+CART_STORE_LOCK_TIMEOUT = 5  # Giây chờ khóa giỏ hàng của một user
+CART_STORE_CHECKOUT_LOCK_TIMEOUT = 120  # Giây tối đa giữ khóa giỏ hàng trong lúc đặt hàng
+
+# Chatbot (xem chatbot/llm.py): một OpenAI client dùng chung cho cả tiến trình, giữ kết nối keep-alive
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # vd. server LLM giả khi chạy benchmark
+CHATBOT_MODEL = os.getenv("CHATBOT_MODEL", "gpt-3.5-turbo")
+CHATBOT_LLM_TIMEOUT = 30  # Giây chờ phản hồi từ LLM
+CHATBOT_LLM_CONNECT_TIMEOUT = 5
+CHATBOT_LLM_MAX_CONNECTIONS = 20
+CHATBOT_LLM_MAX_RETRIES = 1
+CHATBOT_RESPONSE_CACHE_SIZE = 500  # Số câu trả lời giữ trong cache của mỗi tiến trình (0 = tắt)
+CHATBOT_RESPONSE_CACHE_TTL = 600  # Giây
+
 
 REST_FRAMEWORK = {
     # YOUR SETTINGS
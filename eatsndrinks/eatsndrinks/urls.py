@@ -12,6 +12,8 @@ urlpatterns = [
     path('contact/', include('contact.urls')),
     path('restaurants/', include('restaurants.urls')),
     path('chatbot/', include('chatbot.urls')),
+    path('search/', include('search.urls')),
+    path('analytics/', include('analytics.urls')),
     
     # Endpoint for generating the OpenAPI schema
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
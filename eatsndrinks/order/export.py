@@ -0,0 +1,85 @@
+import csv
+import json
+
+from django.utils import timezone
+
+from .models import Order
+
+FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 500
+
+ORDER_COLUMNS = [
+    "order_id",
+    "created_at",
+    "customer",
+    "phone_number",
+    "address",
+    "status",
+    "payment_method",
+    "payment_status",
+    "order_total",
+]
+ITEM_COLUMNS = ["product_id", "product_name", "unit_price", "quantity", "line_total"]
+# CSV có một dòng cho mỗi món; thông tin đơn được lặp lại trên từng dòng
+COLUMNS = ORDER_COLUMNS + ITEM_COLUMNS
+
+
+def _order_record(order):
+    return {
+        "order_id": order.id,
+        "created_at": timezone.localtime(order.created_at).isoformat(),
+        "customer": f"{order.user.first_name} {order.user.last_name}".strip() or order.user.username,
+        "phone_number": order.phone_number,
+        "address": order.address,
+        "status": order.status,
+        "payment_method": order.payment_method,
+        "payment_status": order.payment_status,
+        "order_total": order.total_price,
+    }
+
+
+def _item_record(detail):
+    return {
+        "product_id": detail.product_id,
+        "product_name": detail.product_name,
+        "unit_price": detail.unit_price,
+        "quantity": detail.quantity,
+        "line_total": detail.total_price,
+    }
+
+
+class _Echo:
+    """Bộ đệm giả cho csv.writer: trả thẳng dòng đã định dạng thay vì ghi vào bộ nhớ"""
+
+    def write(self, value):
+        return value
+
+
+def export_orders(queryset=None, file_format="csv", chunk_size=CHUNK_SIZE):
+    """
+    Sinh nội dung file export đơn hàng kèm chi tiết theo từng dòng. Đơn được đọc bằng
+    iterator(chunk_size) và chi tiết được prefetch theo từng lô, nên bộ nhớ và số truy vấn
+    mỗi lô không phụ thuộc tổng số đơn.
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+    orders = queryset.with_details().order_by("-created_at", "-id").iterator(chunk_size=chunk_size)
+
+    if file_format == "jsonl":
+        for order in orders:
+            record = _order_record(order)
+            record["items"] = [_item_record(detail) for detail in order.orderdetail_set.all()]
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for order in orders:
+        record = _order_record(order)
+        row = ["" if record[column] is None else record[column] for column in ORDER_COLUMNS]
+        details = order.orderdetail_set.all()
+        if not details:
+            yield writer.writerow(row + [""] * len(ITEM_COLUMNS))
+        for detail in details:
+            item = _item_record(detail)
+            yield writer.writerow(row + [item[column] for column in ITEM_COLUMNS])
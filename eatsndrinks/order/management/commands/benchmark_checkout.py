@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmark import median_ms, throwaway_database
+from cart.models import Cart, CartItem
+from catalogue.models import Product, ProductCombo, ProductComboItem
+from order.services import place_order
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Measure checkout latency and query count for growing cart sizes on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,5,20,50,100', help='Comma-separated cart sizes')
+        parser.add_argument('--combos', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=10, help='Checkouts per size; the median is reported')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        with throwaway_database():
+            products = Product.objects.bulk_create(
+                Product(name=f'Sản phẩm {i}', price=Decimal(10000 + i), effective_price=Decimal(10000 + i))
+                for i in range(max(sizes))
+            )
+            for i in range(options['combos']):
+                combo = ProductCombo.objects.create(name=f'Combo {i}', discount_amount=1000 + i)
+                ProductComboItem.objects.bulk_create(
+                    ProductComboItem(combo=combo, product=products[(i + n) % len(products)], quantity=1)
+                    for n in range(2)
+                )
+            user = User.objects.create_user(username='bench', password='bench12345', first_name='B', last_name='C')
+            cart = Cart.objects.get(user=user)
+
+            def fill_cart(size):
+                CartItem.objects.bulk_create(
+                    CartItem(cart=cart, product=product, quantity=2) for product in products[:size]
+                )
+
+            self.stdout.write(f'{"cart size":>10} {"median ms":>12} {"queries":>8}')
+            for size in sizes:
+                # Lượt đầu để nạp chỉ mục combo và đếm truy vấn
+                fill_cart(size)
+                with CaptureQueriesContext(connection) as queries:
+                    place_order(user, address='Benchmark')
+
+                def checkout():
+                    place_order(user, address='Benchmark')
+
+                timings = []
+                for _ in range(options['repeat']):
+                    fill_cart(size)
+                    timings.append(median_ms(checkout, 1))
+                timings.sort()
+                self.stdout.write(f'{size:>10} {timings[len(timings) // 2]:>12.2f} {len(queries):>8}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from order.search import rebuild_order_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the admin order search index (customer names and phone numbers)'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding order search index...')
+        count = rebuild_order_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Indexed {count} orders')
+        )
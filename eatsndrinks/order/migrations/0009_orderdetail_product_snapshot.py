@@ -0,0 +1,44 @@
+# Generated by Django 5.1 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def populate_product_snapshot(apps, schema_editor):
+    OrderDetail = apps.get_model('order', 'OrderDetail')
+    last_pk = 0
+    # Duyệt theo khóa chính từng đợt để không nạp toàn bộ bảng vào bộ nhớ
+    while True:
+        details = list(
+            OrderDetail.objects.filter(pk__gt=last_pk).select_related('product').order_by('pk')[:BATCH_SIZE]
+        )
+        if not details:
+            break
+        for detail in details:
+            detail.product_name = detail.product.name
+            detail.product_image = detail.product.mainimage.name or ''
+        OrderDetail.objects.bulk_update(details, ['product_name', 'product_image'])
+        last_pk = details[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0008_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderdetail',
+            name='product_image',
+            field=models.ImageField(blank=True, default='', upload_to='product_main_images/'),
+        ),
+        migrations.AddField(
+            model_name='orderdetail',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(populate_product_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1 on 2026-10-18 15:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from order.search import build_order_terms
+
+
+def populate_index(apps, schema_editor):
+    Order = apps.get_model('order', 'Order')
+    OrderSearchToken = apps.get_model('order', 'OrderSearchToken')
+
+    rows = []
+    for order in Order.objects.select_related('user').iterator(chunk_size=500):
+        rows.extend(OrderSearchToken(term=term, order_id=order.id) for term in build_order_terms(order))
+        if len(rows) >= 5000:
+            OrderSearchToken.objects.bulk_create(rows)
+            rows = []
+    OrderSearchToken.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0009_orderdetail_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='order.order')),
+            ],
+            options={
+                'verbose_name': 'Từ Khóa Tìm Đơn Hàng',
+                'verbose_name_plural': 'Từ Khóa Tìm Đơn Hàng',
+                'indexes': [models.Index(fields=['term', 'order'], name='order_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+from drf_spectacular.utils import OpenApiParameter
+
+from .search import MIN_PHONE_PREFIX_LENGTH, search_orders
+
+# Tham số lọc chung cho tài liệu OpenAPI của danh sách và export đơn hàng của admin
+ADMIN_ORDER_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        name="search",
+        type=str,
+        required=False,
+        description=(
+            "Chuỗi số (có thể có # ở đầu): đúng mã đơn hàng, hoặc số điện thoại (của đơn hay của khách) "
+            f"bắt đầu bằng chuỗi đó nếu dài từ {MIN_PHONE_PREFIX_LENGTH} chữ số và không có #. "
+            "Chuỗi khác: họ tên khách hàng, không phân biệt hoa thường và dấu, mọi từ đều phải khớp "
+            "và từ cuối được khớp theo tiền tố."
+        ),
+    ),
+    OpenApiParameter(name="status", type=str, required=False),
+    OpenApiParameter(name="payment_method", type=str, required=False),
+    OpenApiParameter(name="payment_status", type=str, required=False),
+]
+
+
+class AdminOrderFilterMixin:
+    """Bộ lọc đơn hàng dùng chung cho danh sách và export của admin"""
+
+    def filter_queryset(self, queryset):
+        """
+        Thêm chức năng tìm kiếm và lọc theo trạng thái, phương thức thanh toán, trạng thái thanh toán
+        """
+        # Tìm theo mã đơn hàng, số điện thoại hoặc tên khách hàng
+        search_query = self.request.query_params.get("search", None)
+        if search_query:
+            queryset = search_orders(queryset, search_query)
+
+        # Lọc theo trạng thái đơn hàng
+        status = self.request.query_params.get("status", None)
+        if status:
+            queryset = queryset.filter(status=status)
+
+        # Lọc theo phương thức thanh toán
+        payment_method = self.request.query_params.get("payment_method", None)
+        if payment_method:
+            queryset = queryset.filter(payment_method=payment_method)
+
+        # Lọc theo trạng thái thanh toán
+        payment_status = self.request.query_params.get("payment_status", None)
+        if payment_status:
+            queryset = queryset.filter(payment_status=payment_status)
+
+        return queryset
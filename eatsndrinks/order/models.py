@@ -3,6 +3,17 @@ from catalogue.models import Product
 from users.models import User
 from django.core.validators import RegexValidator
 
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Nạp sẵn khách hàng và chi tiết đơn cho danh sách/chi tiết đơn hàng: số truy vấn không phụ
+        thuộc số đơn. Chi tiết dùng tên và ảnh sản phẩm đã lưu lúc đặt nên không join bảng sản phẩm.
+        """
+        return self.select_related("user").prefetch_related(
+            models.Prefetch("orderdetail_set", queryset=OrderDetail.objects.order_by("id"))
+        )
+
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ("cxl", 'Chưa Xử Lý'),
@@ -43,9 +54,21 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=25, choices=PAYMENT_METHOD_CHOICES, default="cod")
     payment_status = models.CharField(max_length=25, choices=PAYMENT_STATUS_CHOICES, default="pending")  # ✅ Thêm trạng thái thanh toán
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Đơn Hàng"
         verbose_name_plural = "Đơn Hàng"
+        indexes = [
+            models.Index(fields=["payment_status", "created_at"], name="order_payment_created_idx"),
+            models.Index(fields=["user", "created_at"], name="order_user_created_idx"),
+            # Chỉ mục một phần cho thống kê doanh thu; MySQL bỏ qua và dùng order_payment_created_idx
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(payment_status="paid"),
+                name="order_paid_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return (
@@ -57,6 +80,9 @@ class Order(models.Model):
 class OrderDetail(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # Tên và ảnh sản phẩm lúc đặt hàng, để đơn cũ không đổi theo danh mục hiện tại
+    product_name = models.CharField(max_length=255, blank=True, default="")
+    product_image = models.ImageField(upload_to="product_main_images/", blank=True, default="")
     unit_price = models.IntegerField(null=True, blank=True)
     quantity = models.IntegerField(default=1)
     total_price = models.IntegerField(default=0)
@@ -65,10 +91,39 @@ class OrderDetail(models.Model):
         verbose_name = "Chi Tiết Đơn Hàng"
         verbose_name_plural = "Chi Tiết Đơn Hàng"
 
+    def snapshot_product(self, product):
+        """Lưu lại tên và ảnh hiện tại của sản phẩm vào chi tiết đơn"""
+        self.product_name = product.name
+        self.product_image = product.mainimage.name or ""
+
     def save(self, *args, **kwargs):
-        self.unit_price = self.product.price
-        self.total_price = self.product.price * self.quantity
+        # Giữ giá đã chốt lúc đặt hàng (có thể là giá flash sale); chỉ lấy giá niêm yết khi chưa có
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        if not self.product_name:
+            self.snapshot_product(self.product)
+        self.total_price = self.unit_price * self.quantity
         super(OrderDetail, self).save(*args, **kwargs)
 
     def __str__(self):
-        return "Mã Đơn Hàng: " + str(self.order.id) + " - Sản Phẩm: " + self.product.name + " - Giá Bán: " + str(self.unit_price) + " - Số Lượng: " + str(self.quantity) + " - Tổng Tiền: " + str(self.total_price)
+        return "Mã Đơn Hàng: " + str(self.order.id) + " - Sản Phẩm: " + self.product_name + " - Giá Bán: " + str(self.unit_price) + " - Số Lượng: " + str(self.quantity) + " - Tổng Tiền: " + str(self.total_price)
+
+
+class OrderSearchToken(models.Model):
+    """
+    Chỉ mục tìm kiếm đơn hàng cho admin: từ khóa đã chuẩn hóa (tên khách hàng, số điện thoại)
+    -> đơn hàng. Được cập nhật mỗi khi đơn hoặc thông tin khách hàng thay đổi.
+    """
+    term = models.CharField(max_length=64)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="search_tokens")
+
+    class Meta:
+        verbose_name = "Từ Khóa Tìm Đơn Hàng"
+        verbose_name_plural = "Từ Khóa Tìm Đơn Hàng"
+        indexes = [
+            # Chỉ mục bao phủ: tìm theo term (chính xác hoặc khoảng tiền tố) mà không đọc bảng
+            models.Index(fields=["term", "order"], name="order_search_token_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.order_id}"
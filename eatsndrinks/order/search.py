@@ -0,0 +1,121 @@
+import re
+from typing import Iterable, List, Set
+
+from django.db import transaction
+from django.db.models import Q
+
+from search.services import MIN_PREFIX_LENGTH, tokenize
+from .models import Order, OrderSearchToken
+
+INDEX_BATCH_SIZE = 500
+MIN_PHONE_PREFIX_LENGTH = 3  # Chuỗi số ngắn hơn chỉ được hiểu là mã đơn hàng
+MAX_ORDER_ID_DIGITS = 18  # Dài hơn thì vượt quá kiểu số nguyên của cột id
+
+_ORDER_ID_RE = re.compile(r"^#?(\d+)$")
+
+
+def build_order_terms(order: Order) -> Set[str]:
+    """Từ khóa của một đơn: họ tên khách hàng (bỏ dấu) và số điện thoại của đơn lẫn của khách"""
+    user = order.user
+    terms = set(tokenize(f"{user.first_name} {user.last_name}"))
+    for phone in (order.phone_number, user.phone_number):
+        digits = re.sub(r"\D", "", phone or "")
+        if digits:
+            terms.add(digits)
+    return terms
+
+
+def _token_rows(order: Order) -> List[OrderSearchToken]:
+    return [OrderSearchToken(term=term, order_id=order.id) for term in build_order_terms(order)]
+
+
+def index_order(order: Order, created: bool = False) -> None:
+    """Cập nhật chỉ mục cho một đơn (gọi sau khi đơn được lưu); đơn mới chưa có từ khóa cũ để xóa"""
+    if created:
+        OrderSearchToken.objects.bulk_create(_token_rows(order))
+        return
+    with transaction.atomic():
+        OrderSearchToken.objects.filter(order_id=order.id).delete()
+        OrderSearchToken.objects.bulk_create(_token_rows(order))
+
+
+def index_orders(orders: Iterable[Order]) -> int:
+    """Đánh chỉ mục lại nhiều đơn theo lô (đơn cần được select_related("user")), trả về số đơn đã xử lý"""
+    count = 0
+    batch = []
+    for order in orders:
+        batch.append(order)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            count += _index_batch(batch)
+            batch = []
+    if batch:
+        count += _index_batch(batch)
+    return count
+
+
+def _index_batch(orders: List[Order]) -> int:
+    rows = []
+    for order in orders:
+        rows.extend(_token_rows(order))
+    with transaction.atomic():
+        OrderSearchToken.objects.filter(order_id__in=[order.id for order in orders]).delete()
+        OrderSearchToken.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE)
+    return len(orders)
+
+
+def index_user_orders(user) -> int:
+    """Đánh chỉ mục lại các đơn của một khách hàng khi tên hoặc số điện thoại của họ thay đổi"""
+    orders = Order.objects.filter(user=user).order_by("id").iterator(chunk_size=INDEX_BATCH_SIZE)
+    # Gắn sẵn user để không truy vấn lại cho từng đơn
+    return index_orders(_with_user(orders, user))
+
+
+def _with_user(orders, user):
+    for order in orders:
+        order.user = user
+        yield order
+
+
+def rebuild_order_index() -> int:
+    """Xóa và dựng lại toàn bộ chỉ mục tìm kiếm đơn hàng"""
+    OrderSearchToken.objects.all().delete()
+    orders = Order.objects.select_related("user").order_by("id")
+    return index_orders(orders.iterator(chunk_size=INDEX_BATCH_SIZE))
+
+
+def _term_condition(term: str, prefix: bool, min_length: int = MIN_PREFIX_LENGTH) -> Q:
+    if prefix and len(term) >= min_length:
+        # Dùng khoảng giá trị thay cho LIKE để luôn tận dụng được chỉ mục
+        return Q(term__gte=term, term__lt=term + "\U0010ffff")
+    return Q(term=term)
+
+
+def _matching_orders(condition: Q):
+    return OrderSearchToken.objects.filter(condition).values("order_id")
+
+
+def search_orders(queryset, query: str):
+    """
+    Lọc queryset đơn hàng theo câu tìm kiếm của admin:
+    - Chuỗi số (có thể có # ở đầu): đúng mã đơn, hoặc số điện thoại bắt đầu bằng chuỗi đó.
+    - Còn lại: họ tên khách hàng không phân biệt hoa thường và dấu; mọi từ đều phải khớp,
+      từ cuối được khớp theo tiền tố.
+    Mỗi điều kiện là một truy vấn con trên chỉ mục (term, order), không quét bảng đơn hàng.
+    """
+    query = (query or "").strip()
+    match = _ORDER_ID_RE.match(query.replace(" ", "").replace(".", ""))
+    if match:
+        digits = match.group(1)
+        condition = Q(id=int(digits)) if len(digits) <= MAX_ORDER_ID_DIGITS else Q(pk__in=[])
+        if not query.startswith("#") and len(digits) >= MIN_PHONE_PREFIX_LENGTH:
+            phone = _term_condition(digits, prefix=True, min_length=MIN_PHONE_PREFIX_LENGTH)
+            condition |= Q(id__in=_matching_orders(phone))
+        return queryset.filter(condition)
+
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return queryset
+    for position, term in enumerate(terms):
+        condition = _term_condition(term, prefix=position == len(terms) - 1)
+        queryset = queryset.filter(id__in=_matching_orders(condition))
+    return queryset
@@ -1,16 +1,15 @@
 from rest_framework import serializers
 from .models import Order, OrderDetail
-from cart.models import CartItem
-from catalogue.models import ProductCombo
+from .services import place_order
 from drf_spectacular.utils import extend_schema_field
 
 class OrderDetailSerializer(serializers.ModelSerializer):
-    product_name = serializers.ReadOnlyField(source="product.name")
-    product_image = serializers.ImageField(source="product.mainimage", read_only=True)
+    """Tên và ảnh sản phẩm lấy từ bản lưu lúc đặt hàng, không truy vấn bảng sản phẩm"""
 
     class Meta:
         model = OrderDetail
         fields = ["product", "product_name", "product_image", "unit_price", "quantity", "total_price"]
+        read_only_fields = ["product_name", "product_image"]
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderDetailSerializer(source="orderdetail_set", many=True, read_only=True)
@@ -21,72 +20,7 @@ class OrderSerializer(serializers.ModelSerializer):
         extra_kwargs = {"user": {"read_only": True}, "total_price": {"read_only": True}, "status": {"read_only": True}}
 
     def create(self, validated_data):
-        user = self.context["request"].user
-        cart_items = CartItem.objects.filter(cart__user=user)
-
-        if not cart_items.exists():
-            raise serializers.ValidationError("Giỏ hàng của bạn đang trống!")
-
-        # Tính toán tổng tiền và kiểm tra combo
-        total_price = 0
-        applied_combos = set()  # Theo dõi các combo đã áp dụng
-
-        # Lấy tất cả combo đang active
-        active_combos = ProductCombo.objects.filter(is_active=True)
-
-        # Tạo order với giá ban đầu
-        order = Order.objects.create(user=user, total_price=0, **validated_data)
-
-        # Xử lý từng item trong giỏ hàng
-        for item in cart_items:
-            # Lấy giá sản phẩm (có flash sale không)
-            if item.product.is_flash_sale_active() and item.product.flash_sale_price:
-                unit_price = item.product.flash_sale_price
-            else:
-                unit_price = item.product.price
-
-            # Kiểm tra xem sản phẩm có thuộc combo nào không
-            item_in_combo = False
-            for combo in active_combos:
-                if combo.id in applied_combos:
-                    continue  # Bỏ qua combo đã áp dụng
-
-                combo_items = combo.items.all()
-                # Kiểm tra xem tất cả sản phẩm trong combo có trong giỏ hàng không
-                combo_products = {ci.product: ci.quantity for ci in combo_items}
-                cart_products = {item.product: item.quantity for item in cart_items}
-
-                # Kiểm tra số lượng sản phẩm trong combo có đủ không
-                if all(
-                    product in cart_products and cart_products[product] >= quantity
-                    for product, quantity in combo_products.items()
-                ):
-                    # Áp dụng giảm giá combo
-                    total_price += (unit_price * item.quantity) - combo.discount_amount
-                    applied_combos.add(combo.id)
-                    item_in_combo = True
-                    break
-
-            if not item_in_combo:
-                total_price += unit_price * item.quantity
-
-            # Tạo order detail
-            OrderDetail.objects.create(
-                order=order,
-                product=item.product,
-                unit_price=unit_price,
-                quantity=item.quantity,
-                total_price=unit_price * item.quantity
-            )
-
-        # Cập nhật tổng tiền của order
-        order.total_price = total_price
-        order.save()
-
-        # Xóa giỏ hàng sau khi đặt hàng
-        cart_items.delete()
-
-        return order
+        return place_order(self.context["request"].user, **validated_data)
 
 class AdminOrderSerializer(serializers.ModelSerializer):
     items = OrderDetailSerializer(source="orderdetail_set", many=True, read_only=True)
@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+from rest_framework import serializers
+
+from cart.models import Cart, CartItem
+from cart.storage import get_cart_store
+from catalogue.combos import best_combos_for_cart
+from catalogue.pricing import effective_price_at
+from .models import Order, OrderDetail
+
+
+def unit_price_at(product, now):
+    """Giá bán một sản phẩm tại thời điểm đặt hàng (đã tính flash sale)"""
+    price, _ = effective_price_at(
+        product.price, product.flash_sale_price, product.flash_sale_start, product.flash_sale_end, now
+    )
+    return int(price)
+
+
+def price_cart(items, now=None):
+    """
+    Tính giá giỏ hàng trong bộ nhớ: trả về (các OrderDetail chưa lưu, tổng tiền hàng, giảm giá combo).
+    items là các CartItem đã nạp sẵn product.
+    """
+    now = now or timezone.now()
+    details = []
+    subtotal = 0
+    for item in items:
+        unit_price = unit_price_at(item.product, now)
+        detail = OrderDetail(
+            product=item.product,
+            unit_price=unit_price,
+            quantity=item.quantity,
+            total_price=unit_price * item.quantity,
+        )
+        detail.snapshot_product(item.product)
+        details.append(detail)
+        subtotal += unit_price * item.quantity
+    _, combo_discount = best_combos_for_cart((item.product_id, item.quantity) for item in items)
+    return details, subtotal, int(combo_discount)
+
+
+def place_order(user, **order_fields):
+    """
+    Đặt hàng từ giỏ hàng của user trong một transaction: khóa giỏ hàng để hai request
+    đồng thời không đặt trùng, tính giá trong bộ nhớ, tạo order và toàn bộ chi tiết bằng
+    bulk_create rồi xóa giỏ. Số truy vấn không phụ thuộc số món trong giỏ.
+    Giỏ hàng đang giữ trong cart store được ghi xuống DB trước và bỏ đi sau khi đặt hàng,
+    trong lúc đó store không nhận thay đổi khác của user (xem BaseCartStore.checkout).
+    """
+    store = get_cart_store()
+    with store.checkout(user), transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(user=user).first()
+        items = list(cart.cartitem_set.select_related("product").order_by("id")) if cart else []
+        if not items:
+            raise serializers.ValidationError("Giỏ hàng của bạn đang trống!")
+
+        details, subtotal, combo_discount = price_cart(items)
+        order = Order.objects.create(user=user, total_price=max(0, subtotal - combo_discount), **order_fields)
+        for detail in details:
+            detail.order = order
+        # bulk_create không gọi OrderDetail.save() nên giá đã tính ở trên được giữ nguyên
+        OrderDetail.objects.bulk_create(details)
+        CartItem.objects.filter(cart=cart).delete()
+
+    prefetch_related_objects([order], Prefetch("orderdetail_set", queryset=OrderDetail.objects.order_by("id")))
+    return order
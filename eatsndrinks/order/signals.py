@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from users.models import User
+from .models import Order
+from .search import index_order, index_user_orders
+
+# Các trường của khách hàng được đưa vào chỉ mục tìm kiếm đơn hàng
+USER_SEARCH_FIELDS = {"first_name", "last_name", "phone_number"}
+
+
+@receiver(post_save, sender=Order)
+def update_order_search_index(sender, instance, created, raw=False, **kwargs):
+    if raw:  # Bỏ qua khi nạp fixture
+        return
+    index_order(instance, created=created)
+
+
+@receiver(post_save, sender=User)
+def update_customer_orders_search_index(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Khách hàng mới chưa có đơn; lưu last_login khi đăng nhập không đổi tên hay số điện thoại
+    if raw or created or (update_fields is not None and not USER_SEARCH_FIELDS & set(update_fields)):
+        return
+    index_user_orders(instance)
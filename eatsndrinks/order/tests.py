@@ -1,3 +1,222 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from cart.models import Cart, CartItem
+from catalogue.combos import get_combo_index
+from catalogue.models import Product, ProductCombo, ProductComboItem
+from users.models import User
+from .models import Order, OrderDetail
 
-# Create your tests here.
+
+class OrderCreateTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='khach', password='pass12345', first_name='A', last_name='B')
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.get(user=self.user)
+        self.tea = Product.objects.create(name='Trà', price=20000)
+        self.cake = Product.objects.create(name='Bánh', price=15000)
+
+    def test_total_applies_best_combo_set(self):
+        for discount, quantity in ((3000, 1), (5000, 2)):
+            combo = ProductCombo.objects.create(name=f'Combo {discount}', discount_amount=discount)
+            ProductComboItem.objects.create(combo=combo, product=self.tea, quantity=quantity)
+            ProductComboItem.objects.create(combo=combo, product=self.cake, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.tea, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=self.cake, quantity=2)
+
+        response = self.client.post('/order/create', {'address': 'Q1', 'phone_number': '0901234567'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Đủ món cho cả hai combo: 3 trà + 2 bánh = 90000, giảm 3000 + 5000
+        self.assertEqual(Order.objects.get().total_price, 90000 - 8000)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_flash_sale_price_is_kept_on_order_details(self):
+        now = timezone.now()
+        self.tea.flash_sale_price = 12000
+        self.tea.flash_sale_start = now - timedelta(hours=1)
+        self.tea.flash_sale_end = now + timedelta(hours=1)
+        self.tea.save()
+        CartItem.objects.create(cart=self.cart, product=self.tea, quantity=2)
+
+        response = self.client.post('/order/create', {'address': 'Q1'})
+        self.assertEqual(response.data['total_price'], 24000)
+        self.assertEqual(response.data['items'][0]['unit_price'], 12000)
+        detail = OrderDetail.objects.get()
+        self.assertEqual((detail.unit_price, detail.total_price), (12000, 24000))
+
+        detail.quantity = 3
+        detail.save()
+        self.assertEqual((detail.unit_price, detail.total_price), (12000, 36000))
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        products = [Product.objects.create(name=f'Món {i}', price=10000) for i in range(20)]
+        for size in (1, 20):
+            CartItem.objects.bulk_create(CartItem(cart=self.cart, product=p, quantity=1) for p in products[:size])
+            get_combo_index()
+            # Gồm một INSERT vào chỉ mục tìm kiếm đơn hàng
+            with self.assertNumQueries(10):
+                response = self.client.post('/order/create', {'address': 'Q1'})
+            self.assertEqual(len(response.data['items']), size)
+
+    def test_empty_cart_is_rejected(self):
+        response = self.client.post('/order/create', {'address': 'Q1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+
+def create_orders(user, products, count, **fields):
+    """Tạo nhanh các đơn đã có chi tiết bằng bulk_create"""
+    orders = Order.objects.bulk_create(
+        Order(user=user, total_price=sum(product.price for product in products), address='Q1', **fields)
+        for _ in range(count)
+    )
+    details = []
+    for order in orders:
+        for product in products:
+            detail = OrderDetail(order=order, product=product, unit_price=product.price, quantity=1, total_price=product.price)
+            detail.snapshot_product(product)
+            details.append(detail)
+    OrderDetail.objects.bulk_create(details)
+    return orders
+
+
+class AdminOrderExportTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='pass12345')
+        self.client.force_authenticate(self.admin)
+        self.customer = User.objects.create_user(username='khach', password='pass12345', first_name='Văn', last_name='A')
+        self.tea = Product.objects.create(name='Trà, đá', price=20000)
+        self.cake = Product.objects.create(name='Bánh', price=15000)
+
+    def create_orders(self, count, **fields):
+        return create_orders(self.customer, [self.tea, self.cake], count, **fields)
+
+    def export(self, **params):
+        response = self.client.get('/order/admin/orders/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_one_row_per_item_and_applies_filters(self):
+        paid, = self.create_orders(1, payment_status='paid')
+        self.create_orders(2)
+        rows = list(csv.DictReader(io.StringIO(self.export(payment_status='paid'))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row['order_id'] for row in rows}, {str(paid.id)})
+        self.assertEqual([row['product_name'] for row in rows], ['Trà, đá', 'Bánh'])
+        self.assertEqual(rows[0]['customer'], 'Văn A')
+
+    def test_jsonl_nests_items(self):
+        self.create_orders(2)
+        lines = [json.loads(line) for line in self.export(file_format='jsonl').splitlines()]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual([item['line_total'] for item in lines[0]['items']], [20000, 15000])
+        response = self.client.get('/order/admin/orders/export/', {'file_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_queries_per_chunk_do_not_grow_with_order_count(self):
+        self.create_orders(30)
+        response = self.client.get('/order/admin/orders/export/')
+        # Một truy vấn đơn (kèm user) và một truy vấn chi tiết (kèm sản phẩm) cho mỗi lô
+        with self.assertNumQueries(2):
+            content = b''.join(response.streaming_content)
+        self.assertEqual(content.count(b'\n'), 1 + 60)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/order/admin/orders/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class OrderListingQueryTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='pass12345')
+        self.customer = User.objects.create_user(username='khach', password='pass12345', first_name='Văn', last_name='A')
+        self.products = [Product.objects.create(name=f'Món {i}', price=10000 + i) for i in range(3)]
+
+    def test_listings_use_constant_queries_per_page(self):
+        for count in (1, 30):
+            Order.objects.all().delete()
+            create_orders(self.customer, self.products, count, payment_status='paid')
+
+            self.client.force_authenticate(self.admin)
+            # Đếm đơn, trang đơn kèm khách hàng, chi tiết của cả trang
+            with self.assertNumQueries(3):
+                response = self.client.get('/order/admin/orders/', {'page_size': 100})
+            self.assertEqual(len(response.data['results']), count)
+            with self.assertNumQueries(1):
+                self.client.get('/order/admin/recent-paid-customers/')
+
+            self.client.force_authenticate(self.customer)
+            with self.assertNumQueries(2):
+                response = self.client.get('/order/')
+            self.assertEqual(len(response.data), count)
+
+    def test_details_keep_product_snapshot(self):
+        order, = create_orders(self.customer, self.products[:1], 1)
+        product = self.products[0]
+        product.name = 'Tên mới'
+        product.save()
+
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/order/admin/order/{order.id}/')
+        self.assertEqual(response.data['full_name'], 'Văn A')
+        self.assertEqual(response.data['items'][0]['product_name'], 'Món 0')
+
+    def test_placed_order_stores_snapshot(self):
+        cart = Cart.objects.get(user=self.customer)
+        CartItem.objects.create(cart=cart, product=self.products[1], quantity=2)
+        self.client.force_authenticate(self.customer)
+        self.client.post('/order/create', {'address': 'Q1'})
+        self.assertEqual(OrderDetail.objects.get().product_name, 'Món 1')
+
+
+class AdminOrderSearchTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='pass12345')
+        self.client.force_authenticate(self.admin)
+        self.lan = User.objects.create_user(
+            username='lan', password='pass12345', first_name='Lan', last_name='Nguyễn Thị', phone_number='0912345678'
+        )
+        self.hung = User.objects.create_user(username='hung', password='pass12345', first_name='Hùng', last_name='Trần')
+        self.lan_order = Order.objects.create(user=self.lan, total_price=10000)
+        self.hung_order = Order.objects.create(user=self.hung, total_price=20000, phone_number='0987654321')
+
+    def search(self, query):
+        response = self.client.get('/order/admin/orders/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {order['id'] for order in response.data['results']}
+
+    def test_search_by_order_id_is_exact(self):
+        self.assertEqual(self.search(str(self.hung_order.id)), {self.hung_order.id})
+        self.assertEqual(self.search(f'#{self.lan_order.id}'), {self.lan_order.id})
+        self.assertEqual(self.search('99999'), set())
+
+    def test_search_by_phone_prefix(self):
+        self.assertEqual(self.search('0912'), {self.lan_order.id})  # Số của khách hàng
+        self.assertEqual(self.search('098 765'), {self.hung_order.id})  # Số trên đơn
+        self.assertEqual(self.search('09'), set())
+
+    def test_search_by_normalized_name(self):
+        self.assertEqual(self.search('nguyen thi lan'), {self.lan_order.id})
+        self.assertEqual(self.search('TRẦN Hù'), {self.hung_order.id})
+        self.assertEqual(self.search('lan tran'), set())
+
+    def test_index_follows_customer_changes(self):
+        self.hung.last_name = 'Lê'
+        self.hung.save()
+        self.assertEqual(self.search('hung le'), {self.hung_order.id})
+        self.assertEqual(self.search('tran'), set())
+
+    def test_search_combines_with_filters(self):
+        self.lan_order.payment_status = 'paid'
+        self.lan_order.save()
+        Order.objects.create(user=self.lan, total_price=5000)
+        response = self.client.get('/order/admin/orders/', {'search': 'lan', 'payment_status': 'paid'})
+        self.assertEqual([order['id'] for order in response.data['results']], [self.lan_order.id])
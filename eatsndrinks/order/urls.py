@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import OrderCreateView, AdminOrderView, AdminOrderDetailView, UserOrderListView, UserOrderDetailView, RecentPaidCustomersView, MonthlySalesView, MonthlyRevenueView, YearlyRevenueView
+from .views import OrderCreateView, AdminOrderView, AdminOrderExportView, AdminOrderDetailView, UserOrderListView, UserOrderDetailView, RecentPaidCustomersView, MonthlySalesView, MonthlyRevenueView, YearlyRevenueView
 
 urlpatterns = [
     path("", UserOrderListView.as_view(), name="user-orders"),
     path("create", OrderCreateView.as_view(), name="user-order-create"),
     path("admin/orders/", AdminOrderView.as_view(), name="admin-order-list"),  # GET danh sách
+    path("admin/orders/export/", AdminOrderExportView.as_view(), name="admin-order-export"),  # GET CSV/JSONL
     path("admin/order/<int:id>/", AdminOrderDetailView.as_view(), name="admin-order-detail"),  # GET, PUT, PATCH, DELETE
     path("<int:id>/", UserOrderDetailView.as_view(), name="user-order-detail"),
     path('admin/recent-paid-customers/', RecentPaidCustomersView.as_view(), name='recent-paid-customers'),
@@ -1,14 +1,34 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from .export import FORMATS, export_orders
+from .mixins import ADMIN_ORDER_FILTER_PARAMETERS, AdminOrderFilterMixin
 from .models import Order, OrderDetail
 from .serializers import AdminOrderSerializer, OrderSerializer, OrderDetailSerializer, RecentCustomerSerializer
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from api.idempotency import IdempotencyMixin
+from cart.mixins import CartStoreBusyMixin
+from api.pagination import OptInCursorPagination
 from rest_framework.views import APIView
-from django.utils.timezone import now
-from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from django.utils.timezone import localdate
+from analytics.services import month_start, monthly_totals
 
-class OrderCreateView(generics.CreateAPIView):
+class OrderPageNumberPagination(OptInCursorPagination):
+    page_size = 10  # Default number of items per page
+    page_size_query_param = (
+        "page_size"  # Allow clients to set page size using this query parameter
+    )
+    max_page_size = 100  # Maximum number of items that can be requested per page
+    cursor_ordering = ("-created_at", "-id")  # ?cursor= : phân trang keyset theo (created_at, id)
+
+class UserOrderPagination(OrderPageNumberPagination):
+    """Giữ nguyên danh sách không phân trang, chỉ phân trang khi client gửi ?cursor= hoặc ?page_size="""
+    page_size = None
+    cursor_page_size = 10
+
+class OrderCreateView(CartStoreBusyMixin, IdempotencyMixin, generics.CreateAPIView):
+    """Đặt hàng từ giỏ hàng; gửi kèm header Idempotency-Key để request gửi lại không tạo đơn trùng"""
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
 
@@ -21,9 +41,10 @@ class UserOrderListView(generics.ListAPIView):
     """
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
+    pagination_class = UserOrderPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by("-created_at")  # Lấy đơn hàng của user, mới nhất trước
+        return Order.objects.filter(user=self.request.user).with_details().order_by("-created_at")  # Lấy đơn hàng của user, mới nhất trước
 
 class UserOrderDetailView(generics.RetrieveAPIView):
     """
@@ -35,63 +56,17 @@ class UserOrderDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         # Chỉ lấy đơn hàng thuộc về user hiện tại
-        return Order.objects.filter(user=self.request.user)
+        return Order.objects.filter(user=self.request.user).with_details()
 
-class OrderPageNumberPagination(PageNumberPagination):
-    page_size = 10  # Default number of items per page
-    page_size_query_param = (
-        "page_size"  # Allow clients to set page size using this query parameter
-    )
-    max_page_size = 100  # Maximum number of items that can be requested per page
-
-    def get_paginated_response(self, data):
-        return Response(
-            {
-                "count": self.page.paginator.count,
-                "total_pages": self.page.paginator.num_pages,  # Add total pages here
-                "next": self.get_next_link(),
-                "previous": self.get_previous_link(),
-                "results": data,
-            }
-        )
-
-class AdminOrderView(generics.ListAPIView):
+class AdminOrderView(AdminOrderFilterMixin, generics.ListAPIView):
     """
     API để admin lấy danh sách đơn hàng (GET /admin/orders/)
     """
     permission_classes = [IsAdminUser]
-    queryset = Order.objects.all().order_by("-created_at")  # Sắp xếp theo thời gian tạo
+    queryset = Order.objects.with_details().order_by("-created_at")  # Sắp xếp theo thời gian tạo
     serializer_class = AdminOrderSerializer
     pagination_class = OrderPageNumberPagination
 
-    def filter_queryset(self, queryset):
-        """
-        Thêm chức năng tìm kiếm và lọc theo trạng thái, phương thức thanh toán, trạng thái thanh toán
-        """
-        # Lọc theo mã đơn hàng hoặc tên người dùng
-        search_query = self.request.query_params.get("search", None)
-        if search_query:
-            queryset = queryset.filter(
-                id__icontains=search_query
-            )
-
-        # Lọc theo trạng thái đơn hàng
-        status = self.request.query_params.get("status", None)
-        if status:
-            queryset = queryset.filter(status=status)
-
-        # Lọc theo phương thức thanh toán
-        payment_method = self.request.query_params.get("payment_method", None)
-        if payment_method:
-            queryset = queryset.filter(payment_method=payment_method)
-
-        # Lọc theo trạng thái thanh toán
-        payment_status = self.request.query_params.get("payment_status", None)
-        if payment_status:
-            queryset = queryset.filter(payment_status=payment_status)
-
-        return queryset
-
     def get_queryset(self):
         """
         Gọi filter_queryset để áp dụng tìm kiếm và lọc
@@ -99,13 +74,44 @@ class AdminOrderView(generics.ListAPIView):
         queryset = super().get_queryset()
         return self.filter_queryset(queryset)
 
+    @extend_schema(parameters=ADMIN_ORDER_FILTER_PARAMETERS)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+class AdminOrderExportView(AdminOrderFilterMixin, APIView):
+    """
+    API để admin xuất đơn hàng kèm chi tiết dạng CSV/JSONL theo luồng (GET /admin/orders/export/)
+    - Nhận cùng các bộ lọc với danh sách đơn hàng của admin
+    """
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name="file_format", type=str, required=False, enum=list(FORMATS)),
+            *ADMIN_ORDER_FILTER_PARAMETERS,
+        ],
+        responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    )
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in FORMATS:
+            return Response({"detail": "file_format phải là 'csv' hoặc 'jsonl'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(Order.objects.all())
+        content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+        response = StreamingHttpResponse(
+            export_orders(queryset, file_format), content_type=f"{content_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="orders.{file_format}"'
+        return response
+
 class AdminOrderDetailView(generics.RetrieveUpdateAPIView):
     """
     API để admin xem & cập nhật đơn hàng theo ID (GET, PUT, PATCH)
     - Không cho phép DELETE (xóa)
     """
     permission_classes = [IsAdminUser]
-    queryset = Order.objects.all()
+    queryset = Order.objects.with_details()
     serializer_class = AdminOrderSerializer
     lookup_field = "id"
     http_method_names = ["get", "post", "put", "patch"]
@@ -119,7 +125,7 @@ class RecentPaidCustomersView(APIView):
 
     def get(self, request, *args, **kwargs):
         # Lấy danh sách 5 đơn hàng đã thanh toán gần đây
-        recent_orders = Order.objects.filter(payment_status="paid").order_by("-created_at")[:5]
+        recent_orders = Order.objects.filter(payment_status="paid").select_related("user").order_by("-created_at")[:5]
         
         # Serialize dữ liệu
         serializer = RecentCustomerSerializer(recent_orders, many=True)
@@ -133,24 +139,9 @@ class MonthlySalesView(APIView):
     serializer_class = None  # No serializer needed for simple response
 
     def get(self, request, *args, **kwargs):
-        today = now()
-        start_of_month = today.replace(day=1)
-        # Tính ngày đầu tháng tiếp theo
-        if today.month < 12:
-            end_of_month = today.replace(month=today.month + 1, day=1)
-        else:
-            end_of_month = today.replace(year=today.year + 1, month=1, day=1)
-
-        # Lọc các đơn hàng đã thanh toán trong tháng này
-        orders = Order.objects.filter(
-            payment_status="paid",
-            created_at__gte=start_of_month,
-            created_at__lt=end_of_month
-        )
-
-        total_orders = orders.count()
-
-        return Response({"total_quantity": total_orders}, status=200)
+        # Đọc từ bảng thống kê theo ngày thay vì đếm lại bảng Order
+        this_month, = monthly_totals(month_start(localdate()), 1)
+        return Response({"total_quantity": this_month["order_count"]}, status=200)
 
 class MonthlyRevenueView(APIView):
     """
@@ -160,33 +151,10 @@ class MonthlyRevenueView(APIView):
     serializer_class = None  # No serializer needed for simple response
 
     def get(self, request, *args, **kwargs):
-        # Lấy ngày đầu tiên và ngày cuối cùng của tháng hiện tại
-        today = now()
-        start_of_this_month = today.replace(day=1)
-        if today.month < 12:
-            start_of_next_month = today.replace(day=1, month=today.month + 1)
-        else:
-            start_of_next_month = today.replace(day=1, month=1, year=today.year + 1)
-
-        # Lấy ngày đầu tiên và ngày cuối cùng của tháng trước
-        if today.month > 1:
-            start_of_last_month = today.replace(day=1, month=today.month - 1)
-        else:
-            start_of_last_month = today.replace(day=1, month=12, year=today.year - 1)
-
-        # Tổng doanh thu tháng này
-        revenue_this_month = Order.objects.filter(
-            payment_status="paid",
-            created_at__gte=start_of_this_month,
-            created_at__lt=start_of_next_month
-        ).aggregate(total=Sum('total_price'))['total'] or 0
-
-        # Tổng doanh thu tháng trước
-        revenue_last_month = Order.objects.filter(
-            payment_status="paid",
-            created_at__gte=start_of_last_month,
-            created_at__lt=start_of_this_month
-        ).aggregate(total=Sum('total_price'))['total'] or 0
+        # Tháng trước và tháng này, một truy vấn trên bảng thống kê theo ngày
+        last_month, this_month = monthly_totals(month_start(localdate(), -1), 2)
+        revenue_this_month = this_month["revenue"]
+        revenue_last_month = last_month["revenue"]
 
         # Tính phần trăm tăng/giảm
         if revenue_last_month > 0:
@@ -208,43 +176,10 @@ class YearlyRevenueView(APIView):
     serializer_class = None  # No serializer needed for simple response
 
     def get(self, request, *args, **kwargs):
-        today = now()
-        monthly_revenue = []
-        
-        # Lặp qua 12 tháng gần nhất
-        for i in range(12):
-            # Tính ngày đầu và cuối của mỗi tháng
-            if today.month - i > 0:
-                start_month = today.month - i
-                start_year = today.year
-            else:
-                start_month = today.month - i + 12
-                start_year = today.year - 1
-                
-            start_date = today.replace(day=1, month=start_month, year=start_year)
-            
-            # Tính ngày đầu tháng tiếp theo
-            if start_month < 12:
-                end_month = start_month + 1
-                end_year = start_year
-            else:
-                end_month = 1
-                end_year = start_year + 1
-            end_date = today.replace(day=1, month=end_month, year=end_year)
-            
-            # Tính doanh thu của tháng
-            monthly_total = Order.objects.filter(
-                payment_status="paid",
-                created_at__gte=start_date,
-                created_at__lt=end_date
-            ).aggregate(total=Sum('total_price'))['total'] or 0
-            
-            # Thêm vào danh sách kết quả
-            monthly_revenue.append({
-                'month': start_date.strftime('%Y-%m'),
-                'revenue': monthly_total
-            })
-        
+        # 12 tháng gần nhất đọc bằng một truy vấn theo khoảng ngày, tháng hiện tại đứng đầu
+        months = monthly_totals(month_start(localdate(), -11), 12)
+        monthly_revenue = [
+            {'month': month['month'].strftime('%Y-%m'), 'revenue': month['revenue']}
+            for month in reversed(months)
+        ]
         return Response(monthly_revenue, status=200)
-
-
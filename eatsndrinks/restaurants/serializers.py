@@ -1,7 +1,10 @@
 from rest_framework import serializers
+from api.images import ImageSrcsetField
 from .models import Restaurant
 
 class RestaurantSerializer(serializers.ModelSerializer):
+    mainimage_srcset = ImageSrcsetField(source='mainimage')
+
     class Meta:
         model = Restaurant
         fields = '__all__'
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.images import delete_derivatives, schedule_derivatives
+from .models import Restaurant
+
+
+@receiver(post_save, sender=Restaurant)
+def generate_restaurant_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_derivatives(instance.mainimage)
+
+
+@receiver(post_delete, sender=Restaurant)
+def delete_restaurant_image_derivatives(sender, instance, **kwargs):
+    if instance.mainimage:
+        delete_derivatives(instance.mainimage.name)
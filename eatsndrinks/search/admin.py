@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import ProductSearchToken
 
-# Register your models here.
+
+@admin.register(ProductSearchToken)
+class ProductSearchTokenAdmin(admin.ModelAdmin):
+    list_display = ("term", "product", "weight", "is_active")
+    search_fields = ("term", "product__name")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from search.services import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding product search index...')
+        count = rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Indexed {count} products')
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 5.1 on 2026-10-18 15:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalogue', '0004_productcombo_productcomboitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('is_active', models.BooleanField(default=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='catalogue.product')),
+            ],
+            options={
+                'verbose_name': 'Từ Khóa Tìm Kiếm',
+                'verbose_name_plural': 'Từ Khóa Tìm Kiếm',
+                'indexes': [models.Index(fields=['is_active', 'term', 'product', 'weight'], name='search_token_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from search.services import build_product_terms
+
+
+def populate_index(apps, schema_editor):
+    Product = apps.get_model('catalogue', 'Product')
+    ProductSearchToken = apps.get_model('search', 'ProductSearchToken')
+
+    rows = []
+    for product in Product.objects.select_related('category').iterator(chunk_size=500):
+        for term, weight in build_product_terms(product).items():
+            rows.append(ProductSearchToken(
+                term=term, product_id=product.id, weight=weight, is_active=product.is_active
+            ))
+        if len(rows) >= 5000:
+            ProductSearchToken.objects.bulk_create(rows)
+            rows = []
+    ProductSearchToken.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
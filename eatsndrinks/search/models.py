@@ -1,3 +1,25 @@
 from django.db import models
 
-# Create your models here.
+
+class ProductSearchToken(models.Model):
+    """Một dòng của chỉ mục đảo ngược: từ khóa đã chuẩn hóa -> sản phẩm"""
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(
+        "catalogue.Product", on_delete=models.CASCADE, related_name="search_tokens"
+    )
+    weight = models.PositiveIntegerField(default=1)
+    is_active = models.BooleanField(default=True)  # Sao chép từ Product để không phải JOIN khi tìm kiếm
+
+    class Meta:
+        verbose_name = "Từ Khóa Tìm Kiếm"
+        verbose_name_plural = "Từ Khóa Tìm Kiếm"
+        indexes = [
+            # Chỉ mục bao phủ: tìm theo (is_active, term) và cộng weight mà không đọc bảng
+            models.Index(
+                fields=["is_active", "term", "product", "weight"],
+                name="search_token_lookup_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id} ({self.weight})"
@@ -0,0 +1,138 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Iterable, List
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+
+from catalogue.models import Product
+from .models import ProductSearchToken
+
+# Trọng số theo trường: khớp tên quan trọng hơn khớp danh mục, danh mục hơn mô tả
+FIELD_WEIGHTS = {
+    "name": 3,
+    "category": 2,
+    "description": 1,
+}
+MAX_TERM_LENGTH = 64
+MIN_PREFIX_LENGTH = 2  # Từ cuối ngắn hơn mức này chỉ khớp chính xác
+INDEX_BATCH_SIZE = 500
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Chuyển về chữ thường và bỏ dấu tiếng Việt ("Cà Phê Đá" -> "ca phe da")"""
+    if not text:
+        return ""
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Tách văn bản đã chuẩn hóa thành các từ khóa"""
+    return [token[:MAX_TERM_LENGTH] for token in _TOKEN_RE.findall(normalize_text(text))]
+
+
+def build_product_terms(product: Product) -> Counter:
+    """Tính trọng số của từng từ khóa cho một sản phẩm"""
+    terms = Counter()
+    fields = {
+        "name": product.name,
+        "category": product.category.name if product.category else "",
+        "description": product.description,
+    }
+    for field, text in fields.items():
+        for token in tokenize(text):
+            terms[token] += FIELD_WEIGHTS[field]
+    return terms
+
+
+def _token_rows(product: Product) -> List[ProductSearchToken]:
+    return [
+        ProductSearchToken(
+            term=term, product_id=product.id, weight=weight, is_active=product.is_active
+        )
+        for term, weight in build_product_terms(product).items()
+    ]
+
+
+def index_product(product: Product) -> None:
+    """Cập nhật chỉ mục cho một sản phẩm (gọi sau khi sản phẩm được lưu)"""
+    with transaction.atomic():
+        ProductSearchToken.objects.filter(product_id=product.id).delete()
+        ProductSearchToken.objects.bulk_create(_token_rows(product))
+
+
+def index_products(products: Iterable[Product]) -> int:
+    """Đánh chỉ mục lại nhiều sản phẩm theo lô, trả về số sản phẩm đã xử lý"""
+    count = 0
+    batch = []
+    for product in products:
+        batch.append(product)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            count += _index_batch(batch)
+            batch = []
+    if batch:
+        count += _index_batch(batch)
+    return count
+
+
+def _index_batch(products: List[Product]) -> int:
+    rows = []
+    for product in products:
+        rows.extend(_token_rows(product))
+    with transaction.atomic():
+        ProductSearchToken.objects.filter(product_id__in=[p.id for p in products]).delete()
+        ProductSearchToken.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE)
+    return len(products)
+
+
+def rebuild_index() -> int:
+    """Xóa và dựng lại toàn bộ chỉ mục"""
+    ProductSearchToken.objects.all().delete()
+    products = Product.objects.select_related("category").order_by("id")
+    return index_products(products.iterator(chunk_size=INDEX_BATCH_SIZE))
+
+
+def _term_condition(term: str, prefix: bool) -> Q:
+    if prefix and len(term) >= MIN_PREFIX_LENGTH:
+        # Dùng khoảng giá trị thay cho LIKE để luôn tận dụng được chỉ mục
+        return Q(term__gte=term, term__lt=term + "\U0010ffff")
+    return Q(term=term)
+
+
+def search_product_ids(query: str, active_only: bool = True):
+    """
+    Trả về queryset (product_id, score) đã xếp hạng cho câu truy vấn.
+    Mọi từ trong câu truy vấn đều phải khớp; từ cuối cùng được khớp theo tiền tố
+    để hỗ trợ gõ-đến-đâu-tìm-đến-đó. Trả về None nếu câu truy vấn rỗng.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return None
+
+    tokens = ProductSearchToken.objects.all()
+    if active_only:
+        tokens = tokens.filter(is_active=True)
+    else:
+        tokens = tokens.filter(is_active__in=[True, False])
+
+    match = Q()
+    flags = {}
+    for position, term in enumerate(terms):
+        condition = _term_condition(term, prefix=position == len(terms) - 1)
+        match |= condition
+        flags[f"matched_{position}"] = Max(
+            Case(When(condition, then=1), default=0, output_field=IntegerField())
+        )
+
+    return (
+        tokens.filter(match)
+        .values("product_id")
+        .annotate(score=Sum("weight"), **flags)
+        .filter(**{flag: 1 for flag in flags})
+        .order_by("-score", "product_id")
+    )
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from catalogue.models import Category, Product
+from .services import index_product, index_products
+
+
+@receiver(post_save, sender=Product)
+def update_product_index(sender, instance, raw=False, **kwargs):
+    if raw:  # Bỏ qua khi nạp fixture
+        return
+    index_product(instance)
+
+
+@receiver(post_save, sender=Category)
+def update_category_products_index(sender, instance, created, raw=False, **kwargs):
+    if raw or created:  # Danh mục mới chưa có sản phẩm nào
+        return
+    index_products(instance.products.select_related("category"))
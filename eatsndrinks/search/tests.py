@@ -1,3 +1,101 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from catalogue.models import Category, Product
+from .models import ProductSearchToken
+from .services import normalize_text, search_product_ids, tokenize
 
-# Create your tests here.
+
+class SearchNormalizationTest(TestCase):
+    def test_normalize_strips_vietnamese_diacritics(self):
+        self.assertEqual(normalize_text('Cà Phê Sữa Đá'), 'ca phe sua da')
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Trà đào, cam sả!'), ['tra', 'dao', 'cam', 'sa'])
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Đồ uống')
+        self.coffee = Product.objects.create(
+            name='Cà phê sữa đá', description='Cà phê phin truyền thống',
+            price=25000, category=self.category
+        )
+        self.tea = Product.objects.create(
+            name='Trà đào', description='Trà đào cam sả', price=30000, category=self.category
+        )
+
+    def ranked_ids(self, query, active_only=True):
+        return [row['product_id'] for row in search_product_ids(query, active_only)]
+
+    def test_index_is_built_on_save(self):
+        self.assertTrue(ProductSearchToken.objects.filter(product=self.coffee, term='phe').exists())
+
+    def test_query_without_diacritics_matches(self):
+        self.assertEqual(self.ranked_ids('ca phe'), [self.coffee.id])
+
+    def test_last_term_matches_prefix(self):
+        self.assertEqual(self.ranked_ids('tra da'), [self.tea.id])
+
+    def test_name_match_ranks_above_category_match(self):
+        other = Product.objects.create(name='Nước suối', description='Không phải trà', price=5000)
+        self.assertEqual(self.ranked_ids('tra'), [self.tea.id, other.id])
+
+    def test_index_updates_incrementally(self):
+        self.coffee.name = 'Bạc xỉu'
+        self.coffee.save()
+        self.assertEqual(self.ranked_ids('bac xiu'), [self.coffee.id])
+        self.assertNotIn(self.coffee.id, self.ranked_ids('sua da'))
+
+    def test_category_rename_reindexes_products(self):
+        self.category.name = 'Giải khát'
+        self.category.save()
+        self.assertEqual(set(self.ranked_ids('giai khat')), {self.coffee.id, self.tea.id})
+
+    def test_inactive_products_are_hidden_unless_requested(self):
+        self.tea.is_active = False
+        self.tea.save()
+        self.assertEqual(self.ranked_ids('dao'), [])
+        self.assertEqual(self.ranked_ids('dao', active_only=False), [self.tea.id])
+
+
+class ProductSearchAPITest(APITestCase):
+    def setUp(self):
+        self.coffee = Product.objects.create(name='Cà phê sữa', price=25000)
+        self.tea = Product.objects.create(name='Trà sữa', price=30000)
+
+    def test_search_endpoint_returns_paginated_results(self):
+        response = self.client.get(reverse('search-products'), {'q': 'ca phe'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], self.coffee.id)
+
+    def test_search_endpoint_cursor_keeps_relevance_order(self):
+        milk = Product.objects.create(name='Sữa tươi', description='Sữa tươi thanh trùng', price=20000)
+        ids, url, params = [], reverse('search-products'), {'q': 'sua', 'cursor': '', 'page_size': 1}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [product['id'] for product in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(ids, [milk.id, self.coffee.id, self.tea.id])
+
+    def test_search_endpoint_requires_query(self):
+        response = self.client.get(reverse('search-products'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_product_list_search_uses_index(self):
+        response = self.client.get('/catalogue/products/', {'search': 'sua'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [product['id'] for product in response.data['results']],
+            [self.coffee.id, self.tea.id],
+        )
+
+    def test_product_list_search_keeps_relevance_order(self):
+        milk = Product.objects.create(name='Sữa tươi', description='Sữa tươi thanh trùng', price=20000)
+        response = self.client.get('/catalogue/products/', {'search': 'sua'})
+        self.assertEqual([product['id'] for product in response.data['results']], [milk.id, self.coffee.id, self.tea.id])
+        response = self.client.get('/catalogue/products/', {'search': 'sua', 'ordering': '-price'})
+        self.assertEqual([product['id'] for product in response.data['results']], [self.tea.id, self.coffee.id, milk.id])
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import ProductSearchView
+
+urlpatterns = [
+    path("products/", ProductSearchView.as_view(), name="search-products"),
+]
@@ -1,3 +1,44 @@
-from django.shortcuts import render
+from rest_framework import generics, status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
-# Create your views here.
+from catalogue.models import Product
+from catalogue.serializers import ProductSerializer
+from catalogue.views import ProductPageNumberPagination
+from .services import search_product_ids
+
+
+class ProductSearchView(generics.ListAPIView):
+    """
+    API tìm kiếm sản phẩm theo tên, mô tả và tên danh mục (GET /search/products/?q=)
+    """
+    permission_classes = [AllowAny]
+    serializer_class = ProductSerializer
+    pagination_class = ProductPageNumberPagination
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name="q", type=str, location=OpenApiParameter.QUERY, required=True, description="Từ khóa tìm kiếm (có dấu hoặc không dấu)"),
+            OpenApiParameter(name="page", type=int, location=OpenApiParameter.QUERY, required=False),
+            OpenApiParameter(name="page_size", type=int, location=OpenApiParameter.QUERY, required=False),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get("q", "")
+        ranked = search_product_ids(query, active_only=not request.user.is_staff)
+        if ranked is None:
+            return Response(
+                {"detail": "Cần truyền từ khóa tìm kiếm 'q'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Phân trang trên kết quả đã xếp hạng, sau đó chỉ tải các sản phẩm của trang hiện tại
+        page = self.paginate_queryset(ranked)
+        product_ids = [row["product_id"] for row in page]
+        products = Product.objects.filter(id__in=product_ids).prefetch_related("images")
+        by_id = {product.id: product for product in products}
+        ordered = [by_id[pk] for pk in product_ids if pk in by_id]
+
+        serializer = self.get_serializer(ordered, many=True)
+        return self.get_paginated_response(serializer.data)
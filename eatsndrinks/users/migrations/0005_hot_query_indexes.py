@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_addressbook_phone_number'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='addressbook',
+            index=models.Index(fields=['user', 'is_default'], name='addressbook_user_default_idx'),
+        ),
+    ]
@@ -41,5 +41,10 @@ class AddressBook(models.Model):
     )
     is_default = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "is_default"], name="addressbook_user_default_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} - {self.address}"
\ No newline at end of file
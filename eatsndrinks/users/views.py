@@ -16,6 +16,8 @@ from rest_framework.exceptions import NotFound
 from datetime import datetime, timedelta
 from django.db.models import Count
 from django.utils import timezone
+from analytics.services import month_over_month
+from api.pagination import OptInCursorPagination
 # Create your views here.
 # Register APIView
 class RegisterView(APIView):
@@ -132,11 +134,19 @@ class IsAdminView(APIView):
     def get(self, request):
         return Response({"is_admin": request.user.is_staff})
 
+class UserCursorPagination(OptInCursorPagination):
+    """Danh sách người dùng không phân trang như cũ, chỉ phân trang keyset khi client gửi ?cursor="""
+    page_size = None
+    cursor_page_size = 50
+    max_page_size = 500
+    cursor_ordering = ("id",)
+
 # Admin: List all users (GET only)
 class AdminUserListView(ListAPIView):
     permission_classes = [IsAdminUser]
-    queryset = User.objects.all()
+    queryset = User.objects.all().order_by("id")
     serializer_class = UserUpdateSerializer
+    pagination_class = UserCursorPagination
 
 # Admin: Retrieve & Update a specific user
 class AdminUserDetailView(RetrieveUpdateAPIView):
@@ -201,43 +211,11 @@ class AdminUserStatsView(APIView):
         }
     )
     def get(self, request):
-        # Get current date in UTC
-        now = timezone.now()
-        
-        # Calculate first day of current month
-        current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Calculate first day of previous month
-        if now.month == 1:
-            previous_month_start = now.replace(year=now.year-1, month=12, day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:
-            previous_month_start = now.replace(month=now.month-1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Calculate first day of next month
-        if now.month == 12:
-            next_month_start = now.replace(year=now.year+1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:
-            next_month_start = now.replace(month=now.month+1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Get user counts
-        current_month_users = User.objects.filter(
-            date_joined__gte=current_month_start,
-            date_joined__lt=next_month_start
-        ).count()
-        
-        previous_month_users = User.objects.filter(
-            date_joined__gte=previous_month_start,
-            date_joined__lt=current_month_start
-        ).count()
-        
-        # Calculate increase percentage
-        if previous_month_users == 0:
-            increase_percentage = 100 if current_month_users > 0 else 0
-        else:
-            increase_percentage = ((current_month_users - previous_month_users) / previous_month_users) * 100
-        
+        # Đọc từ bảng thống kê theo ngày thay vì đếm lại bảng User
+        current_month_users, previous_month_users, increase_percentage = month_over_month("new_users")
+
         return Response({
             'current_month_users': current_month_users,
             'previous_month_users': previous_month_users,
-            'increase_percentage': round(increase_percentage, 2)
+            'increase_percentage': increase_percentage
         }, status=status.HTTP_200_OK)
\ No newline at end of file